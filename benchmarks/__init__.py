@@ -0,0 +1 @@
+"""Benchmarks for Uptime Bot."""
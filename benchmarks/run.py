@@ -0,0 +1,437 @@
+"""
+Benchmark harness for the Uptime Bot.
+
+Builds synthetic guilds with stub Discord objects and measures the
+status checks, persistence and slash command handling without any network access.
+Results are written as JSON so runs of different versions can be compared.
+
+Usage:
+    python -m benchmarks.run --guilds 10000 --bots 50 --output results.json
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import discord
+from discord.state import ConnectionState
+
+from benchmarks.stubs import (
+    FakeBot, FakeInteraction, FakeMember, ProbeServer, flip_statuses, guild_create_payload, make_guilds, member_payload
+)
+from commands.uptime import UptimeCog
+from utils.charts import TIMELINE_SECONDS, HEATMAP_DAYS, render_heatmap, render_timeline
+from commands.view_uptime import ViewUptimeCog, WINDOW_CHOICES
+from utils.data import DATA_FILE, dump_data, write_data
+from utils.export import export_rows, stats_rows, write_export
+from utils.history import TransitionLog
+from utils.members import member_cache_options
+from utils.model import Status, from_document
+from utils.notify import Notifier
+from utils.probes import Prober
+from utils.shards import ShardMonitor, handle_presence
+from utils.storage import DATA_DIR, DATABASE_FILE, JOURNAL_DIR, get_backend
+from utils.store import DataStore
+
+
+def summarize(samples):
+    """Summarize timing samples (in seconds) as milliseconds."""
+    return {
+        'runs': len(samples),
+        'min_ms': min(samples) * 1000,
+        'mean_ms': statistics.mean(samples) * 1000,
+        'max_ms': max(samples) * 1000,
+    }
+
+
+async def timed(coro_fn, repeat=1):
+    """Run a coroutine function several times and summarize how long it took."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await coro_fn()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+def file_size(path):
+    """Get the size of a file (plus any SQLite WAL) or of a directory's files in bytes."""
+    if os.path.isdir(path):
+        return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+    return sum(os.path.getsize(p) for p in (path, path + '-wal') if os.path.exists(p))
+
+
+async def bench_persistence(name, data, dirty_ratio, repeat):
+    """Measure loading and flushing a store with one backend."""
+    if name == 'json':
+        write_data(dump_data(data))
+        path = DATA_FILE
+    else:
+        backend = get_backend(name)
+        backend.import_data(json.loads(json.dumps(data)))
+        backend.close()
+        path = {'sharded': DATA_DIR, 'journal': JOURNAL_DIR}.get(name, DATABASE_FILE)
+
+    started = time.perf_counter()
+    store = DataStore(get_backend(name), rollup_file=None)
+    load = summarize([time.perf_counter() - started])
+
+    keys = [(guild_id, bot_id) for guild_id, bots in store.monitored_guilds() for bot_id in bots]
+    partial = keys[:max(1, int(len(keys) * dirty_ratio))]
+
+    async def flush(dirty_keys):
+        for guild_id, bot_id in dirty_keys:
+            store.record_status(guild_id, bot_id, Status.ONLINE)
+        await store.flush()
+
+    full = await timed(lambda: flush(keys))
+    incremental = await timed(lambda: flush(partial), repeat)
+    await store.close()
+
+    return {
+        'load': load,
+        'flush_all': full,
+        'flush_incremental': {**incremental, 'dirty_keys': len(partial)},
+        'file_bytes': file_size(path),
+    }
+
+
+async def bench_sweep(guilds, data, change_ratio):
+    """Measure a run_due batch that checks every generated bot at once."""
+    store = DataStore(get_backend('json'), TransitionLog('history'), rollup_file=None)
+    store.guilds = from_document(data)
+    bot = FakeBot(guilds, store)
+    shard_monitor = bot.shard_monitors[0] = ShardMonitor(bot, 0, Notifier(coalesce_seconds=0))
+
+    def full_batch():
+        """Make every bot due now and time the batch that checks them."""
+        now = int(time.time())
+        for guild_id, bots in store.monitored_guilds():
+            for bot_id in bots:
+                shard_monitor.scheduler.schedule(guild_id, bot_id, now)
+        started = time.perf_counter()
+        shard_monitor.run_due(now)
+        return time.perf_counter() - started
+
+    results = {
+        'initial': summarize([full_batch()]),
+        'steady': summarize([full_batch() for _ in range(3)]),
+    }
+    changed = flip_statuses(guilds, change_ratio)
+    results['with_changes'] = {**summarize([full_batch()]), 'changed': changed}
+    results['bots_checked'] = shard_monitor.last_sweep_checked
+    results['scheduled'] = bench_schedule(shard_monitor, store.check_interval)
+
+    await asyncio.sleep(0)
+    await shard_monitor.notifier.close()
+    return bot, results
+
+
+def bench_schedule(shard_monitor, interval):
+    """Run one interval of scheduled checks, second by second, and summarize the batches."""
+    now = int(time.time())
+    shard_monitor.schedule_all(now)
+    samples = []
+    batch_sizes = []
+    for second in range(now + 1, now + interval + 1):
+        started = time.perf_counter()
+        batch_sizes.append(shard_monitor.run_due(second))
+        samples.append(time.perf_counter() - started)
+    return {
+        **summarize(samples),
+        'interval_seconds': interval,
+        'checks': sum(batch_sizes),
+        'max_batch': max(batch_sizes),
+    }
+
+
+async def bench_fanout(guild_count, repeat):
+    """
+    Deliver status changes of one bot monitored in every guild, one update per guild like the gateway.
+
+    The change is recorded once in the bot's shared stats and only the
+    notifications are fanned out, so it should cost little more than the
+    scheduled checks of the bot in every guild, which each record its status.
+    """
+    guilds, data = make_guilds(guild_count, 1)
+    bot_id = 1
+    for guild in guilds:
+        guild.add_member(FakeMember(bot_id, 'popular-bot', guild=guild))
+        data['monitored_bots'][str(guild.id)].append(str(bot_id))
+
+    store = DataStore(get_backend('json'), rollup_file=None)
+    store.guilds = from_document(data)
+    bot = FakeBot(guilds, store)
+    shard_monitor = bot.shard_monitors[0] = ShardMonitor(bot, 0, Notifier(coalesce_seconds=0))
+    statuses = iter(['offline', 'online'] * (repeat + 1))
+
+    def flip():
+        status = next(statuses)
+        for guild in guilds:
+            guild.get_member(bot_id).status = status
+
+    async def checks():
+        for guild in guilds:
+            shard_monitor.handle_status(guild, shard_monitor.get_channel(guild, bot_id), guild.get_member(bot_id))
+
+    async def fan_out():
+        flip()
+        for guild in guilds:
+            handle_presence(bot, guild.get_member(bot_id))
+
+    results = {
+        'checks': await timed(checks, repeat),
+        'fan_out': await timed(fan_out, repeat),
+        'subscribers': len(list(store.subscribers(bot_id))),
+    }
+
+    # A change with no presence update, caught by a single guild's scheduled check
+    flip()
+    now = int(time.time()) + 1
+    shard_monitor.scheduler.clear()
+    shard_monitor.scheduler.schedule(guilds[0].id, bot_id, now)
+    shard_monitor.run_due(now)
+    status = store.get_presence(bot_id)
+    results['missed_change_applied'] = sum(
+        1 for guild in guilds if store.get_stats(guild.id, bot_id).last_status == status
+    )
+    await asyncio.sleep(0)
+    await shard_monitor.notifier.close()
+    return results
+
+
+def bench_member_cache(member_count, bot_count):
+    """
+    Measure the member cache of one large guild in each member cache mode.
+
+    A real discord.Guild is built from a synthetic GUILD_CREATE payload. In
+    the monitored mode its bots are then cached as a member request would.
+    """
+    results = {}
+    for mode in ('all', 'monitored'):
+        options = member_cache_options(mode)
+        state = ConnectionState(
+            dispatch=lambda *args: None, handlers={}, hooks={}, http=None, intents=discord.Intents.all(),
+            member_cache_flags=options.get('member_cache_flags')
+        )
+        payload = guild_create_payload(1 << 22, member_count, bot_count)
+        gc.collect()
+        tracemalloc.start()
+        started = time.perf_counter()
+        guild = discord.Guild(data=payload, state=state)
+        if mode == 'monitored':
+            for i in range(bot_count):
+                guild._add_member(discord.Member(data=member_payload(guild.id + 1 + i, True), guild=guild, state=state))
+        elapsed = time.perf_counter() - started
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        results[mode] = {**summarize([elapsed]), 'cached_members': len(guild.members), 'cache_bytes': size}
+        del guild, payload
+    return results
+
+
+async def bench_commands(bot, repeat):
+    """Measure the slash command callbacks against the first (largest) guild."""
+    guild = bot.guilds[0]
+    member = guild.members[0]
+    uptime_cog = UptimeCog(bot)
+    view_cog = ViewUptimeCog(bot)
+
+    async def run(cog, command, *args):
+        await command.callback(cog, FakeInteraction(guild), *args)
+
+    async def run_uncached(cog, command, *args):
+        cog.pages.clear()
+        await run(cog, command, *args)
+
+    return {
+        'uptime_list': await timed(lambda: run(uptime_cog, uptime_cog.list_bots), repeat),
+        'uptime_list_uncached': await timed(lambda: run_uncached(uptime_cog, uptime_cog.list_bots), repeat),
+        'view_uptime_all': await timed(lambda: run(view_cog, view_cog.view_all_uptime, None), repeat),
+        'view_uptime_all_uncached': await timed(
+            lambda: run_uncached(view_cog, view_cog.view_all_uptime, None), repeat
+        ),
+        'view_uptime_user': await timed(
+            lambda: run(view_cog, view_cog.view_user_uptime, member, None), repeat
+        ),
+        'view_uptime_user_30d': await timed(
+            lambda: run(view_cog, view_cog.view_user_uptime, member, WINDOW_CHOICES[2]), repeat
+        ),
+    }
+
+
+async def bench_charts(repeat):
+    """Measure rendering the uptime timeline and heatmap images (in process)."""
+    end = time.time()
+    start = end - TIMELINE_SECONDS
+    # A flapping bot: one interval every 10 minutes
+    intervals = [(t, t + 600, i % 2 == 0) for i, t in enumerate(range(int(start), int(end), 600))]
+    cells = [(i % 7) / 6 for i in range(HEATMAP_DAYS * 24)]
+
+    images = {}
+
+    async def timeline():
+        images['timeline'] = render_timeline(start, end, intervals)
+
+    async def heatmap():
+        images['heatmap'] = render_heatmap(cells)
+
+    results = {'timeline': await timed(timeline, repeat), 'heatmap': await timed(heatmap, repeat)}
+    for name, image in images.items():
+        results[name]['bytes'] = len(image)
+    return results
+
+
+async def bench_probes(store, count, repeat, delay=0.005):
+    """
+    Probe bots against a local stand-in HTTP server.
+
+    One in ten targets answers 503 and one in twenty is a TCP host:port.
+    """
+    server = ProbeServer(delay)
+    await server.start()
+    keys = [(guild_id, bot_id) for guild_id, bots in store.monitored_guilds() for bot_id in bots][:count]
+    for i, (guild_id, bot_id) in enumerate(keys):
+        if i % 20 == 0:
+            target = f'127.0.0.1:{server.port}'
+        else:
+            target = server.url(f'health/{bot_id}', 503 if i % 10 == 5 else None)
+        store.set_probe_target(guild_id, bot_id, target)
+
+    # The stand-in server listens on loopback
+    prober = Prober(store, concurrency=50, allow_private=True)
+    try:
+        results = await timed(prober.run_once, repeat)
+    finally:
+        await prober.close()
+        await server.close()
+
+    guild_id, bot_id = keys[1]
+    probe = store.get_stats(guild_id, bot_id).probe
+    results.update({
+        'targets': len(keys),
+        'http_requests': server.requests,
+        'connections': len(server.peers),
+        'server_delay_ms': delay * 1000,
+        'percentiles_ms': [probe.p50, probe.p95, probe.p99],
+    })
+    return results
+
+
+def bench_export(store, transitions_per_day, days=(1, 10)):
+    """
+    Export the first guild with synthetic transition logs of different lengths.
+
+    Peak memory should stay flat as the history grows.
+    """
+    guild_id, bots = next(store.monitored_guilds())
+    bot_ids = list(bots)
+    results = {}
+
+    for day_count in days:
+        history = TransitionLog(f'export-history-{day_count}')
+        start = int(time.time()) - day_count * 86400
+        step = 86400 / transitions_per_day
+        for day in range(day_count):
+            history.write([
+                (start + day * 86400 + i * step, guild_id, bot_ids[i % len(bot_ids)], 'online', 'offline')
+                for i in range(transitions_per_day)
+            ])
+
+        stats = stats_rows(guild_id, store.guilds[guild_id], store.check_interval)
+        tracemalloc.start()
+        started = time.perf_counter()
+        with open(os.devnull, 'wb') as f:
+            size = write_export(f, export_rows(stats, history, guild_id, bot_ids, start, time.time()), 'csv')
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        results[f'{day_count}_days'] = {
+            **summarize([elapsed]),
+            'transitions': day_count * transitions_per_day,
+            'gzip_bytes': size,
+            'peak_bytes': peak,
+        }
+    return results
+
+
+async def run_benchmarks(args):
+    """Run every benchmark and return the results."""
+    results = {}
+
+    tracemalloc.start()
+    guilds, data = make_guilds(args.guilds, args.bots)
+    results['fixture_peak_bytes'] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    for name in ('json', 'sharded', 'journal', 'sqlite'):
+        results[f'persistence_{name}'] = await bench_persistence(
+            name, json.loads(json.dumps(data)), args.dirty_ratio, args.repeat
+        )
+
+    bot, results['sweep'] = await bench_sweep(guilds, data, args.change_ratio)
+    results['fanout'] = await bench_fanout(args.guilds, args.repeat)
+    results['commands'] = await bench_commands(bot, args.repeat)
+    results['member_cache'] = bench_member_cache(args.guild_members, args.bots)
+    results['probes'] = await bench_probes(bot.store, args.probes, args.repeat)
+    results['export'] = bench_export(bot.store, args.export_transitions)
+    results['charts'] = await bench_charts(args.repeat)
+    results['max_rss_bytes'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return results
+
+
+def main(argv=None):
+    """Parse arguments, run the benchmarks in a scratch directory and write JSON."""
+    parser = argparse.ArgumentParser(description='Uptime Bot benchmarks')
+    parser.add_argument('--guilds', type=int, default=1000, help='number of synthetic guilds')
+    parser.add_argument('--bots', type=int, default=20, help='monitored bots per guild')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per timed operation')
+    parser.add_argument('--dirty-ratio', type=float, default=0.01, help='share of bots dirtied per incremental flush')
+    parser.add_argument('--change-ratio', type=float, default=0.05, help='share of bots changing status between check batches')
+    parser.add_argument('--export-transitions', type=int, default=20000, help='logged transitions per day to export')
+    parser.add_argument('--guild-members', type=int, default=50000, help='members of the guild cached by the member cache benchmark')
+    parser.add_argument('--probes', type=int, default=500, help='bots given a health probe target')
+    parser.add_argument('--output', help='write results to this file instead of stdout')
+    args = parser.parse_args(argv)
+
+    output = os.path.abspath(args.output) if args.output else None
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            results = asyncio.run(run_benchmarks(args))
+        finally:
+            os.chdir(cwd)
+
+    report = {
+        'meta': {
+            'guilds': args.guilds,
+            'bots_per_guild': args.bots,
+            'repeat': args.repeat,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.time(),
+        },
+        'results': results,
+    }
+
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
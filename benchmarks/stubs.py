@@ -0,0 +1,257 @@
+"""
+Stand-ins for the Discord objects the bot uses, so benchmarks run without a network.
+"""
+
+import asyncio
+import random
+
+from aiohttp import web
+
+from utils.members import MonitoredMembers
+
+
+class FakeAvatar:
+    """Minimal avatar asset."""
+
+    url = 'https://cdn.discordapp.com/embed/avatars/0.png'
+
+
+class FakeMember:
+    """A guild member with just the attributes the cogs and monitor read."""
+
+    def __init__(self, member_id, name, status='online', bot=True, guild=None):
+        self.id = member_id
+        self.name = name
+        self.status = status
+        self.bot = bot
+        self.guild = guild
+        self.mention = f'<@{member_id}>'
+        self.display_avatar = FakeAvatar()
+
+
+class FakeChannel:
+    """A text channel that counts the messages sent to it."""
+
+    def __init__(self, channel_id, guild):
+        self.id = channel_id
+        self.guild = guild
+        self.mention = f'<#{channel_id}>'
+        self.sent = 0
+
+    async def send(self, content=None, **kwargs):
+        """Pretend to send a message."""
+        self.sent += 1
+
+
+class FakeGuild:
+    """A guild holding members and a single notification channel."""
+
+    def __init__(self, guild_id, shard_id=0):
+        self.id = guild_id
+        self.shard_id = shard_id
+        self.filesize_limit = 25 * 1024 * 1024
+        self.chunked = True
+        self.channels = {}
+        self._members = {}
+
+    @property
+    def members(self):
+        """Get the cached members as a list, like discord.Guild.members."""
+        return list(self._members.values())
+
+    def add_member(self, member):
+        """Add a member to the cache."""
+        self._members[member.id] = member
+
+    def get_member(self, member_id):
+        """Look up a cached member."""
+        return self._members.get(member_id)
+
+    def get_channel(self, channel_id):
+        """Look up a cached channel."""
+        return self.channels.get(channel_id)
+
+    async def query_members(self, query=None, *, limit=5, user_ids=None, presences=False, cache=True):
+        """Look up members by ID; every member is cached already."""
+        return [self._members[user_id] for user_id in user_ids or () if user_id in self._members]
+
+    async def chunk(self, *, cache=True):
+        """Get every member."""
+        return self.members
+
+
+class FakeResponse:
+    """Interaction response that records what would have been sent."""
+
+    def __init__(self):
+        self.messages = []
+
+    async def send_message(self, content=None, **kwargs):
+        """Record a response message."""
+        self.messages.append((content, kwargs))
+
+    async def send(self, content=None, **kwargs):
+        """Record a followup message."""
+        self.messages.append((content, kwargs))
+
+    async def defer(self, **kwargs):
+        """Accept a deferral."""
+
+
+class FakeMessage:
+    """A sent message that can be edited."""
+
+    async def edit(self, **kwargs):
+        """Pretend to edit the message."""
+
+
+class FakeInteraction:
+    """A slash command interaction in a guild."""
+
+    def __init__(self, guild, user=None):
+        self.guild = guild
+        self.guild_id = guild.id
+        self.user = user or FakeMember(1, 'admin', bot=False, guild=guild)
+        self.response = FakeResponse()
+        self.followup = FakeResponse()
+
+    async def original_response(self):
+        """Return the message sent as the response."""
+        return FakeMessage()
+
+
+class FakeBot:
+    """The parts of the bot the cogs and shard monitors use."""
+
+    def __init__(self, guilds, store):
+        self.guilds = guilds
+        self.store = store
+        self.shard_monitors = {}
+        self.member_cache = MonitoredMembers(self, False)
+        self.cluster = None
+        self.shard_count = 1
+        self.latencies = [(0, 0.05)]
+        self._guilds = {guild.id: guild for guild in guilds}
+
+    def get_guild(self, guild_id):
+        """Look up a guild by ID."""
+        return self._guilds.get(guild_id)
+
+
+class ProbeServer:
+    """
+    A local HTTP server standing in for bot health endpoints.
+
+    Every path answers 200, or the status in a ``status`` query parameter,
+    after ``delay`` seconds. Client connections are counted, to show whether
+    keep-alive connections are reused.
+    """
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.requests = 0
+        self.peers = set()
+        self.runner = None
+        self.port = None
+
+    async def _handle(self, request):
+        self.requests += 1
+        self.peers.add(request.transport.get_extra_info('peername'))
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return web.Response(status=int(request.query.get('status', 200)), text='ok')
+
+    async def start(self):
+        """Start listening on a free local port."""
+        app = web.Application()
+        app.router.add_get('/{path:.*}', self._handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        self.port = self.runner.addresses[0][1]
+
+    def url(self, path='', status=None):
+        """Get the URL of a path on the server."""
+        return f'http://127.0.0.1:{self.port}/{path}' + (f'?status={status}' if status else '')
+
+    async def close(self):
+        """Stop the server."""
+        await self.runner.cleanup()
+
+
+def make_guilds(guild_count, bots_per_guild, offline_ratio=0.1, seed=0):
+    """
+    Generate guilds, each with a notification channel and monitored bots.
+
+    Returns (guilds, data) where data is a bot data document in the on-disk
+    layout monitoring every generated bot.
+    """
+    rng = random.Random(seed)
+    guilds = []
+    data = {'channels': {}, 'monitored_bots': {}, 'uptime_stats': {}}
+
+    for g in range(guild_count):
+        guild_id = (g + 1) << 22
+        guild = FakeGuild(guild_id)
+        channel = FakeChannel(guild_id + 1, guild)
+        guild.channels[channel.id] = channel
+        data['channels'][str(guild_id)] = str(channel.id)
+
+        bot_ids = []
+        for b in range(bots_per_guild):
+            bot_id = guild_id + 1000 + b
+            status = 'offline' if rng.random() < offline_ratio else 'online'
+            guild.add_member(FakeMember(bot_id, f'bot-{g}-{b}', status, guild=guild))
+            bot_ids.append(str(bot_id))
+        data['monitored_bots'][str(guild_id)] = bot_ids
+        guilds.append(guild)
+
+    return guilds, data
+
+
+def member_payload(user_id, bot=False):
+    """Build a guild member as the gateway sends it."""
+    return {
+        'user': {'id': str(user_id), 'username': f'user-{user_id}', 'discriminator': '0', 'avatar': None, 'bot': bot},
+        'roles': [],
+        'joined_at': '2024-01-01T00:00:00+00:00',
+        'deaf': False,
+        'mute': False,
+        'flags': 0,
+    }
+
+
+def guild_create_payload(guild_id, member_count, bot_count, online_ratio=0.3):
+    """Build a GUILD_CREATE payload whose first bot_count members are bots, with presences for some members."""
+    user_ids = range(guild_id + 1, guild_id + member_count + 1)
+    step = max(1, round(1 / online_ratio))
+    return {
+        'id': str(guild_id),
+        'name': f'guild-{guild_id}',
+        'roles': [{
+            'id': str(guild_id), 'name': '@everyone', 'permissions': '0', 'position': 0,
+            'color': 0, 'hoist': False, 'managed': False, 'mentionable': False,
+        }],
+        'channels': [],
+        'emojis': [],
+        'features': [],
+        'member_count': member_count,
+        'members': [member_payload(user_id, i < bot_count) for i, user_id in enumerate(user_ids)],
+        'presences': [
+            {'user': {'id': str(user_id)}, 'status': 'online', 'activities': [], 'client_status': {'desktop': 'online'}}
+            for user_id in user_ids[::step]
+        ],
+    }
+
+
+def flip_statuses(guilds, ratio, seed=1):
+    """Flip the online/offline status of a fraction of all members. Returns how many changed."""
+    rng = random.Random(seed)
+    flipped = 0
+    for guild in guilds:
+        for member in guild.members:
+            if rng.random() < ratio:
+                member.status = 'online' if member.status == 'offline' else 'offline'
+                flipped += 1
+    return flipped
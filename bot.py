@@ -2,12 +2,24 @@
 Uptime Bot - A Discord bot for monitoring bot uptimes
 """
 
+import asyncio
 import os
+import time
 import discord
 from discord.ext import commands, tasks
 from dotenv import load_dotenv
-from datetime import datetime
-from utils.data import load_data, save_data, load_data_async, save_data_async
+from utils.cluster import ClusterClient
+from utils.history import HISTORY_DIR, open_log
+from utils.members import MonitoredMembers, member_cache_options
+from utils.metrics import REGISTRY, start_metrics_server, watch_loop_lag
+from utils.notify import Notifier
+from utils.probes import PROBE_CONCURRENCY, PROBE_INTERVAL_SECONDS, PROBE_TIMEOUT_SECONDS, Prober
+from utils.rollup import ROLLUP_FILE
+from utils.scheduler import CHECK_INTERVAL_SECONDS, clamp_interval
+from utils.shards import ShardMonitor, collect_status, handle_presence
+from utils.storage import get_backend
+from utils.store import DataStore
+from utils.sync import COMMAND_HASH_FILE, sync_if_changed
 
 # Load environment variables
 load_dotenv()
@@ -20,109 +32,210 @@ intents = discord.Intents.default()
 intents.members = True
 intents.presences = True
 
+# Sharding: let Discord pick the shard count unless SHARD_COUNT is set.
+# In cluster mode the coordinator also assigns this worker its shard IDs.
+SHARD_COUNT = int(os.getenv('SHARD_COUNT')) if os.getenv('SHARD_COUNT') else None
+SHARD_IDS = [int(i) for i in os.getenv('CLUSTER_SHARD_IDS').split(',')] if os.getenv('CLUSTER_SHARD_IDS') else None
+
+# Member cache: every member ('all') or only the monitored bots ('monitored')
+MEMBER_CACHE = os.getenv('MEMBER_CACHE', 'monitored')
+
 # Bot instance
-bot = commands.Bot(command_prefix='/', intents=intents)
+bot = commands.AutoShardedBot(
+    command_prefix='/',
+    intents=intents,
+    shard_count=SHARD_COUNT,
+    shard_ids=SHARD_IDS,
+    **member_cache_options(MEMBER_CACHE)
+)
+
+# Shared in-memory data store, flushed to disk in the background
+bot.store = DataStore(
+    get_backend(os.getenv('STORAGE_BACKEND', 'journal'), SHARD_IDS, SHARD_COUNT),
+    open_log(
+        os.getenv('HISTORY_DIR', HISTORY_DIR),
+        SHARD_IDS,
+        SHARD_COUNT,
+        retention_days=int(os.getenv('HISTORY_RETENTION_DAYS', '30'))
+    ),
+    rollup_file=os.getenv('ROLLUP_FILE', ROLLUP_FILE),
+    check_interval=clamp_interval(int(os.getenv('CHECK_INTERVAL_SECONDS', str(CHECK_INTERVAL_SECONDS)))),
+    shard_ids=SHARD_IDS,
+    shard_count=SHARD_COUNT
+)
+
+# Health probes of the bots that have a probe target
+bot.prober = Prober(
+    bot.store,
+    interval=int(os.getenv('PROBE_INTERVAL_SECONDS', str(PROBE_INTERVAL_SECONDS))),
+    timeout=float(os.getenv('PROBE_TIMEOUT_SECONDS', str(PROBE_TIMEOUT_SECONDS))),
+    concurrency=int(os.getenv('PROBE_CONCURRENCY', str(PROBE_CONCURRENCY))),
+    allow_private=os.getenv('PROBE_ALLOW_PRIVATE', '').lower() in ('1', 'true', 'yes')
+)
+
+# Fetches the monitored bots into the member cache when it only keeps those
+bot.member_cache = MonitoredMembers(bot, MEMBER_CACHE == 'monitored')
+
+# Monitoring loop and notification queues for each shard, created as shards connect
+bot.shard_monitors = {}
+
+# Connection to the cluster coordinator when running as a worker
+bot.cluster = None
+if os.getenv('CLUSTER_ADDRESS'):
+    bot.cluster = ClusterClient(
+        os.getenv('CLUSTER_ADDRESS'),
+        int(os.getenv('CLUSTER_WORKER_ID', '0')),
+        lambda: collect_status(bot)
+    )
+
+
+# Gauges read when metrics are rendered
+REGISTRY.gauge(
+    'uptime_notification_queue_depth', 'Notifications waiting to be sent',
+    lambda: sum(m.notifier.queue_depth() for m in bot.shard_monitors.values())
+)
+REGISTRY.gauge('uptime_cached_guilds', 'Guilds in the gateway cache', lambda: len(bot.guilds))
+REGISTRY.gauge(
+    'uptime_cached_members', 'Members in the gateway cache',
+    lambda: sum(len(guild.members) for guild in bot.guilds)
+)
+REGISTRY.gauge(
+    'uptime_monitored_bots', 'Monitored (guild, bot) pairs in the data store',
+    lambda: sum(len(bots) for _, bots in bot.store.monitored_guilds())
+)
+REGISTRY.gauge('uptime_rollups', 'Uptime rollups held in memory', lambda: len(bot.store.rollups))
+EXTENSION_LOAD_SECONDS = REGISTRY.histogram('uptime_extension_load_seconds', 'Time spent loading each command extension')
+
+# Hash of the last synced command tree, so unchanged trees are not synced again
+bot.command_hash_file = os.getenv('COMMAND_HASH_FILE', COMMAND_HASH_FILE)
+
+# Local Prometheus endpoint; each cluster worker uses the next port up
+METRICS_PORT = int(os.getenv('METRICS_PORT') or 0)
+if METRICS_PORT and os.getenv('CLUSTER_WORKER_ID'):
+    METRICS_PORT += int(os.getenv('CLUSTER_WORKER_ID'))
+
+
+def make_notifier():
+    """Create a status change notifier configured from the environment."""
+    return Notifier(
+        coalesce_seconds=float(os.getenv('NOTIFY_COALESCE_SECONDS', '5')),
+        flap_window=int(os.getenv('FLAP_WINDOW_SECONDS', '600')),
+        flap_threshold=int(os.getenv('FLAP_THRESHOLD', '4'))
+    )
 
 
 @bot.event
 async def on_ready():
     """Called when the bot is ready."""
     print(f'{bot.user} has connected to Discord!')
-    print(f'Connected to {len(bot.guilds)} guilds')
+    print(f'Connected to {len(bot.guilds)} guilds on {len(bot.shards)} shard(s)')
     
-    # Sync slash commands
+    # Sync slash commands, unless they are unchanged since the last sync
     try:
-        synced = await bot.tree.sync()
-        print(f'Synced {len(synced)} command(s)')
+        synced = await sync_if_changed(bot, bot.command_hash_file)
+        if synced is None:
+            print('Command tree unchanged, skipped sync')
+        else:
+            print(f'Synced {synced} command(s)')
     except Exception as e:
         print(f'Failed to sync commands: {e}')
     
-    # Start monitoring task
-    if not check_bot_status.is_running():
-        check_bot_status.start()
+    if not maintain_history.is_running():
+        maintain_history.start()
 
 
-@tasks.loop(minutes=1)
-async def check_bot_status():
-    """Check the status of monitored bots."""
-    bot_data = await load_data_async()
+@bot.event
+async def on_shard_ready(shard_id):
+    """Start monitoring a shard's guilds once it is ready."""
+    if shard_id not in bot.shard_monitors:
+        bot.shard_monitors[shard_id] = ShardMonitor(bot, shard_id, make_notifier())
     
-    for guild_id, bots in bot_data.get('monitored_bots', {}).items():
-        guild = bot.get_guild(int(guild_id))
-        if not guild:
-            continue
-            
-        channel_id = bot_data.get('channels', {}).get(guild_id)
-        if not channel_id:
-            continue
-            
-        channel = guild.get_channel(int(channel_id))
-        if not channel:
-            continue
-        
-        for bot_id in bots:
-            member = guild.get_member(int(bot_id))
-            if not member:
-                continue
-            
-            # Initialize uptime stats if not exists
-            if guild_id not in bot_data['uptime_stats']:
-                bot_data['uptime_stats'][guild_id] = {}
-            if bot_id not in bot_data['uptime_stats'][guild_id]:
-                bot_data['uptime_stats'][guild_id][bot_id] = {
-                    'online_time': 0,
-                    'offline_time': 0,
-                    'last_status': str(member.status),
-                    'last_check': datetime.now().isoformat()
-                }
-            
-            current_status = str(member.status)
-            last_status = bot_data['uptime_stats'][guild_id][bot_id].get('last_status')
-            
-            # Update time tracking
-            if current_status != 'offline':
-                bot_data['uptime_stats'][guild_id][bot_id]['online_time'] += 1
-            else:
-                bot_data['uptime_stats'][guild_id][bot_id]['offline_time'] += 1
-            
-            # Notify on status change
-            if last_status != current_status:
-                if current_status == 'offline':
-                    await channel.send(f'⚠️ **{member.name}** is now **offline**!')
-                else:
-                    await channel.send(f'✅ **{member.name}** is now **online**!')
-                
-                bot_data['uptime_stats'][guild_id][bot_id]['last_status'] = current_status
-            
-            bot_data['uptime_stats'][guild_id][bot_id]['last_check'] = datetime.now().isoformat()
-        
-        await save_data_async(bot_data)
-
-
-@check_bot_status.before_loop
-async def before_check_bot_status():
-    """Wait for the bot to be ready before starting the loop."""
-    await bot.wait_until_ready()
+    bot.shard_monitors[shard_id].start()
+    print(f'Shard {shard_id} is ready')
+    
+    # Checks of bots that are not cached yet are skipped until they are
+    if bot.member_cache.enabled:
+        fetched = await bot.member_cache.cache_shard(shard_id)
+        print(f'Cached {fetched} monitored bot(s) on shard {shard_id}')
+
+
+@bot.event
+async def on_presence_update(before, after):
+    """Record status transitions of monitored bots as they happen."""
+    if not after.bot or before.status == after.status:
+        return
+    
+    # Recorded once for every guild monitoring the bot; the same
+    # update from the other guilds it shares with us is ignored
+    handle_presence(bot, after)
+
+
+@bot.event
+async def on_member_join(member):
+    """Cache a monitored bot that rejoins a guild."""
+    if not member.bot:
+        return
+    
+    bot.member_cache.forget_bots(member.guild.id)
+    if bot.store.is_monitored(member.guild.id, member.id):
+        bot.member_cache.cache_later(member.guild, [member.id])
+
+
+@bot.event
+async def on_raw_member_remove(payload):
+    """Stop listing a bot that left a guild in bulk commands."""
+    if payload.user.bot:
+        bot.member_cache.forget_bots(payload.guild_id)
+
+
+@tasks.loop(hours=24)
+async def maintain_history():
+    """Apply retention and compaction to the status transition log."""
+    removed = await bot.store.maintain_history()
+    if removed:
+        print(f'Removed {removed} transition log segment(s)')
 
 
 async def load_extensions():
-    """Load all command extensions."""
-    for filename in os.listdir('./commands'):
+    """Load all command extensions, reporting how long each one took."""
+    started = time.perf_counter()
+    for filename in sorted(os.listdir('./commands')):
         if filename.endswith('.py') and not filename.startswith('__'):
+            extension_started = time.perf_counter()
             try:
                 await bot.load_extension(f'commands.{filename[:-3]}')
-                print(f'Loaded extension: {filename}')
+                elapsed = time.perf_counter() - extension_started
+                EXTENSION_LOAD_SECONDS.observe(elapsed)
+                print(f'Loaded extension: {filename} ({elapsed * 1000:.1f}ms)')
             except Exception as e:
                 print(f'Failed to load extension {filename}: {e}')
+    print(f'Loaded {len(bot.extensions)} extension(s) in {(time.perf_counter() - started) * 1000:.1f}ms')
 
 
 async def main():
     """Main function to run the bot."""
     async with bot:
-        await load_extensions()
-        await bot.start(TOKEN)
+        bot.store.start()
+        bot.prober.start()
+        if bot.cluster:
+            bot.cluster.start()
+        lag_watcher = asyncio.create_task(watch_loop_lag())
+        if METRICS_PORT:
+            await start_metrics_server(METRICS_PORT)
+            print(f'Serving metrics on http://127.0.0.1:{METRICS_PORT}/metrics')
+        try:
+            await load_extensions()
+            await bot.start(TOKEN)
+        finally:
+            lag_watcher.cancel()
+            await bot.prober.close()
+            # Make sure pending changes reach the disk on shutdown
+            for shard_monitor in bot.shard_monitors.values():
+                await shard_monitor.close()
+            if bot.cluster:
+                await bot.cluster.close()
+            await bot.store.close()
 
 
 if __name__ == '__main__':
-    import asyncio
     asyncio.run(main())
@@ -2,10 +2,17 @@
 Admin commands for bot configuration.
 """
 
+import io
+from typing import Optional
+
 import discord
 from discord import app_commands
 from discord.ext import commands
 import os
+from utils.metrics import REGISTRY
+from utils.profiling import PROFILER, render_report, timed
+from utils.shards import collect_status
+from utils.sync import sync_if_changed
 
 
 class ConfigCog(commands.Cog):
@@ -18,6 +25,7 @@ class ConfigCog(commands.Cog):
     
     @config_group.command(name="reload", description="Reload bot extensions")
     @app_commands.checks.has_permissions(administrator=True)
+    @timed
     async def reload(self, interaction: discord.Interaction):
         """Reload all command extensions."""
         await interaction.response.defer(ephemeral=True)
@@ -63,14 +71,15 @@ class ConfigCog(commands.Cog):
     
     @config_group.command(name="sync", description="Sync slash commands")
     @app_commands.checks.has_permissions(administrator=True)
+    @timed
     async def sync_commands(self, interaction: discord.Interaction):
         """Sync slash commands with Discord."""
         await interaction.response.defer(ephemeral=True)
         
         try:
-            synced = await self.bot.tree.sync()
+            synced = await sync_if_changed(self.bot, self.bot.command_hash_file, force=True)
             await interaction.followup.send(
-                f'✅ Synced {len(synced)} command(s)',
+                f'✅ Synced {synced} command(s)',
                 ephemeral=True
             )
         except Exception as e:
@@ -80,6 +89,7 @@ class ConfigCog(commands.Cog):
             )
     
     @config_group.command(name="status", description="View bot status")
+    @timed
     async def status(self, interaction: discord.Interaction):
         """View the current bot status."""
         embed = discord.Embed(
@@ -87,11 +97,114 @@ class ConfigCog(commands.Cog):
             color=discord.Color.blue()
         )
         
-        embed.add_field(name="Guilds", value=str(len(self.bot.guilds)), inline=True)
+        # Whole-cluster status from the coordinator, or just this process
+        workers = {'local': collect_status(self.bot)}
+        if self.bot.cluster:
+            try:
+                workers = await self.bot.cluster.request_status(timeout=2)
+            except Exception as e:
+                embed.description = f'⚠️ Cluster coordinator unavailable: {e}'
+        
+        shards = [
+            (worker_id, shard)
+            for worker_id, worker in workers.items()
+            for shard in worker.get('shards', [])
+        ]
+        
+        embed.add_field(name="Guilds", value=str(sum(w.get('guilds', 0) for w in workers.values())), inline=True)
+        embed.add_field(name="Shards", value=str(self.bot.shard_count or 1), inline=True)
+        if self.bot.cluster:
+            embed.add_field(name="Workers", value=str(len(workers)), inline=True)
         embed.add_field(name="Latency", value=f'{round(self.bot.latency * 1000)}ms', inline=True)
         embed.add_field(name="Extensions", value=str(len(self.bot.extensions)), inline=True)
         
+        # Per-shard health, up to Discord's embed field limit
+        for worker_id, shard in shards[:19]:
+            if shard['last_sweep']:
+                sweep = (
+                    f"Scheduled: {shard.get('scheduled', 0)} bots\n"
+                    f"Last checks: <t:{int(shard['last_sweep'])}:R> "
+                    f"({shard['checked']} bots, {shard['sweep_duration'] * 1000:.1f}ms)"
+                )
+            else:
+                sweep = f"Scheduled: {shard.get('scheduled', 0)} bots" if shard.get('scheduled') else 'Not monitoring yet'
+            
+            name = f"Shard {shard['id']}" if worker_id == 'local' else f"Shard {shard['id']} (worker {worker_id})"
+            embed.add_field(
+                name=name,
+                value=f"Latency: {shard['latency'] * 1000:.0f}ms\nGuilds: {shard['guilds']}\n{sweep}",
+                inline=True
+            )
+        
         await interaction.response.send_message(embed=embed)
+    
+    @config_group.command(name="metrics", description="View runtime metrics")
+    @app_commands.checks.has_permissions(administrator=True)
+    @timed
+    async def metrics(self, interaction: discord.Interaction):
+        """View a summary of the runtime metrics, with the full Prometheus output attached."""
+        metrics = REGISTRY.metrics
+        
+        def value(name):
+            return next(metrics[name].samples())[1] if name in metrics else 0
+        
+        def mean_ms(name):
+            return f"{metrics[name].mean() * 1000:.1f}ms ({metrics[name].count} runs)" if name in metrics else 'n/a'
+        
+        embed = discord.Embed(
+            title="📈 Runtime Metrics",
+            color=discord.Color.blue()
+        )
+        
+        embed.add_field(name="Check Batch (mean)", value=mean_ms('uptime_check_batch_seconds'), inline=True)
+        embed.add_field(name="Flush Time (mean)", value=mean_ms('uptime_store_flush_seconds'), inline=True)
+        embed.add_field(name="Bytes Written", value=f"{value('uptime_store_written_bytes_total'):,}", inline=True)
+        embed.add_field(name="Status Transitions", value=str(value('uptime_status_transitions_total')), inline=True)
+        embed.add_field(name="Notifications Sent", value=str(value('uptime_notifications_sent_total')), inline=True)
+        embed.add_field(name="Notifications Dropped", value=str(value('uptime_notifications_dropped_total')), inline=True)
+        embed.add_field(name="Notification Queue", value=str(value('uptime_notification_queue_depth')), inline=True)
+        embed.add_field(name="Event Loop Lag", value=f"{value('uptime_event_loop_lag_seconds') * 1000:.1f}ms", inline=True)
+        embed.add_field(name="Monitored Bots", value=str(value('uptime_monitored_bots')), inline=True)
+        
+        report = discord.File(io.BytesIO(REGISTRY.render().encode()), filename='metrics.txt')
+        await interaction.response.send_message(embed=embed, file=report, ephemeral=True)
+    
+    @config_group.command(name="profile", description="Profile the bot and attach a report")
+    @app_commands.describe(
+        seconds="Profile everything the bot does for this many seconds",
+        batches="Profile the next this many scheduled check batches instead (waits up to 5 minutes)"
+    )
+    @app_commands.checks.has_permissions(administrator=True)
+    async def profile(
+        self,
+        interaction: discord.Interaction,
+        seconds: app_commands.Range[int, 1, 300] = 30,
+        batches: Optional[app_commands.Range[int, 1, 20]] = None
+    ):
+        """Capture a cProfile report of the bot or of its scheduled check batches."""
+        if PROFILER.running:
+            await interaction.response.send_message('❌ A profile is already running.', ephemeral=True)
+            return
+        
+        await interaction.response.defer(ephemeral=True)
+        
+        if batches:
+            shard_monitors = list(self.bot.shard_monitors.values())
+            if not shard_monitors:
+                await interaction.followup.send('❌ No shards are being monitored yet.', ephemeral=True)
+                return
+            capture, captured = await PROFILER.capture_batches(shard_monitors, batches)
+            title = f'{captured} check batch(es) over {len(shard_monitors)} shard(s)'
+        else:
+            capture = await PROFILER.capture_duration(seconds)
+            title = f'{seconds}s of bot activity'
+        
+        report = render_report(capture, f'Uptime Bot profile: {title}')
+        await interaction.followup.send(
+            f'📊 Profiled {title}.',
+            file=discord.File(io.BytesIO(report.encode()), filename='profile.txt'),
+            ephemeral=True
+        )
 
 
 async def setup(bot):
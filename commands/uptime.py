@@ -2,10 +2,44 @@
 Uptime commands for setting channels and managing bot monitoring.
 """
 
+import asyncio
+import re
+from typing import Optional
+
 import discord
 from discord import app_commands
 from discord.ext import commands
-from utils.data import load_data, save_data
+from utils.members import fetch_members
+from utils.pages import PageCache, PageSet, send_pages
+from utils.probes import BlockedTarget, check_target
+from utils.profiling import timed
+from utils.scheduler import MAX_CHECK_INTERVAL_SECONDS, MIN_CHECK_INTERVAL_SECONDS
+
+# Bots per /uptime list page
+LINES_PER_PAGE = 25
+
+# Mentions listed per bulk summary field before it is truncated
+SUMMARY_MENTIONS = 30
+
+
+def parse_ids(text):
+    """Extract user IDs from pasted IDs or mentions."""
+    return [int(match) for match in re.findall(r'\d{15,20}', text or '')]
+
+
+def bulk_summary(title, *groups):
+    """Build an embed summarizing a bulk operation from (label, bot_ids) groups."""
+    embed = discord.Embed(title=title, color=discord.Color.blue())
+    for label, bot_ids in groups:
+        if not bot_ids:
+            continue
+        mentions = ' '.join(f'<@{bot_id}>' for bot_id in bot_ids[:SUMMARY_MENTIONS])
+        if len(bot_ids) > SUMMARY_MENTIONS:
+            mentions += f' and {len(bot_ids) - SUMMARY_MENTIONS} more'
+        embed.add_field(name=f"{label} ({len(bot_ids)})", value=mentions, inline=False)
+    if not embed.fields:
+        embed.description = 'No bots matched'
+    return embed
 
 
 class UptimeCog(commands.Cog):
@@ -13,22 +47,18 @@ class UptimeCog(commands.Cog):
     
     def __init__(self, bot):
         self.bot = bot
+        self.pages = PageCache()
     
     uptime_group = app_commands.Group(name="uptime", description="Uptime monitoring commands")
     
     @uptime_group.command(name="set-channel", description="Set the channel for uptime notifications")
     @app_commands.describe(channel="The channel to receive uptime notifications")
     @app_commands.checks.has_permissions(administrator=True)
+    @timed
     async def set_channel(self, interaction: discord.Interaction, channel: discord.TextChannel):
         """Set the notification channel for uptime alerts."""
-        data = load_data()
-        guild_id = str(interaction.guild_id)
-        
-        if 'channels' not in data:
-            data['channels'] = {}
-        
-        data['channels'][guild_id] = str(channel.id)
-        save_data(data)
+        guild_id = interaction.guild_id
+        self.bot.store.set_channel(guild_id, channel.id)
         
         await interaction.response.send_message(
             f'✅ Uptime notifications will be sent to {channel.mention}',
@@ -37,14 +67,12 @@ class UptimeCog(commands.Cog):
     
     @uptime_group.command(name="remove-channel", description="Remove the notification channel")
     @app_commands.checks.has_permissions(administrator=True)
+    @timed
     async def remove_channel(self, interaction: discord.Interaction):
         """Remove the notification channel."""
-        data = load_data()
-        guild_id = str(interaction.guild_id)
+        guild_id = interaction.guild_id
         
-        if guild_id in data.get('channels', {}):
-            del data['channels'][guild_id]
-            save_data(data)
+        if self.bot.store.remove_channel(guild_id):
             await interaction.response.send_message(
                 '✅ Notification channel has been removed',
                 ephemeral=True
@@ -56,9 +84,22 @@ class UptimeCog(commands.Cog):
             )
     
     @uptime_group.command(name="add-bot", description="Add a bot to monitor")
-    @app_commands.describe(bot_user="The bot to monitor")
+    @app_commands.describe(
+        bot_user="The bot to monitor",
+        check_interval="Minutes between status checks (changes the interval of a bot already monitored)",
+        probe="Health check target: an HTTP(S) URL or a TCP host:port (\"off\" removes it)"
+    )
     @app_commands.checks.has_permissions(administrator=True)
-    async def add_bot(self, interaction: discord.Interaction, bot_user: discord.Member):
+    @timed
+    async def add_bot(
+        self,
+        interaction: discord.Interaction,
+        bot_user: discord.Member,
+        check_interval: Optional[app_commands.Range[
+            int, MIN_CHECK_INTERVAL_SECONDS // 60, MAX_CHECK_INTERVAL_SECONDS // 60
+        ]] = None,
+        probe: Optional[app_commands.Range[str, 1, 200]] = None
+    ):
         """Add a bot to the uptime monitoring list."""
         if not bot_user.bot:
             await interaction.response.send_message(
@@ -67,67 +108,207 @@ class UptimeCog(commands.Cog):
             )
             return
         
-        data = load_data()
-        guild_id = str(interaction.guild_id)
-        bot_id = str(bot_user.id)
+        guild_id = interaction.guild_id
+        bot_id = bot_user.id
+        interval = check_interval * 60 if check_interval else None
         
-        if 'monitored_bots' not in data:
-            data['monitored_bots'] = {}
+        probe_target = probe.strip() if probe else None
+        if probe_target and probe_target.lower() == 'off':
+            probe_target = ''
+        if probe_target:
+            try:
+                await check_target(probe_target, self.bot.prober.allow_private)
+            except BlockedTarget:
+                await interaction.response.send_message(
+                    '⚠️ The probe must point to a public address',
+                    ephemeral=True
+                )
+                return
+            except ValueError:
+                await interaction.response.send_message(
+                    '⚠️ The probe must be an HTTP(S) URL or a TCP host:port',
+                    ephemeral=True
+                )
+                return
+            except (OSError, asyncio.TimeoutError):
+                await interaction.response.send_message(
+                    '⚠️ The probe host could not be resolved',
+                    ephemeral=True
+                )
+                return
         
-        if guild_id not in data['monitored_bots']:
-            data['monitored_bots'][guild_id] = []
-        
-        if bot_id in data['monitored_bots'][guild_id]:
+        if not self.bot.store.add_bot(guild_id, bot_id, interval, probe_target):
+            changes = []
+            if interval:
+                self.bot.store.set_check_interval(guild_id, bot_id, interval)
+                changes.append(f'checked every {check_interval} minute(s)')
+            if probe_target is not None:
+                self.bot.store.set_probe_target(guild_id, bot_id, probe_target)
+                changes.append(f'probed at `{probe_target}`' if probe_target else 'no longer probed')
+            if changes:
+                await interaction.response.send_message(
+                    f'✅ {bot_user.mention} is now ' + ' and '.join(changes),
+                    ephemeral=True
+                )
+                return
             await interaction.response.send_message(
                 f'⚠️ {bot_user.mention} is already being monitored',
                 ephemeral=True
             )
             return
         
-        data['monitored_bots'][guild_id].append(bot_id)
-        save_data(data)
-        
+        minutes = self.bot.store.get_check_interval(guild_id, bot_id) // 60
+        details = f'checked every {minutes} minute(s)' + (f', probed at `{probe_target}`' if probe_target else '')
         await interaction.response.send_message(
-            f'✅ Now monitoring {bot_user.mention} for uptime',
+            f'✅ Now monitoring {bot_user.mention} for uptime ({details})',
             ephemeral=True
         )
+        
+        # The interaction's member has no presence; fetch it into the cache
+        await self.bot.member_cache.cache(interaction.guild, [bot_id])
     
     @uptime_group.command(name="remove-bot", description="Remove a bot from monitoring")
     @app_commands.describe(bot_user="The bot to stop monitoring")
     @app_commands.checks.has_permissions(administrator=True)
+    @timed
     async def remove_bot(self, interaction: discord.Interaction, bot_user: discord.Member):
         """Remove a bot from the uptime monitoring list."""
-        data = load_data()
-        guild_id = str(interaction.guild_id)
-        bot_id = str(bot_user.id)
+        guild_id = interaction.guild_id
+        bot_id = bot_user.id
         
-        if guild_id not in data.get('monitored_bots', {}) or bot_id not in data['monitored_bots'][guild_id]:
+        # Also cleans up uptime stats for the removed bot
+        if not self.bot.store.remove_bot(guild_id, bot_id):
             await interaction.response.send_message(
                 f'⚠️ {bot_user.mention} is not being monitored',
                 ephemeral=True
             )
             return
         
-        data['monitored_bots'][guild_id].remove(bot_id)
-        
-        # Clean up uptime stats for the removed bot
-        if guild_id in data.get('uptime_stats', {}) and bot_id in data['uptime_stats'][guild_id]:
-            del data['uptime_stats'][guild_id][bot_id]
-        
-        save_data(data)
-        
         await interaction.response.send_message(
             f'✅ Stopped monitoring {bot_user.mention}',
             ephemeral=True
         )
     
+    @uptime_group.command(name="add-bots", description="Add several bots to monitor at once")
+    @app_commands.describe(
+        role="Monitor every bot with this role",
+        ids="Monitor these bots (IDs or mentions, separated by spaces or commas)",
+        all_bots="Monitor every bot in this server"
+    )
+    @app_commands.checks.has_permissions(administrator=True)
+    @timed
+    async def add_bots(
+        self,
+        interaction: discord.Interaction,
+        role: Optional[discord.Role] = None,
+        ids: Optional[str] = None,
+        all_bots: bool = False
+    ):
+        """Add every bot matched by a role, an ID list or the whole server in one batch."""
+        if not role and not ids and not all_bots:
+            await interaction.response.send_message(
+                '⚠️ Choose a role, a list of IDs or all bots',
+                ephemeral=True
+            )
+            return
+        
+        # Members that are not cached may have to be requested first
+        await interaction.response.defer(ephemeral=True)
+        
+        guild = interaction.guild
+        candidates = {}
+        skipped = []
+        
+        if all_bots or role:
+            bots = await self.bot.member_cache.bots(guild, None if all_bots else role)
+            candidates.update((member.id, member) for member in bots)
+        bot_ids = parse_ids(ids)
+        members = {bot_id: guild.get_member(bot_id) for bot_id in bot_ids}
+        missing = [bot_id for bot_id, member in members.items() if member is None]
+        if missing:
+            try:
+                members.update((member.id, member) for member in await fetch_members(guild, missing, cache=False))
+            except (asyncio.TimeoutError, discord.HTTPException, discord.ClientException) as e:
+                # The IDs that could not be looked up are reported as not found
+                print(f'Failed to fetch members of guild {guild.id}: {e}')
+        for bot_id in bot_ids:
+            member = members.get(bot_id)
+            if member and member.bot:
+                candidates[bot_id] = member
+            else:
+                skipped.append(bot_id)
+        
+        added = self.bot.store.add_bots(guild.id, candidates)
+        newly_added = set(added)
+        already = [bot_id for bot_id in candidates if bot_id not in newly_added]
+        
+        embed = bulk_summary(
+            "➕ Bulk Add",
+            ("✅ Now Monitoring", added),
+            ("⚠️ Already Monitored", already),
+            ("❓ Not Bots In This Server", skipped)
+        )
+        await interaction.followup.send(embed=embed, ephemeral=True)
+        
+        await self.bot.member_cache.cache(guild, added)
+    
+    @uptime_group.command(name="remove-bots", description="Remove several bots from monitoring at once")
+    @app_commands.describe(
+        role="Stop monitoring every bot with this role",
+        ids="Stop monitoring these bots (IDs or mentions, separated by spaces or commas)",
+        all_bots="Stop monitoring every bot in this server"
+    )
+    @app_commands.checks.has_permissions(administrator=True)
+    @timed
+    async def remove_bots(
+        self,
+        interaction: discord.Interaction,
+        role: Optional[discord.Role] = None,
+        ids: Optional[str] = None,
+        all_bots: bool = False
+    ):
+        """Remove every bot matched by a role, an ID list or the whole server in one batch."""
+        if not role and not ids and not all_bots:
+            await interaction.response.send_message(
+                '⚠️ Choose a role, a list of IDs or all bots',
+                ephemeral=True
+            )
+            return
+        
+        if role:
+            # Members that are not cached may have to be requested first
+            await interaction.response.defer(ephemeral=True)
+        
+        guild_id = interaction.guild_id
+        candidates = list(parse_ids(ids))
+        if role:
+            candidates.extend(member.id for member in await self.bot.member_cache.bots(interaction.guild, role))
+        if all_bots:
+            candidates.extend(self.bot.store.get_monitored(guild_id))
+        candidates = list(dict.fromkeys(candidates))
+        
+        # Also cleans up uptime stats for the removed bots
+        removed = self.bot.store.remove_bots(guild_id, candidates)
+        was_removed = set(removed)
+        not_monitored = [bot_id for bot_id in candidates if bot_id not in was_removed]
+        
+        embed = bulk_summary(
+            "➖ Bulk Remove",
+            ("✅ Stopped Monitoring", removed),
+            ("⚠️ Not Monitored", not_monitored)
+        )
+        if role:
+            await interaction.followup.send(embed=embed, ephemeral=True)
+        else:
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+    
     @uptime_group.command(name="list", description="List all monitored bots")
+    @timed
     async def list_bots(self, interaction: discord.Interaction):
         """List all bots being monitored in this server."""
-        data = load_data()
-        guild_id = str(interaction.guild_id)
+        guild_id = interaction.guild_id
         
-        monitored = data.get('monitored_bots', {}).get(guild_id, [])
+        monitored = self.bot.store.get_monitored(guild_id)
         
         if not monitored:
             await interaction.response.send_message(
@@ -136,30 +317,46 @@ class UptimeCog(commands.Cog):
             )
             return
         
-        embed = discord.Embed(
-            title="📊 Monitored Bots",
-            color=discord.Color.blue()
+        pages = self.pages.get(
+            guild_id,
+            'list',
+            self.bot.store.guild_version(guild_id),
+            lambda: self._list_pages(interaction.guild)
         )
+        await send_pages(interaction, pages)
+    
+    def _list_pages(self, guild):
+        """Build the lazily rendered pages of /uptime list for a guild."""
+        store = self.bot.store
+        channel_id = store.get_channel(guild.id)
+        channel = guild.get_channel(channel_id) if channel_id else None
         
-        bot_list = []
-        for bot_id in monitored:
-            member = interaction.guild.get_member(int(bot_id))
-            if member:
-                status_emoji = "🟢" if str(member.status) != "offline" else "🔴"
-                bot_list.append(f"{status_emoji} {member.mention} ({member.name})")
-            else:
-                bot_list.append(f"❓ Unknown bot (ID: {bot_id})")
-        
-        embed.description = "\n".join(bot_list)
-        
-        # Add notification channel info
-        channel_id = data.get('channels', {}).get(guild_id)
-        if channel_id:
-            channel = interaction.guild.get_channel(int(channel_id))
+        def render(bot_ids, index, count):
+            embed = discord.Embed(
+                title="📊 Monitored Bots",
+                color=discord.Color.blue()
+            )
+            
+            bot_list = []
+            for bot_id in bot_ids:
+                member = guild.get_member(bot_id)
+                if member:
+                    status_emoji = "🟢" if str(member.status) != "offline" else "🔴"
+                    bot_list.append(f"{status_emoji} {member.mention} ({member.name})")
+                else:
+                    bot_list.append(f"❓ Unknown bot (ID: {bot_id})")
+            
+            embed.description = "\n".join(bot_list)
+            
+            # Add notification channel info
             if channel:
                 embed.add_field(name="Notification Channel", value=channel.mention, inline=False)
+            
+            if count > 1:
+                embed.set_footer(text=f"Page {index + 1}/{count}")
+            return embed
         
-        await interaction.response.send_message(embed=embed)
+        return PageSet(store.get_monitored(guild.id), LINES_PER_PAGE, render)
 
 
 async def setup(bot):
@@ -2,10 +2,81 @@
 Member commands for viewing uptime statistics.
 """
 
+import asyncio
+import io
+import tempfile
+import time
+from typing import Optional
+
 import discord
 from discord import app_commands
 from discord.ext import commands
-from utils.data import load_data
+from utils.charts import (
+    HEATMAP_DAYS, TIMELINE_SECONDS, TIMELINE_WIDTH, ChartRenderer,
+    heatmap_cells, heatmap_start, render_heatmap, render_timeline, timeline_intervals
+)
+from utils.export import export_filename, export_rows, stats_rows, write_export
+from utils.model import Status
+from utils.monitor import get_durations, uptime_percentage, format_duration
+from utils.pages import PageCache, PageSet, send_pages
+from utils.profiling import timed
+
+# Time windows offered by /view-uptime, in seconds
+WINDOW_CHOICES = [
+    app_commands.Choice(name="Last 24 hours", value=86400),
+    app_commands.Choice(name="Last 7 days", value=7 * 86400),
+    app_commands.Choice(name="Last 30 days", value=30 * 86400),
+    app_commands.Choice(name="Last 90 days", value=90 * 86400),
+]
+
+# Charts /view-uptime user can attach
+CHART_CHOICES = [
+    app_commands.Choice(name="24 hour timeline", value="timeline"),
+    app_commands.Choice(name="30 day heatmap", value="heatmap"),
+]
+
+# File formats /view-uptime export can write
+FORMAT_CHOICES = [
+    app_commands.Choice(name="CSV", value="csv"),
+    app_commands.Choice(name="NDJSON", value="ndjson"),
+]
+
+# Bots per /view-uptime all page (Discord allows 25 embed fields)
+FIELDS_PER_PAGE = 12
+
+
+def current_status(store, guild, bot_id, stats):
+    """
+    Get a bot's current Status from the recorded state, falling back to the member cache.
+
+    Members resolved from command options carry no presence, so their own
+    status always reads offline.
+    """
+    status = store.get_presence(bot_id)
+    if status is None and stats is not None:
+        status = stats.last_status
+    if status is None:
+        member = guild.get_member(bot_id) if guild else None
+        status = Status.parse(member.status) if member else Status.OFFLINE
+    return status
+
+
+def probe_summary(target, probe):
+    """Describe a bot's health probe target and its results so far."""
+    if probe is None or not probe.ok + probe.failed:
+        return f'`{target}`\nNot probed yet'
+    
+    total = probe.ok + probe.failed
+    state = '✅ Healthy' if probe.last_ok else '❌ Failing'
+    if probe.last_probe:
+        state += f' (<t:{probe.last_probe}:R>)'
+    lines = [
+        f'`{target}` · {state}',
+        f'Success rate: {uptime_percentage(probe.ok, probe.failed):.1f}% of {total} probes',
+    ]
+    if probe.p50 is not None:
+        lines.append(f'Latency: p50 {probe.p50:.0f}ms · p95 {probe.p95:.0f}ms · p99 {probe.p99:.0f}ms')
+    return '\n'.join(lines)
 
 
 class ViewUptimeCog(commands.Cog):
@@ -13,12 +84,30 @@ class ViewUptimeCog(commands.Cog):
     
     def __init__(self, bot):
         self.bot = bot
+        self.pages = PageCache()
+        self.charts = ChartRenderer()
+    
+    def cog_unload(self):
+        """Stop the chart worker process."""
+        self.charts.close()
     
     view_uptime_group = app_commands.Group(name="view-uptime", description="View uptime statistics")
     
     @view_uptime_group.command(name="user", description="View uptime statistics for a bot")
-    @app_commands.describe(bot_user="The bot to view uptime for")
-    async def view_user_uptime(self, interaction: discord.Interaction, bot_user: discord.Member):
+    @app_commands.describe(
+        bot_user="The bot to view uptime for",
+        window="Only count this time window",
+        chart="Attach an uptime chart"
+    )
+    @app_commands.choices(window=WINDOW_CHOICES, chart=CHART_CHOICES)
+    @timed
+    async def view_user_uptime(
+        self,
+        interaction: discord.Interaction,
+        bot_user: discord.Member,
+        window: Optional[app_commands.Choice[int]] = None,
+        chart: Optional[app_commands.Choice[str]] = None
+    ):
         """View uptime statistics for a specific bot."""
         if not bot_user.bot:
             await interaction.response.send_message(
@@ -27,38 +116,51 @@ class ViewUptimeCog(commands.Cog):
             )
             return
         
-        data = load_data()
-        guild_id = str(interaction.guild_id)
-        bot_id = str(bot_user.id)
+        guild_id = interaction.guild_id
+        bot_id = bot_user.id
         
         # Check if the bot is being monitored
-        if guild_id not in data.get('monitored_bots', {}) or bot_id not in data['monitored_bots'][guild_id]:
+        if not self.bot.store.is_monitored(guild_id, bot_id):
             await interaction.response.send_message(
                 f'⚠️ {bot_user.mention} is not being monitored. Use `/uptime add-bot` to start monitoring.',
                 ephemeral=True
             )
             return
         
+        if chart:
+            # Rendering may take a moment the first time
+            await interaction.response.defer()
+        
         # Get uptime stats
-        stats = data.get('uptime_stats', {}).get(guild_id, {}).get(bot_id, {})
+        stats = self.bot.store.get_stats(guild_id, bot_id)
         
-        online_time = stats.get('online_time', 0)
-        offline_time = stats.get('offline_time', 0)
-        total_time = online_time + offline_time
+        # Current status
+        status = current_status(self.bot.store, interaction.guild, bot_id, stats)
+        status_emoji = "🟢" if status.online else "🔴"
+        status_text = "Online" if status.online else "Offline"
         
-        if total_time == 0:
-            uptime_percentage = 0.0
+        outages = None
+        if window:
+            # Uptime comes from the rollups; outages from the transition log while it still covers the window
+            end = time.time()
+            start = end - window.value
+            online_time, observed_time = self.bot.store.get_uptime(guild_id, bot_id, start, end)
+            offline_time = observed_time - online_time
+            
+            history = self.bot.store.history
+            if history is not None and window.value <= history.retention_seconds:
+                transitions = await self.bot.store.get_transitions(guild_id, bot_id, start, end)
+                outages = sum(1 for transition in transitions if transition[4] == 'offline')
+            title = f"📊 Uptime Statistics for {bot_user.name} ({window.name})"
         else:
-            uptime_percentage = (online_time / total_time) * 100
+            online_time, offline_time = get_durations(stats)
+            title = f"📊 Uptime Statistics for {bot_user.name}"
         
-        # Current status
-        current_status = str(bot_user.status)
-        status_emoji = "🟢" if current_status != "offline" else "🔴"
-        status_text = "Online" if current_status != "offline" else "Offline"
+        uptime = uptime_percentage(online_time, offline_time)
         
         embed = discord.Embed(
-            title=f"📊 Uptime Statistics for {bot_user.name}",
-            color=discord.Color.green() if current_status != "offline" else discord.Color.red()
+            title=title,
+            color=discord.Color.green() if status.online else discord.Color.red()
         )
         
         embed.set_thumbnail(url=bot_user.display_avatar.url if bot_user.display_avatar else None)
@@ -71,86 +173,299 @@ class ViewUptimeCog(commands.Cog):
         
         embed.add_field(
             name="Uptime Percentage",
-            value=f"{uptime_percentage:.2f}%",
+            value=f"{uptime:.2f}%",
+            inline=True
+        )
+        
+        embed.add_field(
+            name="Time Monitored",
+            value=format_duration(online_time + offline_time),
             inline=True
         )
         
         embed.add_field(
-            name="Total Checks",
-            value=str(total_time),
+            name="Time Online",
+            value=format_duration(online_time),
             inline=True
         )
         
         embed.add_field(
-            name="Online Checks",
-            value=str(online_time),
+            name="Time Offline",
+            value=format_duration(offline_time),
             inline=True
         )
         
+        if outages is not None:
+            embed.add_field(
+                name="Outages",
+                value=str(outages),
+                inline=True
+            )
+        
+        last_change = stats.last_change if stats else None
         embed.add_field(
-            name="Offline Checks",
-            value=str(offline_time),
+            name="Last Status Change",
+            value=f"<t:{last_change}:f>" if last_change else 'Never',
             inline=True
         )
         
-        last_check = stats.get('last_check', 'Never')
+        last_check = stats.last_check if stats else None
         embed.add_field(
             name="Last Check",
-            value=last_check,
+            value=f"<t:{last_check}:R>" if last_check else 'Never',
             inline=True
         )
         
+        probe_target = self.bot.store.get_probe_target(guild_id, bot_id)
+        if probe_target:
+            embed.add_field(
+                name="Health Probe",
+                value=probe_summary(probe_target, stats.probe if stats else None),
+                inline=False
+            )
+        
+        if chart:
+            image = await self._render_chart(chart.value, guild_id, bot_id, status, stats)
+            filename = f"{chart.value}.png"
+            embed.set_image(url=f"attachment://{filename}")
+            await interaction.followup.send(embed=embed, file=discord.File(io.BytesIO(image), filename=filename))
+            return
+        
         await interaction.response.send_message(embed=embed)
     
+    async def _render_chart(self, kind, guild_id, bot_id, status, stats):
+        """Render a bot's timeline or heatmap, reusing the cached image until it would change."""
+        store = self.bot.store
+        now = time.time()
+        last_change = stats.last_change if stats else None
+        
+        if kind == 'timeline':
+            # Align the window to whole columns so an image stays valid until the next column
+            column_seconds = TIMELINE_SECONDS / TIMELINE_WIDTH
+            column = int(now // column_seconds)
+            key = (guild_id, bot_id, kind, last_change, column)
+            image = self.charts.cached(key)
+            if image is not None:
+                return image
+            
+            end = (column + 1) * column_seconds
+            start = end - TIMELINE_SECONDS
+            transitions = await store.get_transitions(guild_id, bot_id, start, end)
+            intervals = timeline_intervals(
+                transitions, start, min(end, now), status,
+                stats.first_seen if stats else now, stats.last_check if stats else None
+            )
+            return await self.charts.render(key, render_timeline, start, end, intervals)
+        
+        key = (guild_id, bot_id, kind, last_change, int(now // 3600))
+        image = self.charts.cached(key)
+        if image is not None:
+            return image
+        
+        start = heatmap_start(now)
+        cells = heatmap_cells(store.get_uptime_series(guild_id, bot_id, start, start + HEATMAP_DAYS * 86400))
+        return await self.charts.render(key, render_heatmap, cells)
+    
     @view_uptime_group.command(name="all", description="View uptime statistics for all monitored bots")
-    async def view_all_uptime(self, interaction: discord.Interaction):
+    @app_commands.describe(window="Only count this time window")
+    @app_commands.choices(window=WINDOW_CHOICES)
+    @timed
+    async def view_all_uptime(
+        self,
+        interaction: discord.Interaction,
+        window: Optional[app_commands.Choice[int]] = None
+    ):
         """View uptime statistics for all monitored bots in the server."""
-        data = load_data()
-        guild_id = str(interaction.guild_id)
-        
-        monitored = data.get('monitored_bots', {}).get(guild_id, [])
+        guild_id = interaction.guild_id
         
-        if not monitored:
+        if not self.bot.store.get_monitored(guild_id):
             await interaction.response.send_message(
                 '📋 No bots are currently being monitored in this server',
                 ephemeral=True
             )
             return
         
-        embed = discord.Embed(
-            title="📊 Uptime Statistics - All Bots",
-            color=discord.Color.blue()
+        pages = self.pages.get(
+            guild_id,
+            ('all', window.value if window else None),
+            self.bot.store.guild_version(guild_id),
+            lambda: self._all_uptime_pages(interaction.guild, window)
         )
+        await send_pages(interaction, pages)
+    
+    def _all_uptime_pages(self, guild, window):
+        """Build the lazily rendered pages of /view-uptime all for a guild."""
+        store = self.bot.store
+        title = "📊 Uptime Statistics - All Bots" + (f" ({window.name})" if window else "")
+        end = time.time()
         
-        for bot_id in monitored:
-            member = interaction.guild.get_member(int(bot_id))
-            stats = data.get('uptime_stats', {}).get(guild_id, {}).get(bot_id, {})
-            
-            online_time = stats.get('online_time', 0)
-            offline_time = stats.get('offline_time', 0)
-            total_time = online_time + offline_time
+        def render(bot_ids, index, count):
+            embed = discord.Embed(title=title, color=discord.Color.blue())
             
-            if total_time == 0:
-                uptime_percentage = 0.0
-            else:
-                uptime_percentage = (online_time / total_time) * 100
+            for bot_id in bot_ids:
+                member = guild.get_member(bot_id)
+                
+                if window:
+                    online_time, observed_time = store.get_uptime(guild.id, bot_id, end - window.value, end)
+                    offline_time = observed_time - online_time
+                else:
+                    online_time, offline_time = get_durations(store.get_stats(guild.id, bot_id))
+                uptime = uptime_percentage(online_time, offline_time)
+                
+                if member:
+                    current_status = str(member.status)
+                    status_emoji = "🟢" if current_status != "offline" else "🔴"
+                    embed.add_field(
+                        name=f"{status_emoji} {member.name}",
+                        value=f"Uptime: {uptime:.2f}%\nMonitored: {format_duration(online_time + offline_time)}",
+                        inline=True
+                    )
+                else:
+                    embed.add_field(
+                        name=f"❓ Unknown Bot",
+                        value=f"ID: {bot_id}\nUptime: {uptime:.2f}%",
+                        inline=True
+                    )
             
-            if member:
-                current_status = str(member.status)
-                status_emoji = "🟢" if current_status != "offline" else "🔴"
-                embed.add_field(
-                    name=f"{status_emoji} {member.name}",
-                    value=f"Uptime: {uptime_percentage:.2f}%\nChecks: {total_time}",
-                    inline=True
-                )
-            else:
-                embed.add_field(
-                    name=f"❓ Unknown Bot",
-                    value=f"ID: {bot_id}\nUptime: {uptime_percentage:.2f}%",
-                    inline=True
-                )
+            if count > 1:
+                embed.set_footer(text=f"Page {index + 1}/{count}")
+            return embed
+        
+        return PageSet(store.get_monitored(guild.id), FIELDS_PER_PAGE, render)
+    
+    @view_uptime_group.command(name="global", description="View a bot's uptime since any server started monitoring it")
+    @app_commands.describe(
+        bot_user="The bot to view uptime for",
+        window="Only count this time window"
+    )
+    @app_commands.choices(window=WINDOW_CHOICES)
+    @timed
+    async def view_global_uptime(
+        self,
+        interaction: discord.Interaction,
+        bot_user: discord.User,
+        window: Optional[app_commands.Choice[int]] = None
+    ):
+        """View a bot's uptime since any server started monitoring it."""
+        if not bot_user.bot:
+            await interaction.response.send_message(
+                '⚠️ The specified user is not a bot',
+                ephemeral=True
+            )
+            return
+        
+        # Read from the bot's stats, shared by every server monitoring it
+        store = self.bot.store
+        if window:
+            end = time.time()
+            guild_count, online_time, offline_time = store.get_global_uptime(bot_user.id, end - window.value, end)
+            title = f"🌐 Global Uptime for {bot_user.name} ({window.name})"
+        else:
+            guild_count, online_time, offline_time = store.get_global_uptime(bot_user.id)
+            title = f"🌐 Global Uptime for {bot_user.name}"
+        
+        if not guild_count:
+            await interaction.response.send_message(
+                f'⚠️ {bot_user.mention} is not being monitored in any server',
+                ephemeral=True
+            )
+            return
+        
+        status = store.get_presence(bot_user.id)
+        embed = discord.Embed(
+            title=title,
+            color=discord.Color.red() if status is not None and not status.online else discord.Color.green()
+        )
+        
+        embed.set_thumbnail(url=bot_user.display_avatar.url if bot_user.display_avatar else None)
+        
+        if status is None:
+            status_text = "❓ Not checked yet"
+        else:
+            status_text = "🟢 Online" if status.online else "🔴 Offline"
+        embed.add_field(name="Current Status", value=status_text, inline=True)
+        
+        embed.add_field(
+            name="Uptime Percentage",
+            value=f"{uptime_percentage(online_time, offline_time):.2f}%",
+            inline=True
+        )
+        
+        embed.add_field(name="Servers Monitoring", value=str(guild_count), inline=True)
+        
+        embed.add_field(
+            name="Time Monitored",
+            value=format_duration(online_time + offline_time),
+            inline=True
+        )
+        
+        embed.add_field(
+            name="Time Online",
+            value=format_duration(online_time),
+            inline=True
+        )
+        
+        embed.add_field(
+            name="Time Offline",
+            value=format_duration(offline_time),
+            inline=True
+        )
         
         await interaction.response.send_message(embed=embed)
+    
+    @view_uptime_group.command(name="export", description="Export uptime stats and history as a file")
+    @app_commands.describe(
+        file_format="File format (default CSV)",
+        window="Only export transitions from this time window (default all kept history)"
+    )
+    @app_commands.choices(file_format=FORMAT_CHOICES, window=WINDOW_CHOICES)
+    @app_commands.checks.has_permissions(administrator=True)
+    @timed
+    async def export(
+        self,
+        interaction: discord.Interaction,
+        file_format: Optional[app_commands.Choice[str]] = None,
+        window: Optional[app_commands.Choice[int]] = None
+    ):
+        """Export the server's per-bot stats and transition history as a gzipped CSV or NDJSON file."""
+        guild_id = interaction.guild_id
+        store = self.bot.store
+        
+        if not store.get_monitored(guild_id):
+            await interaction.response.send_message(
+                '📋 No bots are currently being monitored in this server',
+                ephemeral=True
+            )
+            return
+        
+        await interaction.response.defer(ephemeral=True)
+        
+        fmt = file_format.value if file_format else 'csv'
+        end = time.time()
+        start = end - window.value if window else 0
+        
+        # Snapshot the stats, logged segment sizes and unflushed transitions here,
+        # then stream the logged transitions and compress them in a worker thread
+        stats = stats_rows(guild_id, store.guilds[guild_id], store.check_interval)
+        sizes, pending = await store.history_snapshot(guild_id, start, end)
+        rows = export_rows(stats, store.history, guild_id, store.get_monitored(guild_id), start, end, pending, sizes)
+        
+        with tempfile.TemporaryFile() as f:
+            size = await asyncio.to_thread(write_export, f, rows, fmt)
+            if size > interaction.guild.filesize_limit:
+                await interaction.followup.send(
+                    f'⚠️ The export is {size / 1e6:.1f} MB, over this server\'s upload limit. '
+                    f'Pick a shorter window, or run `python -m utils.export {guild_id}` on the bot\'s host',
+                    ephemeral=True
+                )
+                return
+            
+            f.seek(0)
+            await interaction.followup.send(
+                f'📤 Uptime export for {len(stats)} bot(s)' + (f' ({window.name})' if window else ''),
+                file=discord.File(f, filename=export_filename(guild_id, fmt)),
+                ephemeral=True
+            )
 
 
 async def setup(bot):
@@ -0,0 +1,41 @@
+"""
+Stand-in cluster worker for the coordinator tests, without a Discord gateway.
+
+It reports the status of fake guilds on the shards it was given, like
+``bot.py`` does. The first time worker 0 runs, it exits after a few
+reports, so the coordinator has to restart it.
+"""
+
+import asyncio
+import os
+import sys
+
+from benchmarks.stubs import FakeBot, FakeGuild
+from utils.cluster import ClusterClient
+from utils.shards import collect_status
+
+
+async def main():
+    worker_id = int(os.environ['CLUSTER_WORKER_ID'])
+    shard_ids = [int(shard_id) for shard_id in os.environ['CLUSTER_SHARD_IDS'].split(',')]
+    bot = FakeBot([FakeGuild((shard_id + 1) << 22, shard_id) for shard_id in shard_ids], None)
+    bot.latencies = [(shard_id, 0.05) for shard_id in shard_ids]
+
+    marker = os.path.join(os.environ['STUB_WORKER_DIR'], f'worker-{worker_id}.started')
+    restarted = os.path.exists(marker)
+    open(marker, 'a').close()
+    crash = worker_id == 0 and not restarted
+
+    client = ClusterClient(
+        os.environ['CLUSTER_ADDRESS'], worker_id,
+        lambda: {**collect_status(bot), 'shard_count': int(os.environ['SHARD_COUNT']), 'restarted': restarted},
+        interval=0.1
+    )
+    client.start()
+    await asyncio.sleep(0.3 if crash else 60)
+    await client.close()
+    return 1 if crash else 0
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
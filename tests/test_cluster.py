@@ -0,0 +1,127 @@
+"""
+Tests for cluster mode.
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+from utils.cluster import (
+    SHARD_HISTORY_DIR, SHARD_ROLLUP_FILE, ClusterClient, Coordinator, repartition_history, repartition_rollups
+)
+from utils.history import TransitionLog, open_log
+from utils.model import Status
+from utils.rollup import Rollup, dump_rollups, load_rollups, load_shard_rollups, write_rollups
+from utils.storage import get_backend
+from utils.store import DataStore
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STUB_WORKER = os.path.join(ROOT, 'tests', 'cluster_worker.py')
+NOW = 1_700_000_000
+# Guilds on shards 0, 1, 2 and 3 of 4
+GUILDS = [(shard << 22) + (4 << 22) for shard in range(4)]
+
+
+def rollups_for(guild_ids):
+    """Make a rollup crediting an hour online for one bot of each guild."""
+    rollups = {}
+    for guild_id in guild_ids:
+        rollup = rollups[(guild_id, guild_id + 1)] = Rollup()
+        rollup.credit(NOW - 3600, NOW, True)
+    return rollups
+
+
+def test_rollups_follow_their_shard_to_another_worker(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    async def save(shard_ids):
+        store = DataStore(get_backend('json'), rollup_file=SHARD_ROLLUP_FILE, shard_ids=shard_ids, shard_count=4)
+        for guild_id in GUILDS:
+            if guild_id >> 22 & 3 in shard_ids:
+                store.add_bot(guild_id, guild_id + 1)
+                store.record_status(guild_id, guild_id + 1, Status.ONLINE, NOW)
+        await store.flush(force=True)
+
+    # Two workers save their shards, then a single worker takes over shards 1 and 2
+    asyncio.run(save([0, 1]))
+    asyncio.run(save([2, 3]))
+    store = DataStore(get_backend('json'), rollup_file=SHARD_ROLLUP_FILE, shard_ids=[1, 2], shard_count=4)
+    assert set(store.rollups) == {guild_id + 1 for guild_id in GUILDS[1:3]}
+
+
+def test_history_follows_its_shard_to_another_worker(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    log = open_log(SHARD_HISTORY_DIR, [0, 1, 2, 3], 4)
+    for guild_id in GUILDS:
+        log.append(guild_id, guild_id + 1, 'online', 'offline', NOW)
+    log.write(log.take_pending())
+
+    log = open_log(SHARD_HISTORY_DIR, [2], 4)
+    assert [record[1] for record in log.read(0, NOW + 1)] == [GUILDS[2]]
+    assert [record[1] for record in log.read(0, NOW + 1, GUILDS[2])] == [GUILDS[2]]
+
+
+def test_repartition_moves_other_layouts_to_current_shards(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # Per-worker files of the old layout, and the log of a single process
+    write_rollups(dump_rollups(rollups_for(GUILDS[:2])), 'rollups-0.bin')
+    write_rollups(dump_rollups(rollups_for(GUILDS[2:])), 'rollups-1.bin')
+    for path, guild_ids in ((os.path.join('history', 'worker-0'), GUILDS[:2]), ('history', GUILDS[2:])):
+        log = TransitionLog(path)
+        for guild_id in guild_ids:
+            log.append(guild_id, guild_id + 1, 'online', 'offline', NOW)
+        log.write(log.take_pending())
+
+    assert repartition_rollups(2) == 2
+    assert repartition_history(2) == 2
+
+    assert not os.path.exists('rollups-0.bin') and not os.path.exists('rollups-1.bin')
+    assert not os.path.exists(os.path.join('history', 'worker-0'))
+    for shard_id in range(2):
+        expected = {guild_id for guild_id in GUILDS if (guild_id >> 22) % 2 == shard_id}
+        rollups = load_shard_rollups(SHARD_ROLLUP_FILE, [shard_id], 2)
+        assert {guild_id for guild_id, _ in rollups} == expected
+        log = open_log(SHARD_HISTORY_DIR, [shard_id], 2)
+        assert {record[1] for record in log.read(0, NOW + 1)} == expected
+    # A second run finds nothing left to move
+    assert repartition_rollups(2) == 0
+    assert repartition_history(2) == 0
+    assert load_rollups('rollups-0.bin') == {}
+
+
+def test_coordinator_with_stub_workers(tmp_path, monkeypatch):
+    """Workers get contiguous shard ranges, a dead worker is restarted and status is aggregated over IPC."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('PYTHONPATH', ROOT)
+    monkeypatch.setenv('STUB_WORKER_DIR', str(tmp_path))
+
+    async def run():
+        coordinator = Coordinator(2, 5, port=0, command=[sys.executable, STUB_WORKER], restart_delay=0.1)
+        task = asyncio.create_task(coordinator.run())
+        try:
+            while coordinator._server is None:
+                await asyncio.sleep(0.01)
+            client = ClusterClient(f'{coordinator.host}:{coordinator.port}', None, None)
+            deadline = time.monotonic() + 20
+            while time.monotonic() < deadline:
+                workers = await client.request_status()
+                if all('shards' in worker for worker in workers.values()) and workers['0']['restarted']:
+                    break
+                await asyncio.sleep(0.1)
+            return coordinator, workers
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    coordinator, workers = asyncio.run(run())
+    assert coordinator.worker_env(1)['CLUSTER_SHARD_IDS'] == '3,4'
+    assert workers['0']['shard_ids'] == [0, 1, 2]
+    assert workers['1']['shard_ids'] == [3, 4]
+    for worker in workers.values():
+        assert worker['running']
+        assert worker['shard_count'] == 5
+        # Each worker runs exactly the shards it was assigned
+        assert [shard['id'] for shard in worker['shards']] == worker['shard_ids']
+    assert workers['0']['restarted'] and not workers['1']['restarted']
+    assert sum(worker['guilds'] for worker in workers.values()) == 5
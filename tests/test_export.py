@@ -0,0 +1,33 @@
+"""
+Tests for exports taken while the store keeps flushing.
+"""
+
+import asyncio
+
+from utils.export import export_rows
+from utils.history import TransitionLog
+from utils.storage import get_backend
+from utils.store import DataStore
+
+
+def test_export_does_not_repeat_transitions_flushed_meanwhile(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    now = 1_700_000_000
+
+    async def run():
+        history = TransitionLog(str(tmp_path / 'history'))
+        store = DataStore(get_backend('json'), history=history, rollup_file=None)
+        store.add_bot(1, 10)
+        history.append(1, 10, 'online', 'offline', now)
+        await store.flush()
+        history.append(1, 10, 'offline', 'online', now + 60)
+
+        sizes, pending = await store.history_snapshot(1, 0, now + 3600)
+        # A flush between the snapshot and the export writes the pending transition
+        store.mark_dirty(1, 10)
+        await store.flush()
+        history.append(1, 10, 'online', 'offline', now + 120)
+        return list(export_rows([], history, 1, [10], 0, now + 3600, pending, sizes))
+
+    rows = asyncio.run(run())
+    assert [(row['old_status'], row['new_status']) for row in rows] == [('online', 'offline'), ('offline', 'online')]
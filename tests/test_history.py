@@ -0,0 +1,70 @@
+"""
+Tests for the segment-rotated transition log.
+"""
+
+import os
+
+from utils.history import TransitionLog
+
+HOUR = 3600
+
+
+def segment_files(path):
+    """Get the segment start times of the files in a log directory."""
+    return sorted(int(name.split('.')[0]) for name in os.listdir(path))
+
+
+def test_transitions_are_split_into_segments_and_reads_only_open_overlapping_ones(tmp_path):
+    path = str(tmp_path / 'history')
+    log = TransitionLog(path, segment_seconds=HOUR)
+    for timestamp in (100, HOUR + 100, 2 * HOUR + 100):
+        log.append(1, 10, 'online', 'offline', timestamp)
+    log.write(log.take_pending())
+    log.append(1, 10, 'offline', 'online', HOUR + 200)
+
+    assert segment_files(path) == [0, HOUR, 2 * HOUR]
+
+    opened = []
+    read_segment = log._read_segment
+
+    def tracked_read_segment(start, size=None):
+        opened.append(start)
+        return read_segment(start, size)
+
+    log._read_segment = tracked_read_segment
+    records = log.read(HOUR, 2 * HOUR)
+
+    assert opened == [HOUR]
+    # Unflushed transitions are included
+    assert records == [(HOUR + 100, 1, 10, 'online', 'offline'), (HOUR + 200, 1, 10, 'offline', 'online')]
+    # A reopened log finds the segments on disk
+    assert TransitionLog(path, segment_seconds=HOUR).read(0, 3 * HOUR) == [
+        (100, 1, 10, 'online', 'offline'),
+        (HOUR + 100, 1, 10, 'online', 'offline'),
+        (2 * HOUR + 100, 1, 10, 'online', 'offline'),
+    ]
+
+
+def test_maintain_drops_expired_segments_and_unmonitored_bots(tmp_path):
+    path = str(tmp_path / 'history')
+    log = TransitionLog(path, segment_seconds=HOUR, retention_days=1)
+    now = 100_000
+    records = [
+        # Past the retention period
+        (100, 1, 10, 'online', 'offline'),
+        # A closed segment with a bot that is no longer monitored
+        (20_000, 1, 10, 'offline', 'online'),
+        (20_060, 1, 11, 'online', 'offline'),
+        # A closed segment with only that bot
+        (30_000, 1, 11, 'offline', 'online'),
+        # The current segment is left alone
+        (now - 60, 1, 11, 'online', 'offline'),
+    ]
+    log.write(records)
+
+    assert log.maintain({10}, now) == 2
+    assert segment_files(path) == [18_000, 97_200]
+    reopened = TransitionLog(path, segment_seconds=HOUR, retention_days=1)
+    assert reopened.read(0, now) == [records[1], records[4]]
+    # Nothing left to do
+    assert reopened.maintain({10}, now) == 0
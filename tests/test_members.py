@@ -0,0 +1,76 @@
+"""
+Tests for caching only the monitored bots.
+"""
+
+import asyncio
+import time
+
+from benchmarks.stubs import FakeBot, FakeMember, make_guilds
+from utils.members import MonitoredMembers
+from utils.storage import get_backend
+from utils.store import DataStore
+
+
+def uncached_guilds(guild_count, delay):
+    """Make guilds whose members must be requested, each request taking ``delay`` seconds."""
+    guilds, data = make_guilds(guild_count, 2)
+    for guild in guilds:
+        members = guild.members
+        guild._members = {}
+        guild.chunked = False
+        guild.requests = 0
+
+        async def query_members(*, user_ids, guild=guild, members=members, **kwargs):
+            guild.requests += 1
+            await asyncio.sleep(delay)
+            found = [member for member in members if member.id in user_ids]
+            guild._members.update((member.id, member) for member in found)
+            return found
+
+        async def chunk(*, cache=True, guild=guild, members=members):
+            guild.requests += 1
+            await asyncio.sleep(delay)
+            return members + [FakeMember(guild.id + 1, 'user', bot=False, guild=guild)]
+
+        guild.query_members = query_members
+        guild.chunk = chunk
+    return guilds, data
+
+
+def test_cache_shard_fetches_guilds_concurrently(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    guilds, data = uncached_guilds(40, 0.05)
+
+    async def run():
+        store = DataStore(get_backend('json'), rollup_file=None)
+        store.guilds = {}
+        for guild_id, bot_ids in data['monitored_bots'].items():
+            store.add_bots(int(guild_id), [int(bot_id) for bot_id in bot_ids])
+        members = MonitoredMembers(FakeBot(guilds, store), True)
+        started = time.perf_counter()
+        fetched = await members.cache_shard(0)
+        return fetched, time.perf_counter() - started
+
+    fetched, elapsed = asyncio.run(run())
+    assert fetched == 80
+    # One at a time would take 40 * 0.05 seconds
+    assert elapsed < 1
+    assert all(len(guild.members) == 2 for guild in guilds)
+
+
+def test_bots_reuses_the_requested_members():
+    guilds, _ = uncached_guilds(1, 0)
+    guild = guilds[0]
+
+    async def run():
+        members = MonitoredMembers(FakeBot(guilds, None), True)
+        first = await members.bots(guild)
+        second = await members.bots(guild)
+        members.forget_bots(guild.id)
+        third = await members.bots(guild)
+        return first, second, third
+
+    first, second, third = asyncio.run(run())
+    assert len(first) == 2 and all(member.bot for member in first)
+    assert second == first and third == first
+    assert guild.requests == 2
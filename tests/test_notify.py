@@ -0,0 +1,85 @@
+"""
+Tests for notification coalescing and flap damping.
+"""
+
+import asyncio
+
+from benchmarks.stubs import FakeMember
+from utils.notify import Notifier
+
+
+class RecordingChannel:
+    """A text channel that records the messages sent to it."""
+
+    def __init__(self, channel_id):
+        self.id = channel_id
+        self.messages = []
+
+    async def send(self, content=None, embed=None):
+        self.messages.append(content if embed is None else embed.description.split('\n'))
+
+
+def test_changes_within_the_window_are_coalesced_per_channel():
+    channels = [RecordingChannel(1), RecordingChannel(2)]
+    bots = [FakeMember(10 + i, f'bot-{i}') for i in range(3)]
+
+    async def run():
+        notifier = Notifier(coalesce_seconds=0.05)
+        notifier.notify(channels[0], bots[0], 'offline')
+        notifier.notify(channels[0], bots[1], 'offline')
+        notifier.notify(channels[0], bots[2], 'online')
+        # Only a bot's latest change in the window is sent
+        notifier.notify(channels[0], bots[0], 'online')
+        notifier.notify(channels[1], bots[0], 'offline')
+        await asyncio.sleep(0.2)
+        await notifier.close()
+        return notifier
+
+    notifier = asyncio.run(run())
+    assert channels[0].messages == [[
+        '⚠️ **bot-1** is now **offline**!',
+        '✅ **bot-2** is now **online**!',
+        '✅ **bot-0** is now **online**!',
+    ]]
+    assert channels[1].messages == ['⚠️ **bot-0** is now **offline**!']
+    assert notifier.sent == 2
+
+
+def test_flapping_bot_is_muted_until_it_settles():
+    channel = RecordingChannel(1)
+    bot = FakeMember(10, 'bot')
+
+    async def run():
+        notifier = Notifier(coalesce_seconds=0.01, flap_window=0.3, flap_threshold=2)
+        for status in ('offline', 'online', 'offline'):
+            notifier.notify(channel, bot, status)
+        await asyncio.sleep(0.05)
+        # Muted while flapping; only the status it settles on is sent
+        notifier.notify(channel, bot, 'online')
+        muted = list(channel.messages)
+        await asyncio.sleep(0.5)
+        await notifier.close()
+        return notifier, muted
+
+    notifier, muted = asyncio.run(run())
+    assert muted == ['🔁 **bot** is flapping, muting its changes for a while']
+    assert channel.messages == muted + ['✅ **bot** is now **online**!']
+    assert notifier.dropped == 1
+
+
+def test_flapping_bot_that_settles_on_the_reported_status_sends_nothing_more():
+    channel = RecordingChannel(1)
+    bot = FakeMember(10, 'bot')
+
+    async def run():
+        notifier = Notifier(coalesce_seconds=0.01, flap_window=0.2, flap_threshold=2)
+        for status in ('offline', 'online', 'offline'):
+            notifier.notify(channel, bot, status)
+        await asyncio.sleep(0.05)
+        notifier.notify(channel, bot, 'online')
+        notifier.notify(channel, bot, 'offline')
+        await asyncio.sleep(0.4)
+        await notifier.close()
+
+    asyncio.run(run())
+    assert channel.messages == ['🔁 **bot** is flapping, muting its changes for a while']
@@ -0,0 +1,124 @@
+"""
+Tests for probe targets being limited to public addresses.
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from benchmarks.stubs import ProbeServer
+from utils.probes import BlockedTarget, Prober, check_target, is_public
+
+BLOCKED_TARGETS = [
+    'http://127.0.0.1:9108/metrics',
+    'http://localhost/',
+    'http://169.254.169.254/latest/meta-data/',
+    'https://10.0.0.5/health',
+    '192.168.1.1:22',
+    '[::1]:8080',
+    'http://[::ffff:127.0.0.1]/',
+    '0.0.0.0:80',
+    '224.0.0.1:80',
+]
+
+
+@pytest.mark.parametrize('target', BLOCKED_TARGETS)
+def test_check_target_rejects_non_public_addresses(target):
+    with pytest.raises(BlockedTarget):
+        asyncio.run(check_target(target))
+
+
+def test_check_target_accepts_public_address():
+    assert asyncio.run(check_target('8.8.8.8:53')) == ('tcp', '8.8.8.8', 53)
+
+
+def test_check_target_allow_private():
+    assert asyncio.run(check_target('127.0.0.1:9108', allow_private=True)) == ('tcp', '127.0.0.1', 9108)
+
+
+def test_is_public():
+    assert is_public('1.1.1.1')
+    assert is_public('2606:4700:4700::1111')
+    assert not is_public('172.16.0.1')
+    assert not is_public('fe80::1%eth0')
+    assert not is_public('::ffff:169.254.169.254')
+    assert not is_public('240.0.0.1')
+
+
+async def probe_local(allow_private):
+    """Probe a local server over HTTP and TCP. Returns the results and the requests it served."""
+    server = ProbeServer()
+    await server.start()
+    prober = Prober(None, timeout=2, allow_private=allow_private)
+    try:
+        results = [
+            await prober.probe(server.url('health')),
+            await prober.probe(f'http://localhost:{server.port}/health'),
+            await prober.probe(f'127.0.0.1:{server.port}'),
+        ]
+    finally:
+        await prober.close()
+        await server.close()
+    return [ok for ok, _ in results], server.requests
+
+
+def test_probe_refuses_to_connect_to_loopback():
+    """A target that got past the command, or resolves differently later, is still not connected to."""
+    ok, requests = asyncio.run(probe_local(False))
+    assert ok == [False, False, False]
+    assert requests == 0
+
+
+def test_probe_allow_private():
+    ok, requests = asyncio.run(probe_local(True))
+    assert ok == [True, True, True]
+    assert requests == 2
+
+
+async def trickle(reader, writer):
+    """Answer with a body sent one byte at a time, each within the read timeout."""
+    await reader.readuntil(b'\r\n\r\n')
+    writer.write(b'HTTP/1.1 200 OK\r\nContent-Length: 1000\r\n\r\n')
+    try:
+        for _ in range(1000):
+            writer.write(b'.')
+            await writer.drain()
+            await asyncio.sleep(0.05)
+    except (ConnectionError, asyncio.CancelledError):
+        pass
+    writer.close()
+
+
+def test_probe_deadline_stops_trickling_server():
+    async def run():
+        server = await asyncio.start_server(trickle, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        prober = Prober(None, timeout=0.5, allow_private=True)
+        started = time.perf_counter()
+        try:
+            ok, _ = await prober.probe(f'http://127.0.0.1:{port}/')
+        finally:
+            await prober.close()
+            server.close()
+        return ok, time.perf_counter() - started
+
+    ok, elapsed = asyncio.run(run())
+    assert not ok
+    assert elapsed < 2
+
+
+def test_probe_deadline_leaves_out_pool_wait():
+    """Probes queued behind each other for one connection each get their whole timeout."""
+    async def run():
+        server = ProbeServer(delay=0.3)
+        await server.start()
+        prober = Prober(None, timeout=0.5, connections_per_host=1, allow_private=True)
+        try:
+            return await asyncio.gather(*(prober.probe(server.url()) for _ in range(3)))
+        finally:
+            await prober.close()
+            await server.close()
+
+    results = asyncio.run(run())
+    assert [ok for ok, _ in results] == [True, True, True]
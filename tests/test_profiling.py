@@ -0,0 +1,39 @@
+"""
+Tests for on-demand profiling.
+"""
+
+import asyncio
+
+from benchmarks.stubs import FakeBot, FakeMember, make_guilds
+from utils.model import from_document
+from utils.notify import Notifier
+from utils.profiling import Profiler
+from utils.shards import ShardMonitor
+from utils.storage import get_backend
+from utils.store import DataStore
+
+
+def test_capture_batches_profiles_scheduled_checks(tmp_path, monkeypatch):
+    """Capturing batches profiles run_due as the shard's own loop runs it."""
+    monkeypatch.chdir(tmp_path)
+    guilds, data = make_guilds(2, 3)
+
+    async def run():
+        store = DataStore(get_backend('json'), rollup_file=None)
+        store.guilds = from_document(data)
+        bot = FakeBot(guilds, store)
+        shard_monitor = bot.shard_monitors[0] = ShardMonitor(bot, 0, Notifier(coalesce_seconds=0))
+        shard_monitor.start()
+        capture = asyncio.create_task(Profiler().capture_batches([shard_monitor], 1, timeout=5))
+        await asyncio.sleep(0)
+        # Newly added bots are checked right away
+        guilds[0].add_member(FakeMember(99, 'new-bot', guild=guilds[0]))
+        store.add_bot(guilds[0].id, 99)
+        profile, captured = await capture
+        await shard_monitor.close()
+        return profile, captured, shard_monitor.profile
+
+    profile, captured, left_over = asyncio.run(run())
+    assert captured >= 1
+    assert left_over is None
+    assert 'run_due' in {getattr(entry.code, 'co_name', None) for entry in profile.getstats()}
@@ -0,0 +1,61 @@
+"""
+Tests for choosing the rollup tier that answers an uptime query.
+"""
+
+import pytest
+
+from utils.rollup import Rollup, Tier
+
+HOUR = 3600
+DAY = 86400
+START = 100 * DAY
+END = START + 2 * DAY
+
+
+def two_days():
+    """A rollup of a bot online for a day, then offline for a day."""
+    rollup = Rollup()
+    rollup.credit(START, START + DAY, True)
+    rollup.credit(START + DAY, END, False)
+    return rollup
+
+
+@pytest.fixture
+def widths(monkeypatch):
+    """Record the bucket width of every tier that sums a window."""
+    used = []
+    total = Tier.total
+
+    def tracked_total(self, start, end):
+        used.append(self.width)
+        return total(self, start, end)
+
+    monkeypatch.setattr(Tier, 'total', tracked_total)
+    return used
+
+
+def test_total_uses_the_finest_tier_holding_the_window(widths):
+    rollup = two_days()
+
+    assert rollup.total(END - 1800, END) == (0, 1800)
+    assert rollup.total(START + DAY - HOUR, START + DAY + HOUR) == (HOUR, 2 * HOUR)
+    assert rollup.total(START, END) == (DAY, 2 * DAY)
+    assert rollup.total(END - 40 * DAY, END) == (DAY, 2 * DAY)
+    assert widths == [60, 3600, 3600, 86400]
+
+
+def test_short_window_older_than_the_minute_tier_uses_the_hour_tier(widths):
+    rollup = two_days()
+
+    # An hour long, but the minute buckets for it have been overwritten
+    assert rollup.total(START + DAY - HOUR, START + DAY) == (HOUR, HOUR)
+    assert widths == [3600]
+
+
+def test_series_reads_the_tier_with_the_requested_width():
+    rollup = two_days()
+
+    assert rollup.series(END - 120, END, 60) == [(0, 60), (0, 60)]
+    assert rollup.series(START + DAY - HOUR, START + DAY + HOUR, 3600) == [(HOUR, HOUR), (0, HOUR)]
+    with pytest.raises(ValueError):
+        rollup.series(START, END, 120)
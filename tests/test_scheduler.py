@@ -0,0 +1,38 @@
+"""
+Tests for check scheduling and the uptime credited between checks.
+"""
+
+from utils import monitor
+from utils.model import BotStats, Status
+from utils.rollup import Rollup
+from utils.scheduler import MAX_CHECK_INTERVAL_SECONDS, MIN_CHECK_INTERVAL_SECONDS, clamp_interval, next_check
+
+
+def test_late_check_at_max_interval_is_credited():
+    """A check that runs late at the longest allowed interval still credits the whole gap."""
+    now = 1_700_000_000
+    late = 60
+    last_check = now - MAX_CHECK_INTERVAL_SECONDS - late
+    stats = BotStats(Status.ONLINE, last_check)
+    rollup = Rollup()
+
+    monitor.record_status(stats, Status.ONLINE, now, rollup)
+
+    assert stats.online_seconds == MAX_CHECK_INTERVAL_SECONDS + late
+    assert rollup.total(last_check, now) == (MAX_CHECK_INTERVAL_SECONDS + late, MAX_CHECK_INTERVAL_SECONDS + late)
+
+
+def test_max_interval_leaves_slack_below_gap_limit():
+    assert MAX_CHECK_INTERVAL_SECONDS * 2 <= monitor.MAX_GAP_SECONDS
+
+
+def test_clamp_interval():
+    assert clamp_interval(1) == MIN_CHECK_INTERVAL_SECONDS
+    assert clamp_interval(monitor.MAX_GAP_SECONDS) == MAX_CHECK_INTERVAL_SECONDS
+    assert clamp_interval(600) == 600
+
+
+def test_next_check_is_within_one_interval():
+    now = 1_700_000_123
+    due = next_check(4194304, 4195304, 600, now)
+    assert now < due <= now + 600
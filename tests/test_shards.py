@@ -0,0 +1,111 @@
+"""
+Tests for recording a bot's presence once for every guild monitoring it.
+"""
+
+import asyncio
+
+from benchmarks.stubs import FakeBot, FakeMember, make_guilds
+from utils.history import TransitionLog
+from utils.model import Status, from_document
+from utils.shards import ShardMonitor, handle_presence
+from utils.storage import get_backend
+from utils.store import DataStore
+
+# On a minute boundary, the finest rollup bucket
+NOW = 1_700_000_040
+BOT_ID = 123456789012345678
+
+
+class RecordingNotifier:
+    """Notifier that records the notifications it is asked to send."""
+
+    def __init__(self):
+        self.sent = []
+
+    def notify(self, channel, member, status):
+        self.sent.append((channel.guild.id, status))
+
+    async def close(self):
+        pass
+
+
+def popular_bot(guild_count, store):
+    """Monitor a bot in every one of several new guilds. Returns (guilds, bot, notifier)."""
+    guilds, data = make_guilds(guild_count, 0)
+    for guild in guilds:
+        guild.add_member(FakeMember(BOT_ID, 'popular-bot', guild=guild))
+        data['monitored_bots'][str(guild.id)].append(str(BOT_ID))
+    store.guilds = from_document(data)
+    bot = FakeBot(guilds, store)
+    notifier = RecordingNotifier()
+    bot.shard_monitors[0] = ShardMonitor(bot, 0, notifier)
+    return guilds, bot, notifier
+
+
+def set_status(guilds, status):
+    """Change the bot's status as seen in every guild."""
+    for guild in guilds:
+        guild.get_member(BOT_ID).status = status
+
+
+def test_presence_change_is_recorded_once_and_notified_in_every_guild(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    history = TransitionLog(str(tmp_path / 'history'))
+    store = DataStore(get_backend('json'), history=history, rollup_file=None)
+    guilds, bot, notifier = popular_bot(3, store)
+    for guild in guilds:
+        store.record_status(guild.id, BOT_ID, Status.ONLINE, NOW)
+
+    # Discord sends the change once per guild; only the first update does anything
+    set_status(guilds, 'offline')
+    notified = [handle_presence(bot, guild.get_member(BOT_ID), NOW + 60) for guild in guilds]
+
+    assert notified == [3, 0, 0]
+    assert sorted(notifier.sent) == sorted((guild.id, 'offline') for guild in guilds)
+    assert [record[2:] for record in history.take_pending()] == [(BOT_ID, 'online', 'offline')]
+    assert list(store.rollups) == [BOT_ID]
+    for guild in guilds:
+        stats = store.get_stats(guild.id, BOT_ID)
+        assert (stats.online_seconds, stats.last_status, stats.last_change) == (60, Status.OFFLINE, NOW + 60)
+
+
+def test_global_uptime_is_wall_clock_and_guilds_count_from_when_they_started(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = DataStore(get_backend('json'), rollup_file=None)
+    guilds, _, _ = popular_bot(3, store)
+    for guild in guilds[:2]:
+        store.record_status(guild.id, BOT_ID, Status.ONLINE, NOW)
+    store.record_status(guilds[0].id, BOT_ID, Status.ONLINE, NOW + 600)
+    # The third guild starts monitoring the bot later
+    store.record_status(guilds[2].id, BOT_ID, Status.ONLINE, NOW + 900)
+    store.record_status(guilds[1].id, BOT_ID, Status.OFFLINE, NOW + 1200)
+
+    assert store.get_global_uptime(BOT_ID) == (3, 1200, 0)
+    assert store.get_global_uptime(BOT_ID, NOW, NOW + 1800, now=NOW + 1800) == (3, 1200, 600)
+    durations = [
+        (stats.online_seconds, stats.offline_seconds)
+        for stats in (store.get_stats(guild.id, BOT_ID) for guild in guilds)
+    ]
+    assert durations == [(1200, 0), (1200, 0), (300, 0)]
+    assert store.get_uptime(guilds[2].id, BOT_ID, NOW, NOW + 1800, now=NOW + 1800) == (300, 900)
+
+
+def test_shared_stats_are_restored_with_each_guilds_own(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    async def run():
+        store = DataStore(get_backend('json'), rollup_file=None)
+        guilds, _, _ = popular_bot(2, store)
+        store.record_status(guilds[0].id, BOT_ID, Status.ONLINE, NOW)
+        store.record_status(guilds[1].id, BOT_ID, Status.ONLINE, NOW + 600)
+        store.record_status(guilds[0].id, BOT_ID, Status.ONLINE, NOW + 900)
+        await store.close()
+        return guilds
+
+    guilds = asyncio.run(run())
+    store = DataStore(get_backend('json'), rollup_file=None)
+    assert store.get_global_uptime(BOT_ID) == (2, 900, 0)
+    assert store.get_stats(guilds[1].id, BOT_ID).online_seconds == 300
+    # Both guilds share the restored stats again
+    store.record_status(guilds[1].id, BOT_ID, Status.ONLINE, NOW + 960)
+    assert [store.get_stats(guild.id, BOT_ID).online_seconds for guild in guilds] == [960, 360]
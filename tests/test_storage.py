@@ -0,0 +1,231 @@
+"""
+Tests for the storage backends.
+"""
+
+import asyncio
+import json
+import os
+import threading
+
+from utils.model import BotStats, Status, SubscriberStats, from_document
+from utils.storage import JournalBackend, JsonBackend, ShardedJsonBackend
+from utils.store import DataStore
+
+DATA = {
+    'channels': {'1': '2'},
+    'monitored_bots': {'1': ['10', '11']},
+    'uptime_stats': {'1': {'10': {
+        'online_seconds': 60, 'offline_seconds': 0, 'last_status': 'online',
+        'last_change': None, 'last_check': None, 'first_seen': None,
+    }}},
+    'check_intervals': {},
+    'probe_targets': {},
+}
+# The stats of bot 10 as written back, with the bot's shared stats
+SAVED_STATS = {
+    **DATA['uptime_stats']['1']['10'],
+    'bot_online_seconds': 60, 'bot_offline_seconds': 0, 'bot_last_change': None, 'bot_first_seen': None,
+}
+
+
+def change_after_snapshot(guilds):
+    """Change the guilds the way the event loop might while a write is in a worker thread."""
+    guild = guilds[1]
+    guild.get_stats(10).online_seconds = 999
+    guild.set_stats(11, SubscriberStats(BotStats(Status.OFFLINE, 1_700_000_000), 1_700_000_000))
+    guild.bots[12] = None
+
+
+def test_json_snapshot_is_a_copy(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    backend = JsonBackend()
+    guilds = from_document(json.loads(json.dumps(DATA)))
+
+    payload = backend.snapshot(guilds, set())
+    change_after_snapshot(guilds)
+    backend.write(payload)
+
+    data = backend.load()
+    assert data['monitored_bots'] == {'1': ['10', '11']}
+    assert data['uptime_stats'] == {'1': {'10': SAVED_STATS}}
+
+
+def test_journal_checkpoint_is_a_copy(tmp_path):
+    backend = JournalBackend(str(tmp_path / 'journal'), str(tmp_path / 'data'), min_checkpoint_bytes=0)
+    backend.load()
+    # Checkpoint on the next flush
+    backend._snapshot_bytes = 0
+    guilds = from_document(json.loads(json.dumps(DATA)))
+
+    payload = backend.snapshot(guilds, {(1, None)})
+    assert payload[0] is None
+    change_after_snapshot(guilds)
+    backend.write(payload)
+    backend.close()
+
+    data = JournalBackend(str(tmp_path / 'journal'), read_only=True).load()
+    assert data['monitored_bots'] == {'1': ['10', '11']}
+    assert data['uptime_stats'] == {'1': {'10': SAVED_STATS}}
+    # The guilds still parse their own stats after the copy shared them
+    assert guilds[1].get_stats(10).online_seconds == 999
+
+
+def test_sharded_round_trip(tmp_path):
+    path = str(tmp_path / 'data')
+    backend = ShardedJsonBackend(path)
+    backend.import_data(json.loads(json.dumps(DATA)))
+    guilds = from_document(ShardedJsonBackend(path).load())
+    assert guilds[1].channel_id == 2
+    assert list(guilds[1].bots) == [10, 11]
+    assert guilds[1].get_stats(10).online_seconds == 60
+    assert guilds[1].get_stats(11) is None
+
+
+def test_sharded_flush_rewrites_the_index_only_when_it_changes(tmp_path):
+    path = str(tmp_path / 'data')
+    ShardedJsonBackend(path).import_data(json.loads(json.dumps(DATA)))
+    backend = ShardedJsonBackend(path)
+    guilds = from_document(backend.load())
+
+    guilds[1].get_stats(10).online_seconds = 120
+    shards, index = backend.snapshot(guilds, {(1, 10)})
+    assert index is None
+    backend.write((shards, index))
+
+    guilds[1].bots.pop(11)
+    shards, index = backend.snapshot(guilds, {(1, 11)})
+    assert index is not None
+    backend.write((shards, index))
+
+    guilds = from_document(ShardedJsonBackend(path).load())
+    assert list(guilds[1].bots) == [10]
+    assert guilds[1].get_stats(10).online_seconds == 120
+
+
+def test_sharded_flush_deletes_emptied_guilds(tmp_path):
+    path = str(tmp_path / 'data')
+    data = json.loads(json.dumps(DATA))
+    data['monitored_bots']['2'] = ['20']
+    ShardedJsonBackend(path).import_data(data)
+    backend = ShardedJsonBackend(path)
+    guilds = from_document(backend.load())
+
+    del guilds[1]
+    backend.write(backend.snapshot(guilds, {(1, None)}))
+
+    assert sorted(os.listdir(path)) == ['2.json', 'index.json']
+    guilds = from_document(ShardedJsonBackend(path).load())
+    assert list(guilds) == [2]
+    assert list(guilds[2].bots) == [20]
+
+
+def test_preload_reads_shards_in_a_worker_thread(tmp_path, monkeypatch):
+    path = str(tmp_path / 'data')
+    data = json.loads(json.dumps(DATA))
+    data['monitored_bots']['2'] = ['20']
+    data['uptime_stats']['2'] = {'20': DATA['uptime_stats']['1']['10']}
+    ShardedJsonBackend(path).import_data(data)
+
+    backend = ShardedJsonBackend(path)
+    read_in = []
+    read_shard = backend._read_shard
+
+    def record_thread(guild_id):
+        read_in.append(threading.current_thread() is threading.main_thread())
+        return read_shard(guild_id)
+
+    monkeypatch.setattr(backend, '_read_shard', record_thread)
+
+    async def run():
+        store = DataStore(backend, rollup_file=None)
+        preload = asyncio.create_task(store.preload_stats())
+        # A guild loaded on the loop before the preload gets to it keeps its own stats
+        store.get_stats(2, 20).online_seconds = 999
+        assert await preload == 1
+        return store
+
+    store = asyncio.run(run())
+    assert read_in == [True, False]
+    assert store.get_stats(1, 10).online_seconds == 60
+    assert store.get_stats(2, 20).online_seconds == 999
+
+
+def test_guild_saved_earlier_catches_up_with_the_shared_stats(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    record = BotStats(Status.ONLINE, 1_700_000_000)
+    first = SubscriberStats(record, 1_700_000_000)
+    record.online_seconds = 300
+    second = SubscriberStats(record, 1_700_000_300)
+    record.online_seconds = 600
+    stale = first.to_dict()
+    record.online_seconds = 900
+    fresh = second.to_dict()
+
+    # The guild saved last is loaded first; the other one missed 300 seconds since it was saved
+    data = {'monitored_bots': {'1': ['10'], '2': ['10']}, 'uptime_stats': {'1': {'10': stale}, '2': {'10': fresh}}}
+    store = DataStore(JsonBackend(), rollup_file=None)
+    store.guilds = from_document(data)
+    assert store.get_stats(2, 10).online_seconds == 600
+    assert store.get_stats(1, 10).online_seconds == 900
+    assert store.get_global_uptime(10) == (2, 900, 0)
+
+
+def test_journal_drops_a_torn_tail_and_keeps_appending_after_it(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / 'journal')
+    backend = JournalBackend(path, str(tmp_path / 'data'))
+    backend.load()
+    guilds = from_document(json.loads(json.dumps(DATA)))
+    backend.write(backend.snapshot(guilds, {(1, None), (1, 10)}))
+    backend.close()
+    journal_path = backend._journal_path(backend.generation)
+    valid_size = os.path.getsize(journal_path)
+
+    # A crash in the middle of the next append
+    with open(journal_path, 'ab') as f:
+        f.write(b'0badc0de {"g":"1","c":"3"')
+
+    backend = JournalBackend(path, str(tmp_path / 'data'))
+    data = backend.load()
+    assert data['channels'] == {'1': '2'}
+    assert data['uptime_stats'] == {'1': {'10': SAVED_STATS}}
+    assert os.path.getsize(journal_path) == valid_size
+
+    guilds[1].channel_id = 3
+    backend.write(backend.snapshot(guilds, {(1, None)}))
+    backend.close()
+    data = JournalBackend(path, read_only=True).load()
+    assert data['channels'] == {'1': '3'}
+
+
+def test_journal_rolls_over_to_a_new_generation_at_a_checkpoint(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / 'journal')
+    backend = JournalBackend(path, str(tmp_path / 'data'), min_checkpoint_bytes=1024)
+    backend.load()
+    guilds = from_document(json.loads(json.dumps(DATA)))
+
+    appends = 0
+    while True:
+        guilds[1].channel_id += 1
+        records, checkpoint = backend.snapshot(guilds, {(1, None)})
+        if checkpoint is not None:
+            break
+        backend.write((records, None))
+        appends += 1
+    # The journal grows to the checkpoint size before the snapshot is rewritten
+    assert appends > 1
+    assert 1024 - 64 < os.path.getsize(os.path.join(path, 'journal.1.log')) < 1024
+    assert sorted(os.listdir(path)) == ['journal.1.log', 'snapshot.json']
+
+    backend.write((None, checkpoint))
+    assert backend.generation == 2
+    assert sorted(os.listdir(path)) == ['journal.2.log', 'snapshot.json']
+    assert os.path.getsize(os.path.join(path, 'journal.2.log')) == 0
+
+    guilds[1].channel_id = 5
+    backend.write(backend.snapshot(guilds, {(1, None)}))
+    backend.close()
+    data = JournalBackend(path, read_only=True).load()
+    assert data['channels'] == {'1': '5'}
+    assert data['uptime_stats'] == {'1': {'10': SAVED_STATS}}
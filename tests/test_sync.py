@@ -0,0 +1,83 @@
+"""
+Tests for skipping the slash command sync when the command tree is unchanged.
+"""
+
+import asyncio
+
+import discord
+from discord import app_commands
+
+from utils.sync import read_synced, sync_if_changed, tree_hash
+
+
+class StubBot:
+    """A bot with a real command tree whose sync is counted instead of sent to Discord."""
+
+    def __init__(self, application_id=1):
+        self.application_id = application_id
+        self.tree = app_commands.CommandTree(discord.Client(intents=discord.Intents.none()))
+        self.syncs = 0
+
+        async def sync():
+            self.syncs += 1
+            return self.tree.get_commands()
+
+        self.tree.sync = sync
+
+    def add_command(self, name, description='A command'):
+        async def callback(interaction: discord.Interaction):
+            pass
+
+        self.tree.add_command(app_commands.Command(name=name, description=description, callback=callback))
+
+
+def test_unchanged_tree_is_synced_once(tmp_path):
+    path = str(tmp_path / 'hash')
+    bot = StubBot()
+    bot.add_command('uptime')
+
+    async def run():
+        return [await sync_if_changed(bot, path) for _ in range(3)]
+
+    assert asyncio.run(run()) == [1, None, None]
+    assert bot.syncs == 1
+    assert read_synced(path) == (1, tree_hash(bot.tree))
+
+
+def test_changed_tree_application_or_force_syncs_again(tmp_path):
+    path = str(tmp_path / 'hash')
+    bot = StubBot()
+    bot.add_command('uptime')
+
+    async def run():
+        results = [await sync_if_changed(bot, path)]
+        bot.add_command('ping')
+        results.append(await sync_if_changed(bot, path))
+        bot.application_id = 2
+        results.append(await sync_if_changed(bot, path))
+        results.append(await sync_if_changed(bot, path, force=True))
+        return results
+
+    assert asyncio.run(run()) == [1, 2, 2, 2]
+    assert bot.syncs == 4
+
+
+def test_tree_hash_ignores_command_order_but_not_content():
+    first, second, edited = StubBot(), StubBot(), StubBot()
+    for name in ('uptime', 'ping'):
+        first.add_command(name)
+    for name in ('ping', 'uptime'):
+        second.add_command(name)
+    edited.add_command('ping')
+    edited.add_command('uptime', 'Show uptime')
+
+    assert tree_hash(first.tree) == tree_hash(second.tree)
+    assert tree_hash(first.tree) != tree_hash(edited.tree)
+
+
+def test_unreadable_hash_file_is_treated_as_never_synced(tmp_path):
+    path = tmp_path / 'hash'
+    path.write_text('garbage\n')
+
+    assert read_synced(str(path)) is None
+    assert read_synced(str(tmp_path / 'missing')) is None
@@ -0,0 +1,37 @@
+"""
+Tests for the bulk uptime commands.
+"""
+
+import asyncio
+
+from benchmarks.stubs import FakeBot, FakeInteraction, FakeMember, make_guilds
+from commands.uptime import UptimeCog
+from utils.store import DataStore
+from utils.storage import get_backend
+
+
+def test_add_bots_reports_ids_that_could_not_be_fetched(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    guilds, _ = make_guilds(1, 0)
+    guild = guilds[0]
+    cached = 123456789012345678
+    uncached = 123456789012345679
+    guild.add_member(FakeMember(cached, 'cached-bot', guild=guild))
+
+    async def query_members(**kwargs):
+        raise asyncio.TimeoutError
+
+    guild.query_members = query_members
+
+    async def run():
+        bot = FakeBot(guilds, DataStore(get_backend('json'), rollup_file=None))
+        interaction = FakeInteraction(guild)
+        cog = UptimeCog(bot)
+        await cog.add_bots.callback(cog, interaction, None, f'{cached} {uncached}', False)
+        return bot.store, interaction.followup.messages
+
+    store, messages = asyncio.run(run())
+    assert list(store.get_monitored(guild.id)) == [cached]
+    [(_, kwargs)] = messages
+    fields = {field.name: field.value for field in kwargs['embed'].fields}
+    assert fields['❓ Not Bots In This Server (1)'] == f'<@{uncached}>'
@@ -0,0 +1,55 @@
+"""
+Tests for the /view-uptime commands.
+"""
+
+import asyncio
+import time
+
+from benchmarks.stubs import FakeBot, FakeInteraction, FakeMember, make_guilds
+from commands.view_uptime import CHART_CHOICES, ViewUptimeCog
+from utils.model import Status, from_document
+from utils.storage import get_backend
+from utils.store import DataStore
+
+
+class RecordingRenderer:
+    """Chart renderer that records what it was asked to draw instead of drawing it."""
+
+    def __init__(self):
+        self.calls = []
+
+    def cached(self, key):
+        return None
+
+    async def render(self, key, func, *args):
+        self.calls.append((func.__name__, args))
+        return b''
+
+    def close(self):
+        pass
+
+
+def test_timeline_of_online_bot_without_transitions(tmp_path, monkeypatch):
+    """An online bot with no transitions in the window is drawn online, whatever the resolved member says."""
+    monkeypatch.chdir(tmp_path)
+    guilds, data = make_guilds(1, 1, offline_ratio=0)
+    guild = guilds[0]
+    bot_id = guild.members[0].id
+
+    async def run():
+        store = DataStore(get_backend('json'), rollup_file=None)
+        store.guilds = from_document(data)
+        store.record_status(guild.id, bot_id, Status.ONLINE, time.time() - 3600)
+        store.record_status(guild.id, bot_id, Status.ONLINE)
+
+        cog = ViewUptimeCog(FakeBot(guilds, store))
+        cog.charts = RecordingRenderer()
+        # Members resolved from command options carry no presence
+        resolved = FakeMember(bot_id, 'bot', status='offline', guild=guild)
+        await cog.view_user_uptime.callback(cog, FakeInteraction(guild), resolved, None, CHART_CHOICES[0])
+        return cog.charts.calls
+
+    (name, (start, end, intervals)), = asyncio.run(run())
+    assert name == 'render_timeline'
+    assert intervals
+    assert all(online for _, _, online in intervals)
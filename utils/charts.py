@@ -0,0 +1,195 @@
+"""
+Uptime chart images for /view-uptime user.
+
+Charts are drawn as PNGs with the standard library only: a 24 hour
+availability strip built from the transition log, and a 30 day heatmap of
+hourly uptime built from the rollups. The ``render_*`` functions are pure and
+take plain data, so ``ChartRenderer`` can run them in a worker process where
+they never hold up the event loop or the gateway heartbeat.
+"""
+
+import asyncio
+import math
+import struct
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.monitor import MAX_GAP_SECONDS
+
+ONLINE_COLOR = (67, 181, 129)
+OFFLINE_COLOR = (240, 71, 71)
+WARNING_COLOR = (250, 166, 26)
+UNKNOWN_COLOR = (79, 84, 92)
+BACKGROUND_COLOR = (47, 49, 54)
+TICK_COLOR = (185, 187, 190)
+
+TIMELINE_SECONDS = 86400
+TIMELINE_WIDTH = 720
+HEATMAP_DAYS = 30
+
+
+def encode_png(width, height, rows):
+    """Encode rows of packed RGB bytes as a PNG image."""
+    def chunk(tag, data):
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data))
+
+    raw = b''.join(b'\x00' + row for row in rows)
+    return (
+        b'\x89PNG\r\n\x1a\n'
+        + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+        + chunk(b'IDAT', zlib.compress(raw, 6))
+        + chunk(b'IEND', b'')
+    )
+
+
+def timeline_intervals(transitions, start, end, status, first_seen=None, last_check=None):
+    """
+    Turn transition log records into (from, to, online) intervals covering [start, end).
+
+    ``status`` is the bot's current status, used when no transition falls in
+    the window. Time before ``first_seen`` or long after ``last_check`` is left
+    out, so it is drawn as unknown.
+    """
+    online = (transitions[0][3] if transitions else str(status)) != 'offline'
+    position = max(start, first_seen or start)
+    if last_check is not None:
+        end = min(end, last_check + MAX_GAP_SECONDS)
+
+    intervals = []
+    for timestamp, _, _, _, new_status in transitions:
+        if timestamp > position:
+            intervals.append((position, min(timestamp, end), online))
+        position = max(position, timestamp)
+        online = new_status != 'offline'
+    if position < end:
+        intervals.append((position, end, online))
+    return intervals
+
+
+def render_timeline(start, end, intervals, width=TIMELINE_WIDTH, height=40, tick_seconds=6 * 3600):
+    """
+    Render an availability strip for [start, end).
+
+    Each column is red if the bot was offline at any point in it, green if it
+    was online and grey if it was not observed. Tick marks below the strip
+    show every ``tick_seconds``.
+    """
+    column_seconds = (end - start) / width
+    online = bytearray(width)
+    offline = bytearray(width)
+
+    for interval_start, interval_end, is_online in intervals:
+        first = max(0, int((interval_start - start) / column_seconds))
+        last = min(width - 1, math.ceil((interval_end - start) / column_seconds) - 1)
+        flags = online if is_online else offline
+        flags[first:last + 1] = b'\x01' * max(0, last - first + 1)
+
+    online_pixel, offline_pixel, unknown_pixel = bytes(ONLINE_COLOR), bytes(OFFLINE_COLOR), bytes(UNKNOWN_COLOR)
+    strip = b''.join(
+        offline_pixel if offline[column] else online_pixel if online[column] else unknown_pixel
+        for column in range(width)
+    )
+
+    ticks = bytearray(bytes(BACKGROUND_COLOR) * width)
+    tick = (int(start) // tick_seconds + 1) * tick_seconds
+    while tick < end:
+        column = int((tick - start) / column_seconds)
+        ticks[column * 3:column * 3 + 3] = bytes(TICK_COLOR)
+        tick += tick_seconds
+    ticks = bytes(ticks)
+
+    tick_height = 6
+    rows = [strip] * height + [ticks] * tick_height
+    return encode_png(width, height + tick_height, rows)
+
+
+def heatmap_color(fraction):
+    """Blend from red (0% uptime) through amber to green (100% uptime)."""
+    if fraction is None:
+        return UNKNOWN_COLOR
+    if fraction < 0.5:
+        low, high, t = OFFLINE_COLOR, WARNING_COLOR, fraction * 2
+    else:
+        low, high, t = WARNING_COLOR, ONLINE_COLOR, (fraction - 0.5) * 2
+    return tuple(round(a + (b - a) * t) for a, b in zip(low, high))
+
+
+def render_heatmap(cells, columns=24, cell_size=14, gap=2):
+    """
+    Render a grid of uptime fractions (row-major, None for unobserved cells).
+
+    With the default 24 columns each row is a day and each cell an hour.
+    """
+    rows_count = -(-len(cells) // columns)
+    width = columns * (cell_size + gap) + gap
+    background = bytes(BACKGROUND_COLOR)
+    gap_row = background * width
+
+    rows = [gap_row] * gap
+    for row in range(rows_count):
+        line = [background * gap]
+        for fraction in cells[row * columns:(row + 1) * columns]:
+            line.append(bytes(heatmap_color(fraction)) * cell_size + background * gap)
+        line = b''.join(line)
+        # Pad a partial last row
+        line += background * (width - len(line) // 3)
+        rows.extend([line] * cell_size)
+        rows.extend([gap_row] * gap)
+
+    return encode_png(width, len(rows), rows)
+
+
+def heatmap_cells(series):
+    """Convert (online, observed) buckets to uptime fractions, None where nothing was observed."""
+    return [online / observed if observed else None for online, observed in series]
+
+
+def heatmap_start(now=None):
+    """Get the start of the first day (UTC midnight) shown in the heatmap."""
+    now = now or time.time()
+    return (int(now) // 86400 - (HEATMAP_DAYS - 1)) * 86400
+
+
+class ChartRenderer:
+    """
+    Renders charts in a worker process and caches the images.
+
+    Callers choose cache keys that change when the chart would, e.g. the bot's
+    last transition plus the current chart column.
+    """
+
+    def __init__(self, max_workers=1, max_cached=256):
+        self.max_workers = max_workers
+        self.max_cached = max_cached
+        self._pool = None
+        self._cache = OrderedDict()
+
+    def cached(self, key):
+        """Get a cached image, or None."""
+        image = self._cache.get(key)
+        if image is not None:
+            self._cache.move_to_end(key)
+        return image
+
+    async def render(self, key, func, *args):
+        """Get a cached image or render one with func(*args) in the worker process."""
+        image = self.cached(key)
+        if image is not None:
+            return image
+
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.max_workers)
+        image = await asyncio.get_running_loop().run_in_executor(self._pool, func, *args)
+
+        self._cache[key] = image
+        while len(self._cache) > self.max_cached:
+            self._cache.popitem(last=False)
+        return image
+
+    def close(self):
+        """Shut down the worker process."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
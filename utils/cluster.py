@@ -0,0 +1,295 @@
+"""
+Multi-process cluster mode for the Uptime Bot.
+
+A coordinator process splits the shards between N worker processes, each
+running the normal bot (``bot.py``) for its own shards. Workers share state
+through the SQLite storage backend and report their status to the coordinator
+over a local IPC connection (newline-delimited JSON on a localhost socket), so
+``/config status`` can show the whole cluster. Rollups and transition logs
+are kept per shard rather than per worker, so a guild keeps its history when
+the workers or the shard assignment change; if the shard count changes, the
+coordinator moves them to the new shards before starting the workers.
+
+Run with ``python -m utils.cluster``. Nothing in here talks to Discord, so the
+coordinator can be exercised with a fake worker command (see
+``tests/cluster_worker.py``).
+"""
+
+import asyncio
+import glob
+import json
+import math
+import os
+import shutil
+import sys
+import time
+
+from utils.history import HISTORY_DIR, SEGMENT_SUFFIX, ShardedTransitionLog, TransitionLog
+from utils.rollup import ROLLUP_FILE, dump_shard_rollups, load_rollups, load_shard_rollups, shard_file, write_rollups
+from utils.storage import DATABASE_FILE, SqliteBackend
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+# Per-shard rollup files and transition logs of the workers
+SHARD_ROLLUP_FILE = 'rollups-{shard}-of-{shard_count}.bin'
+SHARD_HISTORY_DIR = os.path.join(HISTORY_DIR, 'shard-{shard}-of-{shard_count}')
+# Transitions moved to their new shard at a time when repartitioning
+REPARTITION_BATCH = 10000
+
+
+def assign_shards(shard_count, workers):
+    """Split shard IDs into contiguous ranges, one per worker."""
+    per_worker, extra = divmod(shard_count, workers)
+    assignments = []
+    start = 0
+    for worker in range(workers):
+        size = per_worker + (1 if worker < extra else 0)
+        assignments.append(list(range(start, start + size)))
+        start += size
+    return assignments
+
+
+async def _send(writer, message):
+    """Write one JSON message to a stream."""
+    writer.write(json.dumps(message).encode() + b'\n')
+    await writer.drain()
+
+
+async def _receive(reader):
+    """Read one JSON message from a stream, or None at end of stream."""
+    line = await reader.readline()
+    if not line:
+        return None
+    return json.loads(line)
+
+
+class Coordinator:
+    """Starts the worker processes and aggregates their status reports."""
+
+    def __init__(self, workers, shard_count, host=DEFAULT_HOST, port=DEFAULT_PORT,
+                 command=None, restart_delay=5):
+        self.workers = workers
+        self.shard_count = shard_count
+        self.host = host
+        self.port = port
+        self.command = command or [sys.executable, 'bot.py']
+        self.restart_delay = restart_delay
+        self.assignments = assign_shards(shard_count, workers)
+        self.reports = {}
+        self._processes = {}
+        self._server = None
+
+    def worker_env(self, worker_id):
+        """Build the environment for a worker process."""
+        env = dict(os.environ)
+        env.update({
+            'CLUSTER_ADDRESS': f'{self.host}:{self.port}',
+            'CLUSTER_WORKER_ID': str(worker_id),
+            'CLUSTER_SHARD_IDS': ','.join(map(str, self.assignments[worker_id])),
+            'SHARD_COUNT': str(self.shard_count),
+            # Workers share the database; rollups and logs are kept per shard
+            'STORAGE_BACKEND': 'sqlite',
+            'ROLLUP_FILE': SHARD_ROLLUP_FILE,
+            'HISTORY_DIR': SHARD_HISTORY_DIR,
+        })
+        return env
+
+    async def _handle(self, reader, writer):
+        """Handle a worker connection: status reports and status queries."""
+        try:
+            while True:
+                message = await _receive(reader)
+                if message is None:
+                    break
+                if message['op'] == 'report':
+                    self.reports[message['worker']] = {**message['status'], 'reported': time.time()}
+                elif message['op'] == 'status':
+                    await _send(writer, {'op': 'status', 'workers': self.status()})
+        except (ConnectionError, ValueError, KeyError) as e:
+            print(f'Cluster connection error: {e}')
+        finally:
+            writer.close()
+
+    def status(self):
+        """Get the latest report of every worker, keyed by worker ID."""
+        return {
+            str(worker_id): {
+                'shard_ids': self.assignments[worker_id],
+                'running': worker_id in self._processes and self._processes[worker_id].returncode is None,
+                **self.reports.get(worker_id, {}),
+            }
+            for worker_id in range(self.workers)
+        }
+
+    async def _run_worker(self, worker_id):
+        """Run a worker process, restarting it if it exits."""
+        while True:
+            process = await asyncio.create_subprocess_exec(*self.command, env=self.worker_env(worker_id))
+            self._processes[worker_id] = process
+            print(f'Started worker {worker_id} (pid {process.pid}) for shards {self.assignments[worker_id]}')
+
+            code = await process.wait()
+            print(f'Worker {worker_id} exited with code {code}, restarting in {self.restart_delay}s')
+            self.reports.pop(worker_id, None)
+            await asyncio.sleep(self.restart_delay)
+
+    async def run(self):
+        """Serve the IPC endpoint and keep all workers running."""
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        # Port 0 picks a free port, which the workers need to know
+        self.port = self._server.sockets[0].getsockname()[1]
+        tasks = [asyncio.create_task(self._run_worker(worker_id)) for worker_id in range(self.workers)]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            for process in self._processes.values():
+                if process.returncode is None:
+                    process.terminate()
+            await asyncio.gather(
+                *(process.wait() for process in self._processes.values()), return_exceptions=True
+            )
+            self._server.close()
+
+
+class ClusterClient:
+    """Worker-side connection to the coordinator."""
+
+    def __init__(self, address, worker_id, report, interval=15):
+        host, port = address.rsplit(':', 1)
+        self.host = host
+        self.port = int(port)
+        self.worker_id = worker_id
+        self.report = report
+        self.interval = interval
+        self._task = None
+
+    async def _report_loop(self):
+        """Send this worker's status to the coordinator periodically, reconnecting as needed."""
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+                try:
+                    while True:
+                        await _send(writer, {'op': 'report', 'worker': self.worker_id, 'status': self.report()})
+                        await asyncio.sleep(self.interval)
+                finally:
+                    writer.close()
+            except (ConnectionError, OSError) as e:
+                print(f'Lost connection to cluster coordinator: {e}')
+                await asyncio.sleep(self.interval)
+
+    async def request_status(self, timeout=5):
+        """Ask the coordinator for the status of every worker."""
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), timeout)
+        try:
+            await _send(writer, {'op': 'status'})
+            message = await asyncio.wait_for(_receive(reader), timeout)
+            return message['workers']
+        finally:
+            writer.close()
+
+    def start(self):
+        """Start reporting to the coordinator."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._report_loop())
+
+    async def close(self):
+        """Stop reporting to the coordinator."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def repartition_rollups(shard_count, template=SHARD_ROLLUP_FILE):
+    """
+    Move rollups saved in any other layout into the per-shard files of ``shard_count`` shards.
+
+    This covers the single-process file, per-worker files and per-shard files
+    of another shard count. Returns how many files were moved.
+    """
+    current = {shard_file(template, shard_id, shard_count) for shard_id in range(shard_count)}
+    stem, ext = os.path.splitext(ROLLUP_FILE)
+    old = sorted(set(glob.glob(f'{stem}*{ext}')) - current)
+    if not old:
+        return 0
+
+    rollups = {}
+    for path in old:
+        for key, rollup in load_rollups(path).items():
+            rollups.setdefault(key, rollup)
+    # Rollups already in the current layout are newer
+    rollups.update(load_shard_rollups(template, range(shard_count), shard_count))
+    for path, payload in dump_shard_rollups(rollups, template, range(shard_count), shard_count).items():
+        write_rollups(payload, path)
+    for path in old:
+        os.remove(path)
+    return len(old)
+
+
+def repartition_history(shard_count, template=SHARD_HISTORY_DIR):
+    """
+    Move transition logs kept in any other layout into the per-shard logs of ``shard_count`` shards.
+
+    Returns how many logs were moved.
+    """
+    if not os.path.isdir(HISTORY_DIR):
+        return 0
+    current = {os.path.normpath(template.format(shard=shard_id, shard_count=shard_count))
+               for shard_id in range(shard_count)}
+    old = [
+        os.path.normpath(os.path.join(HISTORY_DIR, name)) for name in sorted(os.listdir(HISTORY_DIR))
+        if os.path.isdir(os.path.join(HISTORY_DIR, name))
+    ]
+    old = [path for path in old if path not in current]
+    # Segments of the single-process log sit in the top directory
+    if any(name.endswith(SEGMENT_SUFFIX) for name in os.listdir(HISTORY_DIR)):
+        old.insert(0, HISTORY_DIR)
+    if not old:
+        return 0
+
+    logs = ShardedTransitionLog(template, range(shard_count), shard_count)
+    for path in old:
+        batch = []
+        for record in TransitionLog(path).iter_records(0, math.inf):
+            batch.append(record)
+            if len(batch) >= REPARTITION_BATCH:
+                logs.write(batch)
+                batch = []
+        logs.write(batch)
+
+        if path == HISTORY_DIR:
+            for name in os.listdir(path):
+                if name.endswith(SEGMENT_SUFFIX):
+                    os.remove(os.path.join(path, name))
+        else:
+            shutil.rmtree(path)
+    return len(old)
+
+
+async def main():
+    """Run the coordinator configured from the environment."""
+    # Migrate bot_data.json once here rather than racing in every worker
+    backend = SqliteBackend(os.getenv('DATABASE_FILE', DATABASE_FILE))
+    backend.migrate_if_empty()
+    backend.close()
+
+    workers = int(os.getenv('CLUSTER_WORKERS', '2'))
+    shard_count = int(os.getenv('SHARD_COUNT') or workers)
+    moved = repartition_rollups(shard_count) + repartition_history(shard_count)
+    if moved:
+        print(f'Moved {moved} rollup file(s) and transition log(s) to {shard_count} shards')
+    coordinator = Coordinator(workers, shard_count, port=int(os.getenv('CLUSTER_PORT', str(DEFAULT_PORT))))
+    await coordinator.run()
+
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    asyncio.run(main())
@@ -20,10 +20,22 @@ def load_data():
     return {'channels': {}, 'monitored_bots': {}, 'uptime_stats': {}}
 
 
+def dump_data(data):
+    """Serialize bot data to a JSON string."""
+    return json.dumps(data, indent=4)
+
+
+def write_data(text):
+    """Write serialized bot data to the JSON file, replacing it atomically."""
+    temp_path = DATA_FILE + '.tmp'
+    with open(temp_path, 'w') as f:
+        f.write(text)
+    os.replace(temp_path, DATA_FILE)
+
+
 def save_data(data):
     """Save bot data to JSON file."""
-    with open(DATA_FILE, 'w') as f:
-        json.dump(data, f, indent=4)
+    write_data(dump_data(data))
 
 
 async def load_data_async():
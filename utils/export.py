@@ -0,0 +1,226 @@
+"""
+Streaming export of a guild's uptime stats and transition history.
+
+The export is a generator pipeline: rows are produced one at a time, encoded
+as CSV or NDJSON in chunks of about ``CHUNK_SIZE`` characters, gzip-compressed
+chunk by chunk and written to a file. Transitions are streamed straight from
+the log segments, so memory use stays the same however much history there is.
+
+Both ``/view-uptime export`` and the offline CLI use it:
+
+    python -m utils.export <guild_id> [--format csv|ndjson] [--days N] [--output FILE]
+"""
+
+import argparse
+import csv
+import io
+import itertools
+import json
+import os
+import sys
+import time
+import zlib
+from datetime import datetime, timezone
+
+from utils.history import HISTORY_DIR, TransitionLog, distinct_transitions
+from utils.model import from_document
+from utils.monitor import uptime_percentage
+from utils.scheduler import CHECK_INTERVAL_SECONDS
+from utils.storage import DATA_DIR, JOURNAL_DIR, JournalBackend, get_backend
+
+FORMATS = ('csv', 'ndjson')
+CHUNK_SIZE = 64 * 1024
+
+# Columns of the two record types; a CSV export has the union of both
+STATS_FIELDS = [
+    'online_seconds', 'offline_seconds', 'uptime_percent', 'last_status', 'last_change', 'last_check',
+    'first_seen', 'check_interval', 'probe_target', 'probe_ok', 'probe_failed',
+    'probe_p50_ms', 'probe_p95_ms', 'probe_p99_ms',
+]
+TRANSITION_FIELDS = ['timestamp', 'old_status', 'new_status']
+CSV_FIELDS = ['record', 'guild_id', 'bot_id'] + TRANSITION_FIELDS + STATS_FIELDS
+
+
+def to_utc(timestamp):
+    """Format epoch seconds as an ISO 8601 UTC timestamp, or None."""
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat().replace('+00:00', 'Z')
+
+
+def stats_rows(guild_id, guild, check_interval):
+    """
+    Build a stats row for each bot monitored in a guild (a GuildState).
+
+    The rows are built up front, so they are a consistent snapshot even if the
+    rest of the export is written while the store keeps changing.
+    """
+    rows = []
+    for bot_id in list(guild.bots):
+        stats = guild.get_stats(bot_id)
+        probe = stats.probe if stats is not None else None
+        row = {
+            'record': 'stats',
+            'guild_id': str(guild_id),
+            'bot_id': str(bot_id),
+            'check_interval': guild.intervals.get(bot_id, check_interval),
+            'probe_target': guild.probes.get(bot_id),
+        }
+        if stats is not None:
+            row.update({
+                'online_seconds': stats.online_seconds,
+                'offline_seconds': stats.offline_seconds,
+                'uptime_percent': round(uptime_percentage(stats.online_seconds, stats.offline_seconds), 3),
+                'last_status': str(stats.last_status),
+                'last_change': to_utc(stats.last_change),
+                'last_check': to_utc(stats.last_check),
+                'first_seen': to_utc(stats.first_seen),
+            })
+        if probe is not None:
+            row.update({
+                'probe_ok': probe.ok,
+                'probe_failed': probe.failed,
+                'probe_p50_ms': probe.p50,
+                'probe_p95_ms': probe.p95,
+                'probe_p99_ms': probe.p99,
+            })
+        rows.append(row)
+    return rows
+
+
+def transition_rows(records):
+    """Turn (timestamp, guild_id, bot_id, old, new) transition records into rows."""
+    for timestamp, guild_id, bot_id, old_status, new_status in records:
+        yield {
+            'record': 'transition',
+            'guild_id': str(guild_id),
+            'bot_id': str(bot_id),
+            'timestamp': to_utc(timestamp),
+            'old_status': old_status,
+            'new_status': new_status,
+        }
+
+
+def encode_csv(rows):
+    """Encode rows as CSV text chunks, starting with the header."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, CSV_FIELDS, lineterminator='\n')
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def encode_ndjson(rows):
+    """Encode rows as newline-delimited JSON text chunks."""
+    lines = []
+    size = 0
+    for row in rows:
+        line = json.dumps(row, separators=(',', ':')) + '\n'
+        lines.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield ''.join(lines)
+            lines = []
+            size = 0
+    yield ''.join(lines)
+
+
+def gzip_chunks(chunks):
+    """Compress text chunks into a gzip stream, chunk by chunk."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def write_export(f, rows, fmt='csv', compress=True):
+    """Encode rows in a format, optionally gzipped, into a binary file (blocking). Returns the bytes written."""
+    chunks = encode_csv(rows) if fmt == 'csv' else encode_ndjson(rows)
+    chunks = gzip_chunks(chunks) if compress else (chunk.encode() for chunk in chunks)
+    written = 0
+    for chunk in chunks:
+        f.write(chunk)
+        written += len(chunk)
+    return written
+
+
+def export_rows(stats, history, guild_id, bot_ids, start, end, pending=(), sizes=None):
+    """
+    Chain a guild's stats rows with the transitions of its bots in [start, end), streamed from the log.
+
+    Transitions are logged once per bot, under any guild monitoring it, so
+    they are picked by bot and exported under ``guild_id``. ``pending`` and
+    ``sizes`` (see ``DataStore.history_snapshot``) must be taken together, so
+    transitions flushed since are neither missed nor repeated.
+    """
+    yield from stats
+    bot_ids = set(bot_ids)
+    records = history.iter_records(start, end, sizes=sizes) if history is not None else ()
+    records = (record for record in itertools.chain(records, pending) if record[2] in bot_ids)
+    yield from transition_rows(
+        (timestamp, guild_id, bot_id, old_status, new_status)
+        for timestamp, _, bot_id, old_status, new_status in distinct_transitions(records)
+    )
+
+
+def export_filename(guild_id, fmt, compress=True):
+    """Get the file name of an export."""
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S')
+    return f'uptime-{guild_id}-{stamp}.{fmt}' + ('.gz' if compress else '')
+
+
+def open_backend(name):
+    """Open a storage backend for reading while the bot may still be running."""
+    if name == 'journal':
+        return JournalBackend(os.getenv('JOURNAL_DIR', JOURNAL_DIR), os.getenv('DATA_DIR', DATA_DIR), read_only=True)
+    return get_backend(name)
+
+
+def main(argv=None):
+    """Export a guild's stats and history from the data on disk."""
+    parser = argparse.ArgumentParser(description='Export uptime stats and transition history')
+    parser.add_argument('guild_id', type=int, help='guild to export')
+    parser.add_argument('--format', choices=FORMATS, default='csv', help='output format')
+    parser.add_argument('--days', type=float, help='only export transitions from the last N days')
+    parser.add_argument('--output', help='output file (default: a name based on the guild and time)')
+    parser.add_argument('--no-gzip', action='store_true', help='write uncompressed output')
+    args = parser.parse_args(argv)
+
+    backend = open_backend(os.getenv('STORAGE_BACKEND', 'journal'))
+    try:
+        guilds = from_document(backend.load())
+    finally:
+        backend.close()
+
+    guild = guilds.get(args.guild_id)
+    if guild is None or not guild.bots:
+        print(f'No bots are monitored in guild {args.guild_id}', file=sys.stderr)
+        return 1
+
+    history_dir = os.getenv('HISTORY_DIR', HISTORY_DIR)
+    history = TransitionLog(history_dir) if os.path.isdir(history_dir) else None
+    end = time.time()
+    start = end - args.days * 86400 if args.days else 0
+    compress = not args.no_gzip
+    output = args.output or export_filename(args.guild_id, args.format, compress)
+
+    stats = stats_rows(args.guild_id, guild, int(os.getenv('CHECK_INTERVAL_SECONDS', str(CHECK_INTERVAL_SECONDS))))
+    with open(output, 'wb') as f:
+        rows = export_rows(stats, history, args.guild_id, guild.bots, start, end)
+        written = write_export(f, rows, args.format, compress)
+    print(f'Wrote {written} bytes to {output}')
+    return 0
+
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    sys.exit(main())
@@ -0,0 +1,310 @@
+"""
+Append-only log of bot status transitions.
+
+Transitions are appended to time-aligned segment files (one per day by default)
+named after the epoch second their time range starts at. The sorted list of
+segment start times acts as the time index: a query only opens the segments
+that overlap the requested window.
+
+A transition is logged once per bot, under the ID of a guild monitoring it.
+``open_log`` keeps one log per shard when the directory has ``{shard}`` and
+``{shard_count}`` fields (cluster mode), so a guild's history follows it to
+whichever process runs its shard.
+"""
+
+import bisect
+import os
+import time
+
+from utils.model import shard_of
+
+HISTORY_DIR = 'history'
+SEGMENT_SUFFIX = '.log'
+
+
+def format_record(record):
+    """Format a (timestamp, guild_id, bot_id, old, new) record as a log line."""
+    timestamp, guild_id, bot_id, old_status, new_status = record
+    return f'{timestamp:.3f},{guild_id},{bot_id},{old_status},{new_status}\n'
+
+
+def distinct_transitions(records):
+    """
+    Drop the repeated records of a transition from time-ordered records.
+
+    Logs written before transitions were logged once per bot have a record for
+    every guild that monitored it. A bot cannot go offline twice in a row, so a
+    record with the same new status as the bot's previous one is a repeat.
+    """
+    last = {}
+    for record in records:
+        if last.get(record[2]) != record[4]:
+            last[record[2]] = record[4]
+            yield record
+
+
+class TransitionLog:
+    """Segment-rotated, append-only status transition log."""
+
+    def __init__(self, path=HISTORY_DIR, segment_seconds=86400, retention_days=30):
+        self.path = path
+        self.segment_seconds = segment_seconds
+        self.retention_seconds = retention_days * 86400
+        self._pending = []
+        os.makedirs(path, exist_ok=True)
+        self._segments = sorted(
+            int(name[:-len(SEGMENT_SUFFIX)])
+            for name in os.listdir(path)
+            if name.endswith(SEGMENT_SUFFIX)
+        )
+
+    def _segment_start(self, timestamp):
+        """Get the start of the segment a timestamp belongs to."""
+        return int(timestamp) // self.segment_seconds * self.segment_seconds
+
+    def _segment_path(self, start):
+        """Get the file path of a segment."""
+        return os.path.join(self.path, f'{start}{SEGMENT_SUFFIX}')
+
+    def append(self, guild_id, bot_id, old_status, new_status, timestamp):
+        """Queue a transition to be written on the next flush."""
+        self._pending.append((timestamp, guild_id, bot_id, old_status, new_status))
+
+    def take_pending(self):
+        """Take the queued transitions so they can be written off the event loop."""
+        pending, self._pending = self._pending, []
+        return pending
+
+    def requeue(self, records):
+        """Put back transitions whose write failed, ahead of newer ones."""
+        self._pending[:0] = records
+
+    def write(self, records):
+        """Append transitions to their segments (blocking). Returns the number of bytes written."""
+        by_segment = {}
+        for record in records:
+            by_segment.setdefault(self._segment_start(record[0]), []).append(record)
+
+        written = 0
+        for start, segment_records in by_segment.items():
+            text = ''.join(map(format_record, segment_records))
+            with open(self._segment_path(start), 'a') as f:
+                f.write(text)
+            written += len(text)
+            if start not in self._segments:
+                bisect.insort(self._segments, start)
+        return written
+
+    def _read_segment(self, start, size=None):
+        """Yield the records stored in a segment, or in its first ``size`` bytes."""
+        try:
+            with open(self._segment_path(start), 'r') as f:
+                for line in f:
+                    # A line still being appended by a concurrent flush
+                    if not line.endswith('\n'):
+                        break
+                    # Lines are ASCII, so characters are bytes
+                    if size is not None:
+                        size -= len(line)
+                        if size < 0:
+                            break
+                    timestamp, guild_id, bot_id, old, new = line[:-1].split(',')
+                    yield float(timestamp), int(guild_id), int(bot_id), old, new
+        except FileNotFoundError:
+            return
+
+    def read(self, start, end, guild_id=None, bot_id=None):
+        """
+        Return the transitions in [start, end) in time order (blocking).
+
+        Only the segments overlapping the window are read. Transitions that
+        have not been flushed yet are included.
+        """
+        def matches(record):
+            return start <= record[0] < end and \
+                (guild_id is None or record[1] == guild_id) and \
+                (bot_id is None or record[2] == bot_id)
+
+        first = bisect.bisect_left(self._segments, self._segment_start(start))
+        last = bisect.bisect_left(self._segments, end)
+        records = []
+
+        for segment in self._segments[first:last]:
+            records.extend(filter(matches, self._read_segment(segment)))
+        records.extend(filter(matches, list(self._pending)))
+
+        records.sort()
+        return records
+
+    def pending_records(self, start, end, guild_id=None, bot_id=None):
+        """Get a copy of the queued (not yet flushed) transitions in [start, end)."""
+        return [
+            record for record in self._pending
+            if start <= record[0] < end and
+            (guild_id is None or record[1] == guild_id) and
+            (bot_id is None or record[2] == bot_id)
+        ]
+
+    def segment_sizes(self, start, end):
+        """Get the size in bytes of each segment overlapping [start, end) (blocking)."""
+        first = bisect.bisect_left(self._segments, self._segment_start(start))
+        last = bisect.bisect_left(self._segments, end)
+        sizes = {}
+        for segment in self._segments[first:last]:
+            try:
+                sizes[segment] = os.path.getsize(self._segment_path(segment))
+            except FileNotFoundError:
+                pass
+        return sizes
+
+    def iter_records(self, start, end, guild_id=None, bot_id=None, sizes=None):
+        """
+        Yield the flushed transitions in [start, end) one at a time (blocking).
+
+        Unlike ``read`` nothing is collected or sorted, so memory use does not
+        grow with the amount of history: records come out segment by segment,
+        in the order they were written. With ``sizes`` from ``segment_sizes``,
+        only what had been written when they were taken is read.
+        """
+        if sizes is None:
+            first = bisect.bisect_left(self._segments, self._segment_start(start))
+            last = bisect.bisect_left(self._segments, end)
+            sizes = dict.fromkeys(self._segments[first:last])
+
+        for segment, size in sizes.items():
+            for record in self._read_segment(segment, size):
+                if start <= record[0] < end and \
+                        (guild_id is None or record[1] == guild_id) and \
+                        (bot_id is None or record[2] == bot_id):
+                    yield record
+
+    def maintain(self, monitored, now=None):
+        """
+        Keep disk use bounded (blocking).
+
+        Segments past the retention period are deleted. Closed segments are
+        compacted by dropping transitions of bots that are no longer monitored;
+        ``monitored`` is a set of bot IDs.
+        """
+        now = now or time.time()
+        current = self._segment_start(now)
+        removed = 0
+
+        for start in list(self._segments):
+            path = self._segment_path(start)
+            if start + self.segment_seconds <= now - self.retention_seconds:
+                os.remove(path)
+                self._segments.remove(start)
+                removed += 1
+                continue
+
+            if start >= current:
+                continue
+
+            records = list(self._read_segment(start))
+            kept = [record for record in records if record[2] in monitored]
+            if len(kept) == len(records):
+                continue
+
+            if not kept:
+                os.remove(path)
+                self._segments.remove(start)
+                removed += 1
+                continue
+
+            temp_path = path + '.tmp'
+            with open(temp_path, 'w') as f:
+                f.writelines(map(format_record, kept))
+            os.replace(temp_path, path)
+
+        return removed
+
+
+class ShardedTransitionLog:
+    """A TransitionLog per shard, behind the TransitionLog interface."""
+
+    def __init__(self, template, shard_ids, shard_count, **kwargs):
+        self.template = template
+        self.shard_count = shard_count
+        self._kwargs = kwargs
+        self.logs = {}
+        for shard_id in shard_ids:
+            self._shard_log(shard_id)
+
+    def _shard_log(self, shard_id):
+        """Get a shard's log, opening it if needed."""
+        log = self.logs.get(shard_id)
+        if log is None:
+            path = self.template.format(shard=shard_id, shard_count=self.shard_count)
+            log = self.logs[shard_id] = TransitionLog(path, **self._kwargs)
+        return log
+
+    def _log(self, guild_id):
+        """Get the log of a guild's shard."""
+        return self._shard_log(shard_of(guild_id, self.shard_count))
+
+    def _logs(self, guild_id):
+        """Get the logs holding a guild's transitions, or every guild's."""
+        return [self._log(guild_id)] if guild_id is not None else list(self.logs.values())
+
+    def _by_shard(self, records):
+        """Group records by the shard of their guild."""
+        by_shard = {}
+        for record in records:
+            by_shard.setdefault(shard_of(record[1], self.shard_count), []).append(record)
+        return by_shard
+
+    def append(self, guild_id, bot_id, old_status, new_status, timestamp):
+        """Queue a transition to be written on the next flush."""
+        self._log(guild_id).append(guild_id, bot_id, old_status, new_status, timestamp)
+
+    def take_pending(self):
+        """Take the queued transitions of every shard."""
+        return [record for log in list(self.logs.values()) for record in log.take_pending()]
+
+    def requeue(self, records):
+        """Put back transitions whose write failed."""
+        for shard_id, shard_records in self._by_shard(records).items():
+            self._shard_log(shard_id).requeue(shard_records)
+
+    def write(self, records):
+        """Append transitions to their shards' segments (blocking). Returns the number of bytes written."""
+        return sum(
+            self._shard_log(shard_id).write(shard_records)
+            for shard_id, shard_records in self._by_shard(records).items()
+        )
+
+    def read(self, start, end, guild_id=None, bot_id=None):
+        """Return the transitions in [start, end) in time order (blocking)."""
+        records = [record for log in self._logs(guild_id) for record in log.read(start, end, guild_id, bot_id)]
+        records.sort()
+        return records
+
+    def pending_records(self, start, end, guild_id=None, bot_id=None):
+        """Get a copy of the queued (not yet flushed) transitions in [start, end)."""
+        return [record for log in self._logs(guild_id) for record in log.pending_records(start, end, guild_id, bot_id)]
+
+    def segment_sizes(self, start, end):
+        """Get the size in bytes of each segment overlapping [start, end), by shard (blocking)."""
+        return {shard_id: log.segment_sizes(start, end) for shard_id, log in list(self.logs.items())}
+
+    def iter_records(self, start, end, guild_id=None, bot_id=None, sizes=None):
+        """Yield the flushed transitions in [start, end) one at a time, shard by shard (blocking)."""
+        for shard_id, log in list(self.logs.items()):
+            if guild_id is not None and shard_id != shard_of(guild_id, self.shard_count):
+                continue
+            shard_sizes = sizes.get(shard_id, {}) if sizes is not None else None
+            yield from log.iter_records(start, end, guild_id, bot_id, shard_sizes)
+
+    def maintain(self, monitored, now=None):
+        """Apply retention and compaction to every shard's log (blocking)."""
+        return sum(log.maintain(monitored, now) for log in list(self.logs.values()))
+
+
+def open_log(path=HISTORY_DIR, shard_ids=None, shard_count=None, **kwargs):
+    """Open a transition log, or one per shard if the path has a {shard} field."""
+    if '{shard}' in path:
+        if shard_ids is None or not shard_count:
+            raise ValueError(f'{path} is a per-shard log, but no shards are assigned')
+        return ShardedTransitionLog(path, shard_ids, shard_count, **kwargs)
+    return TransitionLog(path, **kwargs)
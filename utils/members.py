@@ -0,0 +1,125 @@
+"""
+Member caching limited to the monitored bots.
+
+By default discord.py caches every member of every guild, chunking each one
+at startup, although the Uptime Bot only looks up the bots it monitors. With
+``MEMBER_CACHE=monitored`` no members are cached from the gateway and guilds
+are not chunked; the monitored bots are fetched, with their presences, when
+a shard is ready and when they are added, so presence updates and scheduled
+checks still find them. Commands get the members they are given from the
+interaction, and only the bulk commands that look at every member fetch the
+guild's members, without caching them; the bots among them are kept for a few
+minutes so repeated bulk commands do not download the member list again.
+"""
+
+import asyncio
+import time
+
+import discord
+
+MEMBER_CACHE_MODES = ('all', 'monitored')
+# Most user IDs Discord accepts in one member request
+QUERY_BATCH = 100
+# Guilds whose monitored bots are fetched at the same time when a shard is ready
+CACHE_CONCURRENCY = 10
+# Seconds a guild's bots, found by requesting all of its members, are reused
+BOT_LIST_TTL_SECONDS = 300
+
+
+def member_cache_options(mode):
+    """Get the bot options for a member cache mode."""
+    if mode not in MEMBER_CACHE_MODES:
+        raise ValueError(f'Unknown member cache mode: {mode}')
+    if mode == 'all':
+        return {}
+    return {'member_cache_flags': discord.MemberCacheFlags.none(), 'chunk_guilds_at_startup': False}
+
+
+async def fetch_members(guild, user_ids, cache=True):
+    """Fetch members of a guild by ID over the gateway, with their presences, in batches."""
+    user_ids = list(user_ids)
+    members = []
+    for i in range(0, len(user_ids), QUERY_BATCH):
+        members.extend(await guild.query_members(
+            user_ids=user_ids[i:i + QUERY_BATCH], limit=QUERY_BATCH, presences=True, cache=cache
+        ))
+    return members
+
+
+class MonitoredMembers:
+    """Keeps the monitored bots of every guild in the member cache when the rest of it is off."""
+
+    def __init__(self, bot, enabled):
+        self.bot = bot
+        self.enabled = enabled
+        self._tasks = set()
+        # guild_id -> (time.monotonic() when fetched, bot members)
+        self._bot_lists = {}
+
+    def missing(self, guild, bot_ids):
+        """Get the IDs of bots that are not in a guild's member cache."""
+        return [bot_id for bot_id in bot_ids if guild.get_member(bot_id) is None]
+
+    async def cache(self, guild, bot_ids):
+        """Fetch and cache the given bots of a guild unless they are cached already. Returns how many were fetched."""
+        if not self.enabled:
+            return 0
+        missing = self.missing(guild, bot_ids)
+        if not missing:
+            return 0
+        try:
+            return len(await fetch_members(guild, missing))
+        except (asyncio.TimeoutError, discord.ClientException) as e:
+            print(f'Failed to fetch monitored bots of guild {guild.id}: {e}')
+            return 0
+
+    async def cache_shard(self, shard_id):
+        """Cache the monitored bots of every guild on a shard, a few guilds at a time. Returns how many were fetched."""
+        semaphore = asyncio.Semaphore(CACHE_CONCURRENCY)
+
+        async def cache_guild(guild):
+            async with semaphore:
+                return await self.cache(guild, self.bot.store.get_monitored(guild.id))
+
+        guilds = [guild for guild in self.bot.guilds if guild.shard_id == shard_id]
+        return sum(await asyncio.gather(*(cache_guild(guild) for guild in guilds)))
+
+    async def bots(self, guild, role=None):
+        """
+        Get the bots of a guild, or those with a role.
+
+        Served from the member cache if the guild is fully cached. Otherwise the
+        guild's members are requested without being cached, and its bots are
+        reused for BOT_LIST_TTL_SECONDS.
+        """
+        if guild.chunked:
+            members = role.members if role else guild.members
+            return [member for member in members if member.bot]
+
+        now = time.monotonic()
+        fetched = self._bot_lists.get(guild.id)
+        if fetched is None or now - fetched[0] >= BOT_LIST_TTL_SECONDS:
+            members = await guild.chunk(cache=False)
+            # Drop the expired lists of other guilds while at it
+            self._bot_lists = {
+                guild_id: entry for guild_id, entry in self._bot_lists.items()
+                if now - entry[0] < BOT_LIST_TTL_SECONDS
+            }
+            fetched = self._bot_lists[guild.id] = (now, [member for member in members if member.bot])
+
+        bots = fetched[1]
+        if role:
+            bots = [member for member in bots if member.get_role(role.id)]
+        return bots
+
+    def forget_bots(self, guild_id):
+        """Drop a guild's reused bot list, e.g. when a bot joins or leaves it."""
+        self._bot_lists.pop(guild_id, None)
+
+    def cache_later(self, guild, bot_ids):
+        """Cache bots of a guild in the background."""
+        if not self.enabled:
+            return
+        task = asyncio.create_task(self.cache(guild, list(bot_ids)))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
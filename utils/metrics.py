@@ -0,0 +1,190 @@
+"""
+Runtime metrics for the Uptime Bot.
+
+Counters, gauges and histograms are registered in a single registry and can be
+rendered in the Prometheus text format, either from the local HTTP endpoint or
+the ``/config metrics`` command.
+"""
+
+import asyncio
+import bisect
+import time
+
+# Default histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Counter:
+    """A value that only goes up."""
+
+    kind = 'counter'
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.value = 0
+
+    def inc(self, amount=1):
+        """Increase the counter."""
+        self.value += amount
+
+    def samples(self):
+        """Yield (name, value) samples."""
+        yield self.name, self.value
+
+
+class Gauge:
+    """A value that can go up and down, or is read from a callback when rendered."""
+
+    kind = 'gauge'
+
+    def __init__(self, name, help, callback=None):
+        self.name = name
+        self.help = help
+        self.value = 0
+        self.callback = callback
+
+    def set(self, value):
+        """Set the gauge."""
+        self.value = value
+
+    def samples(self):
+        """Yield (name, value) samples."""
+        yield self.name, self.callback() if self.callback else self.value
+
+
+class Histogram:
+    """Counts observations into cumulative buckets."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        """Record an observation."""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def time(self):
+        """Context manager observing the duration of its block."""
+        return _Timer(self)
+
+    def mean(self):
+        """Get the mean observation, or 0 if there are none."""
+        return self.sum / self.count if self.count else 0.0
+
+    def samples(self):
+        """Yield (name, value) samples in the Prometheus histogram layout."""
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{self.name}_bucket{{le="{bound}"}}', cumulative
+        yield f'{self.name}_bucket{{le="+Inf"}}', self.count
+        yield f'{self.name}_sum', self.sum
+        yield f'{self.name}_count', self.count
+
+
+class _Timer:
+    """Observes the time spent in a with block."""
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started)
+
+
+class Registry:
+    """Collection of named metrics."""
+
+    def __init__(self):
+        self.metrics = {}
+
+    def _get(self, cls, name, *args, **kwargs):
+        """Get a metric by name, creating it on first use."""
+        if name not in self.metrics:
+            self.metrics[name] = cls(name, *args, **kwargs)
+        return self.metrics[name]
+
+    def counter(self, name, help):
+        """Get or create a counter."""
+        return self._get(Counter, name, help)
+
+    def gauge(self, name, help, callback=None):
+        """Get or create a gauge. A callback replaces any previous one."""
+        gauge = self._get(Gauge, name, help)
+        if callback is not None:
+            gauge.callback = callback
+        return gauge
+
+    def histogram(self, name, help, buckets=DEFAULT_BUCKETS):
+        """Get or create a histogram."""
+        return self._get(Histogram, name, help, buckets)
+
+    def render(self):
+        """Render every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            try:
+                lines.extend(f'{name} {value}' for name, value in metric.samples())
+            except Exception as e:
+                lines.append(f'# {metric.name} unavailable: {e}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+LOOP_LAG = REGISTRY.gauge('uptime_event_loop_lag_seconds', 'How late the event loop woke up a timer')
+
+
+async def watch_loop_lag(interval=1.0):
+    """Measure event loop lag forever by checking how late a sleep wakes up."""
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        LOOP_LAG.set(max(0.0, time.perf_counter() - started - interval))
+
+
+async def _handle_request(reader, writer):
+    """Serve the metrics over a minimal HTTP/1.0 response."""
+    try:
+        request = await reader.readline()
+        # Drain the headers
+        while (await reader.readline()).strip():
+            pass
+
+        if request.split(b' ')[1:2] in ([b'/metrics'], [b'/']):
+            body = REGISTRY.render().encode()
+            status = b'200 OK'
+        else:
+            body = b'Not Found\n'
+            status = b'404 Not Found'
+
+        writer.write(
+            b'HTTP/1.0 ' + status + b'\r\n'
+            b'Content-Type: text/plain; version=0.0.4\r\n'
+            b'Content-Length: ' + str(len(body)).encode() + b'\r\n\r\n' + body
+        )
+        await writer.drain()
+    except (ConnectionError, IndexError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_metrics_server(port, host='127.0.0.1'):
+    """Start the Prometheus HTTP endpoint on a local port."""
+    return await asyncio.start_server(_handle_request, host, port)
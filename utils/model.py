@@ -0,0 +1,441 @@
+"""
+Typed in-memory model of the monitored bots.
+
+Guild, channel and bot IDs are integers, statuses are a small enum and
+timestamps are epoch seconds. The on-disk layout (string snowflakes and ISO
+timestamps) is only produced and parsed at the persistence boundary, by
+``from_document``, ``SubscriberStats.from_dict`` and ``SubscriberStats.to_dict``.
+"""
+
+from datetime import datetime
+from enum import IntEnum
+
+
+class Status(IntEnum):
+    """A Discord presence status."""
+
+    OFFLINE = 0
+    ONLINE = 1
+    IDLE = 2
+    DND = 3
+
+    @classmethod
+    def parse(cls, value):
+        """Convert a discord.Status or status string. Unknown statuses count as online."""
+        return _STATUS_NAMES.get(str(value), cls.ONLINE)
+
+    @property
+    def online(self):
+        """Check whether the status counts as online."""
+        return self is not Status.OFFLINE
+
+    def __str__(self):
+        return self.name.lower()
+
+
+_STATUS_NAMES = {str(status): status for status in Status}
+_STATUS_NAMES['invisible'] = Status.OFFLINE
+
+
+def shard_of(guild_id, shard_count):
+    """Get the ID of the shard a guild belongs to."""
+    return (guild_id >> 22) % (shard_count or 1)
+
+
+def to_timestamp(value):
+    """Parse an ISO timestamp from disk into epoch seconds, or None."""
+    return int(datetime.fromisoformat(value).timestamp()) if value else None
+
+
+def to_iso(timestamp):
+    """Format epoch seconds as the ISO timestamp stored on disk, or None."""
+    return datetime.fromtimestamp(timestamp).isoformat() if timestamp is not None else None
+
+
+class ProbeStats:
+    """Health probe results for a bot with a probe target."""
+
+    __slots__ = ('ok', 'failed', 'p50', 'p95', 'p99', 'last_probe', 'last_ok')
+
+    def __init__(self):
+        self.ok = 0
+        self.failed = 0
+        # Latency percentiles of recent successful probes, in milliseconds
+        self.p50 = None
+        self.p95 = None
+        self.p99 = None
+        self.last_probe = None
+        self.last_ok = None
+
+    @classmethod
+    def from_dict(cls, stats):
+        """Build probe stats from the probe fields of the on-disk stats, or None if there are none."""
+        if stats.get('probe_ok') is None:
+            return None
+        self = cls()
+        self.ok = stats['probe_ok']
+        self.failed = stats.get('probe_failed') or 0
+        self.p50 = stats.get('probe_p50')
+        self.p95 = stats.get('probe_p95')
+        self.p99 = stats.get('probe_p99')
+        self.last_probe = to_timestamp(stats.get('last_probe'))
+        self.last_ok = bool(stats['last_probe_ok']) if stats.get('last_probe_ok') is not None else None
+        return self
+
+    def to_dict(self):
+        """Convert the probe stats to the probe fields of the on-disk stats."""
+        return {
+            'probe_ok': self.ok,
+            'probe_failed': self.failed,
+            'probe_p50': self.p50,
+            'probe_p95': self.p95,
+            'probe_p99': self.p99,
+            'last_probe': to_iso(self.last_probe),
+            'last_probe_ok': self.last_ok,
+        }
+
+    def copy(self):
+        """Copy the probe stats."""
+        copy = ProbeStats.__new__(ProbeStats)
+        for name in self.__slots__:
+            setattr(copy, name, getattr(self, name))
+        return copy
+
+
+class BotStats:
+    """
+    Uptime accounting for one monitored bot, shared by every guild monitoring it.
+
+    Its on-disk fields are saved with each guild's stats, next to the guild's
+    own view of them (see ``SubscriberStats``).
+    """
+
+    __slots__ = ('online_seconds', 'offline_seconds', 'last_status', 'last_change', 'last_check', 'first_seen')
+
+    def __init__(self, status, now):
+        self.online_seconds = 0
+        self.offline_seconds = 0
+        self.last_status = status
+        self.last_change = now
+        self.last_check = now
+        self.first_seen = now
+
+    @classmethod
+    def from_dict(cls, stats):
+        """Build a bot's stats from the on-disk layout of a guild's stats, which older files do not keep apart."""
+        self = cls.__new__(cls)
+        self.last_status = Status.parse(stats.get('last_status'))
+        self.last_check = to_timestamp(stats.get('last_check'))
+        if 'bot_online_seconds' in stats:
+            self.online_seconds = stats['bot_online_seconds'] or 0
+            self.offline_seconds = stats['bot_offline_seconds'] or 0
+            self.last_change = to_timestamp(stats.get('bot_last_change')) or self.last_check
+            self.first_seen = to_timestamp(stats.get('bot_first_seen'))
+        else:
+            self.online_seconds, self.offline_seconds = guild_durations(stats)
+            self.last_change = to_timestamp(stats.get('last_change')) or self.last_check
+            self.first_seen = to_timestamp(stats.get('first_seen'))
+        return self
+
+    def to_dict(self):
+        """Convert the stats to their fields of the on-disk layout."""
+        return {
+            'last_status': str(self.last_status),
+            'last_check': to_iso(self.last_check),
+            'bot_online_seconds': self.online_seconds,
+            'bot_offline_seconds': self.offline_seconds,
+            'bot_last_change': to_iso(self.last_change),
+            'bot_first_seen': to_iso(self.first_seen),
+        }
+
+    def copy(self):
+        """Copy the stats."""
+        copy = BotStats.__new__(BotStats)
+        for name in self.__slots__:
+            setattr(copy, name, getattr(self, name))
+        return copy
+
+
+def guild_durations(stats):
+    """Get the (online, offline) seconds of a guild's on-disk stats, converting legacy per-minute tick counters."""
+    if 'online_seconds' in stats:
+        return stats['online_seconds'] or 0, stats['offline_seconds'] or 0
+    return stats.get('online_time', 0) * 60, stats.get('offline_time', 0) * 60
+
+
+class SubscriberStats:
+    """
+    A guild's view of the shared BotStats of a bot it monitors.
+
+    The guild only keeps when it started monitoring the bot, its probe results
+    and how much the shared stats had recorded by then (``online_base`` and
+    ``offline_base``), so a status is accounted for once however many guilds
+    monitor the bot.
+    """
+
+    __slots__ = ('record', 'first_seen', 'online_base', 'offline_base', 'probe')
+
+    def __init__(self, record, now):
+        self.record = record
+        self.first_seen = now
+        self.online_base = record.online_seconds
+        self.offline_base = record.offline_seconds
+        # ProbeStats, or None if the bot has never been probed
+        self.probe = None
+
+    @property
+    def online_seconds(self):
+        """Seconds the bot was online since the guild started monitoring it."""
+        return self.record.online_seconds - self.online_base
+
+    @online_seconds.setter
+    def online_seconds(self, seconds):
+        self.online_base = self.record.online_seconds - seconds
+
+    @property
+    def offline_seconds(self):
+        """Seconds the bot was offline since the guild started monitoring it."""
+        return self.record.offline_seconds - self.offline_base
+
+    @offline_seconds.setter
+    def offline_seconds(self, seconds):
+        self.offline_base = self.record.offline_seconds - seconds
+
+    @property
+    def last_status(self):
+        """The bot's last recorded Status."""
+        return self.record.last_status
+
+    @property
+    def last_check(self):
+        """When the bot's status was last recorded."""
+        return self.record.last_check
+
+    @property
+    def last_change(self):
+        """The last change of the bot's status, or when the guild started monitoring it if that was later."""
+        changes = [timestamp for timestamp in (self.record.last_change, self.first_seen) if timestamp is not None]
+        return max(changes) if changes else None
+
+    @classmethod
+    def from_dict(cls, stats):
+        """Build a guild's stats from the on-disk layout, with a copy of the bot's stats until ``link`` shares them."""
+        self = cls.__new__(cls)
+        self.record = BotStats.from_dict(stats)
+        online, offline = guild_durations(stats)
+        self.online_base = self.record.online_seconds - online
+        self.offline_base = self.record.offline_seconds - offline
+        self.first_seen = to_timestamp(stats.get('first_seen'))
+        self.probe = ProbeStats.from_dict(stats)
+        return self
+
+    def link(self, records, bot_id):
+        """
+        Use the bot's stats in ``records`` ({bot_id: BotStats}), adding this copy if it has none.
+
+        The guild keeps its own durations, plus what the shared stats have
+        recorded since this copy was saved if both come from the same stats.
+        """
+        record = records.setdefault(bot_id, self.record)
+        if record is self.record:
+            return
+        online, offline = self.online_seconds, self.offline_seconds
+        if record.first_seen is not None and record.first_seen == self.record.first_seen:
+            online += max(0, record.online_seconds - self.record.online_seconds)
+            offline += max(0, record.offline_seconds - self.record.offline_seconds)
+        self.record = record
+        self.online_seconds = online
+        self.offline_seconds = offline
+
+    def to_dict(self):
+        """Convert the stats to the on-disk layout, with the bot's shared stats."""
+        stats = {
+            'online_seconds': self.online_seconds,
+            'offline_seconds': self.offline_seconds,
+            'last_change': to_iso(self.last_change),
+            'first_seen': to_iso(self.first_seen),
+            **self.record.to_dict(),
+        }
+        if self.probe is not None:
+            stats.update(self.probe.to_dict())
+        return stats
+
+    def copy(self):
+        """Copy the stats, with a copy of the bot's stats so neither changes with the originals."""
+        copy = SubscriberStats.__new__(SubscriberStats)
+        copy.record = self.record.copy()
+        copy.first_seen = self.first_seen
+        copy.online_base = self.online_base
+        copy.offline_base = self.offline_base
+        copy.probe = self.probe.copy() if self.probe is not None else None
+        return copy
+
+
+class GuildState:
+    """A guild's notification channel and monitored bots, in monitoring order."""
+
+    __slots__ = ('channel_id', 'bots', 'intervals', 'probes', 'records', '_loader')
+
+    def __init__(self, channel_id=None, bot_ids=(), loader=None, intervals=None, probes=None, records=None):
+        self.channel_id = channel_id
+        # bot_id -> SubscriberStats, or None until the bot's first status is recorded here
+        self.bots = dict.fromkeys(bot_ids)
+        # bot_id -> check interval in seconds, only for bots not using the default
+        self.intervals = intervals or {}
+        # bot_id -> health probe target (HTTP URL or TCP host:port), only for probed bots
+        self.probes = probes or {}
+        # bot_id -> BotStats shared with the other guilds, or None to keep the saved copies
+        self.records = records
+        self._loader = loader
+
+    def _load(self):
+        """Parse the stats from the on-disk layout the first time they are needed."""
+        loader, self._loader = self._loader, None
+        self._install(parse_stats(loader, self.bots.keys()))
+
+    def link(self, records):
+        """Share the bots' stats with the other guilds using ``records`` ({bot_id: BotStats})."""
+        self.records = records
+        if self._loader is None:
+            for bot_id, stats in self.bots.items():
+                if stats is not None:
+                    stats.link(records, bot_id)
+
+    def is_loaded(self):
+        """Check whether the stats have been parsed from the on-disk layout."""
+        return self._loader is None
+
+    def stats_reader(self):
+        """
+        Get a function that reads and parses the stats without loading them, or None if they are loaded.
+
+        It is meant for a worker thread; hand its result to ``install_stats``.
+        """
+        if self._loader is None:
+            return None
+        loader, bot_ids = self._loader, set(self.bots)
+        return lambda: parse_stats(loader, bot_ids)
+
+    def install_stats(self, stats):
+        """Use stats parsed ahead of time, unless the guild has loaded its own since."""
+        if self._loader is None:
+            return
+        self._loader = None
+        self._install(stats)
+
+    def _install(self, stats):
+        """Use parsed stats, sharing each bot's with the other guilds if there are records."""
+        for bot_id, bot_stats in stats.items():
+            if bot_id in self.bots:
+                if self.records is not None:
+                    bot_stats.link(self.records, bot_id)
+                self.bots[bot_id] = bot_stats
+
+    def get_stats(self, bot_id):
+        """Get a bot's stats, or None if it has none yet."""
+        if self._loader is not None:
+            self._load()
+        return self.bots.get(bot_id)
+
+    def set_stats(self, bot_id, stats):
+        """Set the stats of a monitored bot."""
+        if self._loader is not None:
+            self._load()
+        self.bots[bot_id] = stats
+
+    def is_empty(self):
+        """Check whether the guild has neither a channel nor monitored bots."""
+        return self.channel_id is None and not self.bots
+
+    def copy(self):
+        """
+        Copy the guild, so it can be serialized in a worker thread while this one changes.
+
+        Stats that have not been parsed yet stay unparsed in both; their on-disk
+        layout is shared, as parsing only reads it.
+        """
+        if self._loader is not None:
+            stats = self._loader()
+            self._loader = lambda: stats
+        copy = GuildState(self.channel_id, (), self._loader, dict(self.intervals), dict(self.probes))
+        copy.bots = {bot_id: stats.copy() if stats is not None else None for bot_id, stats in self.bots.items()}
+        return copy
+
+
+def from_document(data):
+    """
+    Build {guild_id: GuildState} from a data document in the on-disk layout.
+
+    Each guild's stats are taken out of ``data['uptime_stats']`` and converted
+    the first time they are needed, so the raw document is released as it goes.
+    """
+    guilds = {}
+    channels = data.get('channels', {})
+    monitored = data.get('monitored_bots', {})
+    uptime_stats = data.get('uptime_stats', {})
+    check_intervals = data.get('check_intervals', {})
+    probe_targets = data.get('probe_targets', {})
+
+    for guild_id in channels.keys() | monitored.keys():
+        channel_id = channels.get(guild_id)
+        guilds[int(guild_id)] = GuildState(
+            int(channel_id) if channel_id is not None else None,
+            map(int, monitored.get(guild_id, ())),
+            lambda guild_id=guild_id: uptime_stats.pop(guild_id, None) or {},
+            {int(bot_id): seconds for bot_id, seconds in check_intervals.get(guild_id, {}).items()},
+            {int(bot_id): target for bot_id, target in probe_targets.get(guild_id, {}).items()},
+        )
+    return guilds
+
+
+def parse_stats(loader, bot_ids):
+    """Read a guild's stats with its loader and parse those of the given bots (blocking)."""
+    return {
+        int(bot_id): SubscriberStats.from_dict(stats)
+        for bot_id, stats in loader().items()
+        if int(bot_id) in bot_ids
+    }
+
+
+def copy_guilds(guilds):
+    """Copy {guild_id: GuildState}, cheaply enough to do on the event loop."""
+    return {guild_id: guild.copy() for guild_id, guild in guilds.items()}
+
+
+def guild_stats_to_dict(guild):
+    """Convert a guild's recorded stats to the on-disk layout, keyed by bot ID string."""
+    result = {}
+    for bot_id in guild.bots:
+        stats = guild.get_stats(bot_id)
+        if stats is not None:
+            result[str(bot_id)] = stats.to_dict()
+    return result
+
+
+def intervals_to_dict(guild):
+    """Convert a guild's custom check intervals to the on-disk layout, keyed by bot ID string."""
+    return {str(bot_id): seconds for bot_id, seconds in guild.intervals.items()}
+
+
+def probes_to_dict(guild):
+    """Convert a guild's probe targets to the on-disk layout, keyed by bot ID string."""
+    return {str(bot_id): target for bot_id, target in guild.probes.items()}
+
+
+def to_document(guilds):
+    """Convert {guild_id: GuildState} to a data document in the on-disk layout."""
+    data = {'channels': {}, 'monitored_bots': {}, 'uptime_stats': {}, 'check_intervals': {}, 'probe_targets': {}}
+    for guild_id, guild in guilds.items():
+        key = str(guild_id)
+        if guild.channel_id is not None:
+            data['channels'][key] = str(guild.channel_id)
+        if guild.bots:
+            data['monitored_bots'][key] = [str(bot_id) for bot_id in guild.bots]
+            stats = guild_stats_to_dict(guild)
+            if stats:
+                data['uptime_stats'][key] = stats
+        if guild.intervals:
+            data['check_intervals'][key] = intervals_to_dict(guild)
+        if guild.probes:
+            data['probe_targets'][key] = probes_to_dict(guild)
+    return data
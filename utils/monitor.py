@@ -0,0 +1,90 @@
+"""
+Status tracking helpers shared by the presence listener and the reconciliation sweep.
+"""
+
+# Longest gap (in seconds) that is still credited to the last known status.
+# Anything longer means we were not watching (e.g. the bot was restarted).
+MAX_GAP_SECONDS = 30 * 60
+
+
+def record_status(stats, status, now, rollup=None):
+    """
+    Record an observed status in a monitored bot's stats.
+
+    The time since the last check is credited to the previously recorded status,
+    and to the bot's rollup if one is given. ``status`` is a Status and ``now``
+    is in epoch seconds.
+    Returns the previous status if the bot went online or offline, otherwise None.
+    """
+    last_status = stats.last_status
+    last_check = stats.last_check
+    elapsed = now - last_check if last_check is not None else 0
+
+    if 0 < elapsed <= MAX_GAP_SECONDS:
+        if last_status.online:
+            stats.online_seconds += elapsed
+        else:
+            stats.offline_seconds += elapsed
+        if rollup is not None:
+            rollup.credit(last_check, now, last_status.online)
+
+    stats.last_check = now
+    stats.last_status = status
+
+    if last_status.online == status.online:
+        return None
+
+    stats.last_change = now
+    return last_status
+
+
+def status_message(name, status):
+    """Build the notification text for a status change."""
+    if status == 'offline':
+        return f'⚠️ **{name}** is now **offline**!'
+    return f'✅ **{name}** is now **online**!'
+
+
+def get_durations(stats):
+    """Get the (online, offline) seconds recorded in a bot's uptime stats (None if it has none)."""
+    if stats is None:
+        return 0, 0
+    return stats.online_seconds, stats.offline_seconds
+
+
+def uptime_percentage(online_seconds, offline_seconds):
+    """Calculate an uptime percentage from online and offline durations."""
+    total = online_seconds + offline_seconds
+    if total == 0:
+        return 0.0
+    return (online_seconds / total) * 100
+
+
+def format_duration(seconds):
+    """Format a number of seconds as a short human readable duration."""
+    seconds = int(seconds)
+    days, seconds = divmod(seconds, 86400)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+
+    if days:
+        return f'{days}d {hours}h {minutes}m'
+    if hours:
+        return f'{hours}h {minutes}m'
+    if minutes:
+        return f'{minutes}m {seconds}s'
+    return f'{seconds}s'
+
+
+def pending_interval(stats, now):
+    """
+    Get the (start, end, online) interval not yet credited to a bot's stats.
+
+    Returns None if nothing is pending or the bot has not been checked recently.
+    """
+    if stats is None or stats.last_check is None:
+        return None
+    elapsed = now - stats.last_check
+    if not 0 < elapsed <= MAX_GAP_SECONDS:
+        return None
+    return stats.last_check, now, stats.last_status.online
@@ -0,0 +1,159 @@
+"""
+Notification dispatcher for status changes.
+
+Status changes are queued per channel and sent by a worker task, so status
+collection never waits on Discord. Changes arriving within a short window are
+merged into a single message, and bots that keep flipping between online and
+offline are reported once as flapping instead of flooding the channel.
+"""
+
+import asyncio
+import time
+from collections import deque
+
+import discord
+
+from utils.metrics import REGISTRY
+from utils.monitor import status_message
+
+# Most status lines listed in one coalesced message
+MAX_LINES = 40
+
+SENT = REGISTRY.counter('uptime_notifications_sent_total', 'Notification messages sent')
+DROPPED = REGISTRY.counter('uptime_notifications_dropped_total', 'Status changes muted or lost instead of sent')
+
+
+class Notifier:
+    """Per-channel notification queues with coalescing and flap damping."""
+
+    def __init__(self, coalesce_seconds=5.0, flap_window=600, flap_threshold=4, max_retries=3):
+        self.coalesce_seconds = coalesce_seconds
+        self.flap_window = flap_window
+        self.flap_threshold = flap_threshold
+        self.max_retries = max_retries
+        self.sent = 0
+        self.dropped = 0
+
+        self._queues = {}
+        self._workers = {}
+        self._changes = {}
+        self._flapping = {}
+        self._settlers = set()
+
+    def notify(self, channel, member, status):
+        """Queue a status change notification without waiting for it to be sent."""
+        key = (channel.id, member.id)
+        now = time.monotonic()
+        changes = self._changes.setdefault(key, deque())
+        while changes and changes[0] <= now - self.flap_window:
+            changes.popleft()
+        changes.append(now)
+
+        if key in self._flapping:
+            # Muted; remember the latest status for when the bot settles
+            self._flapping[key] = status
+            self.dropped += 1
+            DROPPED.inc()
+            return
+
+        if len(changes) > self.flap_threshold:
+            self._flapping[key] = status
+            self._enqueue(channel, (member.id, member.name, status, 'flapping'))
+            task = asyncio.create_task(self._settle(key, channel, member.id, member.name, status))
+            self._settlers.add(task)
+            task.add_done_callback(self._settlers.discard)
+            return
+
+        self._enqueue(channel, (member.id, member.name, status, 'status'))
+
+    def _enqueue(self, channel, event):
+        """Put an event on a channel's queue, starting its worker if needed."""
+        queue = self._queues.get(channel.id)
+        if queue is None:
+            queue = self._queues[channel.id] = asyncio.Queue()
+            self._workers[channel.id] = asyncio.create_task(self._worker(channel, queue))
+        queue.put_nowait(event)
+
+    async def _settle(self, key, channel, bot_id, name, reported):
+        """Unmute a flapping bot once it has been stable for a full window."""
+        while True:
+            quiet_for = time.monotonic() - self._changes[key][-1]
+            if quiet_for >= self.flap_window:
+                break
+            await asyncio.sleep(self.flap_window - quiet_for)
+
+        status = self._flapping.pop(key)
+        self._changes.pop(key, None)
+        if status != reported:
+            self._enqueue(channel, (bot_id, name, status, 'status'))
+
+    def queue_depth(self):
+        """Get the number of notifications waiting to be sent."""
+        return sum(queue.qsize() for queue in self._queues.values())
+
+    async def _worker(self, channel, queue):
+        """Send a channel's queued notifications, merging bursts into one message."""
+        while True:
+            events = [await queue.get()]
+            await asyncio.sleep(self.coalesce_seconds)
+            while not queue.empty():
+                events.append(queue.get_nowait())
+
+            # Keep only the latest change per bot
+            latest = {}
+            for event in events:
+                latest.pop(event[0], None)
+                latest[event[0]] = event
+
+            try:
+                await self._send(channel, list(latest.values()))
+                self.sent += 1
+                SENT.inc()
+            except Exception as e:
+                self.dropped += len(latest)
+                DROPPED.inc(len(latest))
+                print(f'Failed to send notification to {channel.id}: {e}')
+
+    def _render(self, events):
+        """Build the message content or embed for a batch of changes."""
+        lines = []
+        for _, name, status, kind in events[:MAX_LINES]:
+            if kind == 'flapping':
+                lines.append(f'🔁 **{name}** is flapping, muting its changes for a while')
+            else:
+                lines.append(status_message(name, status))
+
+        if len(events) == 1:
+            return {'content': lines[0]}
+
+        if len(events) > MAX_LINES:
+            lines.append(f'...and {len(events) - MAX_LINES} more')
+
+        offline = any(event[2] == 'offline' for event in events)
+        embed = discord.Embed(
+            title=f'🔔 {len(events)} status changes',
+            description='\n'.join(lines),
+            color=discord.Color.red() if offline else discord.Color.green()
+        )
+        return {'embed': embed}
+
+    async def _send(self, channel, events):
+        """Send a batch of changes, backing off when rate limited."""
+        message = self._render(events)
+        for attempt in range(self.max_retries + 1):
+            try:
+                await channel.send(**message)
+                return
+            except discord.HTTPException as e:
+                if e.status != 429 or attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(getattr(e, 'retry_after', None) or 2 ** attempt)
+
+    async def close(self):
+        """Stop all channel workers."""
+        tasks = [*self._workers.values(), *self._settlers]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers.clear()
+        self._queues.clear()
@@ -0,0 +1,135 @@
+"""
+Paginated embeds for commands that list every monitored bot in a guild.
+
+Pages are rendered lazily, one at a time, and the rendered pages are cached
+per guild until the store reports a status transition or membership change in
+that guild (or the entry gets too old to show current durations).
+"""
+
+import time
+from collections import OrderedDict
+
+import discord
+
+
+class PageSet:
+    """Lazily rendered pages over a fixed list of items."""
+
+    def __init__(self, items, per_page, render):
+        self.items = list(items)
+        self.per_page = per_page
+        # render(items, page_index, page_count) -> discord.Embed
+        self.render = render
+        self._pages = {}
+
+    def __len__(self):
+        return max(1, -(-len(self.items) // self.per_page))
+
+    def page(self, index):
+        """Get a rendered page, rendering it on first use."""
+        embed = self._pages.get(index)
+        if embed is None:
+            start = index * self.per_page
+            embed = self._pages[index] = self.render(self.items[start:start + self.per_page], index, len(self))
+        return embed
+
+
+class PageCache:
+    """
+    Caches page sets per (guild_id, key).
+
+    An entry is reused while the guild's store version is unchanged and it is
+    younger than ``max_age`` seconds. At most ``max_entries`` are kept.
+    """
+
+    def __init__(self, max_age=60, max_entries=1024):
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, guild_id, key, version, build):
+        """Get the cached page set, or build and cache a new one with build()."""
+        cache_key = (guild_id, key)
+        entry = self._entries.get(cache_key)
+        now = time.monotonic()
+        if entry is not None and entry[0] == version and now - entry[1] < self.max_age:
+            self._entries.move_to_end(cache_key)
+            return entry[2]
+
+        pages = build()
+        self._entries[cache_key] = (version, now, pages)
+        self._entries.move_to_end(cache_key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return pages
+
+    def clear(self):
+        """Drop every cached page set."""
+        self._entries.clear()
+
+
+class Paginator(discord.ui.View):
+    """Previous/next buttons for browsing a page set. Only the invoking user can turn pages."""
+
+    def __init__(self, pages, user_id, timeout=180):
+        super().__init__(timeout=timeout)
+        self.pages = pages
+        self.user_id = user_id
+        self.index = 0
+        self.message = None
+        self._update_buttons()
+
+    def _update_buttons(self):
+        """Enable the buttons that lead somewhere and show the page number."""
+        self.previous_page.disabled = self.index == 0
+        self.next_page.disabled = self.index >= len(self.pages) - 1
+        self.page_label.label = f'{self.index + 1}/{len(self.pages)}'
+
+    async def interaction_check(self, interaction):
+        """Only let the user who ran the command turn pages."""
+        if interaction.user.id == self.user_id:
+            return True
+        await interaction.response.send_message('⚠️ Run the command yourself to browse pages', ephemeral=True)
+        return False
+
+    async def _show(self, interaction, index):
+        """Switch to a page and update the message."""
+        self.index = index
+        self._update_buttons()
+        await interaction.response.edit_message(embed=self.pages.page(index), view=self)
+
+    @discord.ui.button(label='◀', style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction, button):
+        """Show the previous page."""
+        await self._show(interaction, max(0, self.index - 1))
+
+    @discord.ui.button(label='1/1', style=discord.ButtonStyle.secondary, disabled=True)
+    async def page_label(self, interaction, button):
+        """Page indicator; never enabled."""
+
+    @discord.ui.button(label='▶', style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction, button):
+        """Show the next page."""
+        await self._show(interaction, min(len(self.pages) - 1, self.index + 1))
+
+    async def on_timeout(self):
+        """Disable the buttons once the view stops listening."""
+        if self.message is None:
+            return
+        for item in self.children:
+            item.disabled = True
+        try:
+            await self.message.edit(view=self)
+        except discord.HTTPException:
+            pass
+
+
+async def send_pages(interaction, pages):
+    """Send the first page, with buttons if there is more than one."""
+    if len(pages) == 1:
+        await interaction.response.send_message(embed=pages.page(0))
+        return
+
+    view = Paginator(pages, interaction.user.id)
+    await interaction.response.send_message(embed=pages.page(0), view=view)
+    view.message = await interaction.original_response()
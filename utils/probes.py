@@ -0,0 +1,319 @@
+"""
+Health probes for monitored bots.
+
+Presence only shows whether a bot's gateway session is alive. A bot can also
+have a probe target, an HTTP(S) URL or a TCP host:port, that is checked on a
+fixed interval: HTTP targets must answer with a status below 400 and TCP
+targets must accept a connection. All HTTP probes share one pooled session,
+so connections to the same host are kept alive and reused, and a global
+semaphore caps how many probes run at once. Time spent waiting for a pooled
+connection counts towards neither a probe's latency nor its timeout; the
+timeout is a deadline for the whole request, so a server trickling its
+response cannot hold a probe for longer.
+
+Targets are set by guild admins, so they may only resolve to public
+addresses: loopback (the metrics endpoint, the cluster coordinator),
+private, link-local (cloud metadata) and reserved addresses are rejected
+when a target is set and again whenever a probe connects.
+"""
+
+import asyncio
+import ipaddress
+import math
+import re
+import socket
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import aiohttp
+from aiohttp.abc import AbstractResolver
+
+from utils.metrics import REGISTRY
+
+PROBE_INTERVAL_SECONDS = 60
+PROBE_TIMEOUT_SECONDS = 10
+PROBE_CONCURRENCY = 50
+# Keep-alive connections per host; a host serving many bots is probed over this many sockets
+PROBE_CONNECTIONS_PER_HOST = 4
+# Successful probe latencies kept per bot for the percentiles
+PROBE_SAMPLES = 100
+# Seconds allowed for resolving a target when it is set
+RESOLVE_TIMEOUT_SECONDS = 2
+
+PROBES = REGISTRY.counter('uptime_probes_total', 'Health probes run')
+PROBE_FAILURES = REGISTRY.counter('uptime_probe_failures_total', 'Health probes that failed or timed out')
+PROBE_ROUND_SECONDS = REGISTRY.histogram('uptime_probe_round_seconds', 'Time spent probing every target once')
+
+_HOST_PORT = re.compile(r'^(\[[0-9a-fA-F:]+\]|[A-Za-z0-9.-]+):(\d{1,5})$')
+
+
+def parse_target(text):
+    """
+    Parse a probe target into ('http', url) or ('tcp', host, port).
+
+    Raises ValueError if it is neither an HTTP(S) URL nor a host:port.
+    """
+    text = text.strip()
+    if text.startswith(('http://', 'https://')):
+        url = urlsplit(text)
+        if not url.hostname:
+            raise ValueError(f'No host in {text}')
+        return 'http', text
+
+    match = _HOST_PORT.match(text)
+    if not match or not 0 < int(match.group(2)) < 65536:
+        raise ValueError(f'{text} is not an HTTP(S) URL or host:port')
+    return 'tcp', match.group(1).strip('[]'), int(match.group(2))
+
+
+class BlockedTarget(ValueError):
+    """A probe target that is or resolves to an address that is not public."""
+
+
+def is_public(address):
+    """Check whether an IP address is a public unicast address."""
+    ip = ipaddress.ip_address(address.split('%', 1)[0])
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def is_ip_address(host):
+    """Check whether a host is an IP address rather than a name."""
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return True
+
+
+async def resolve_public(host, port, allow_private=False):
+    """
+    Resolve a host to its addresses.
+
+    Raises BlockedTarget if any of them is not public (unless allow_private),
+    or OSError if the host does not resolve.
+    """
+    infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    addresses = list(dict.fromkeys(info[4][0] for info in infos))
+    if not allow_private:
+        blocked = [address for address in addresses if not is_public(address)]
+        if blocked:
+            raise BlockedTarget(f'{host} resolves to non-public address {blocked[0]}')
+    return addresses
+
+
+async def check_target(text, allow_private=False):
+    """
+    Parse a probe target and check that its host resolves to public addresses only.
+
+    Raises ValueError (BlockedTarget for non-public addresses), OSError if the
+    host does not resolve or asyncio.TimeoutError if resolving takes too long.
+    """
+    target = parse_target(text)
+    if target[0] == 'http':
+        url = urlsplit(target[1])
+        host, port = url.hostname, url.port or (443 if url.scheme == 'https' else 80)
+    else:
+        _, host, port = target
+    await asyncio.wait_for(resolve_public(host, port, allow_private), RESOLVE_TIMEOUT_SECONDS)
+    return target
+
+
+class PublicResolver(AbstractResolver):
+    """An aiohttp resolver that refuses hosts resolving to non-public addresses."""
+
+    def __init__(self):
+        self._resolver = aiohttp.DefaultResolver()
+
+    async def resolve(self, host, port=0, family=socket.AF_INET):
+        hosts = await self._resolver.resolve(host, port, family)
+        for entry in hosts:
+            if not is_public(entry['host']):
+                raise OSError(f'{host} resolves to non-public address {entry["host"]}')
+        return hosts
+
+    async def close(self):
+        await self._resolver.close()
+
+
+def queue_trace():
+    """
+    Trace how long each request waits for a pooled connection, in its trace_request_ctx dict.
+
+    A deadline (an asyncio.timeout) in the dict is paused while the request waits.
+    """
+    async def queued_start(session, context, params):
+        timing = context.trace_request_ctx
+        timing['queued_at'] = time.perf_counter()
+        deadline = timing.get('deadline')
+        if deadline is not None and deadline.when() is not None:
+            timing['remaining'] = deadline.when() - asyncio.get_running_loop().time()
+            deadline.reschedule(None)
+
+    async def queued_end(session, context, params):
+        timing = context.trace_request_ctx
+        timing['queued'] += time.perf_counter() - timing.pop('queued_at')
+        remaining = timing.pop('remaining', None)
+        if remaining is not None:
+            timing['deadline'].reschedule(asyncio.get_running_loop().time() + remaining)
+
+    trace = aiohttp.TraceConfig()
+    trace.on_connection_queued_start.append(queued_start)
+    trace.on_connection_queued_end.append(queued_end)
+    return trace
+
+
+def percentile(ordered, fraction):
+    """Get a nearest-rank percentile of sorted samples."""
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def latency_percentiles(samples):
+    """Get the (p50, p95, p99) of latency samples in seconds, as milliseconds, or None without samples."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return tuple(round(percentile(ordered, fraction) * 1000, 1) for fraction in (0.5, 0.95, 0.99))
+
+
+class Prober:
+    """Probes every target in the store on a fixed interval and records the results."""
+
+    def __init__(self, store, interval=PROBE_INTERVAL_SECONDS, timeout=PROBE_TIMEOUT_SECONDS,
+                 concurrency=PROBE_CONCURRENCY, connections_per_host=PROBE_CONNECTIONS_PER_HOST,
+                 allow_private=False):
+        self.store = store
+        self.interval = interval
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.connections_per_host = connections_per_host
+        # Only for probing local test servers; never with untrusted guild admins
+        self.allow_private = allow_private
+        # (guild_id, bot_id) -> recent successful latencies in seconds
+        self.samples = {}
+        self.last_round = None
+        self.last_round_duration = 0.0
+        self._session = None
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._task = None
+
+    def _get_session(self):
+        """Get the shared HTTP session, creating it on first use."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.concurrency,
+                    limit_per_host=self.connections_per_host,
+                    ttl_dns_cache=300,
+                    # IP address hosts skip the resolver and are checked in _probe_http
+                    resolver=None if self.allow_private else PublicResolver()
+                ),
+                # No total timeout, which would include the wait for a pooled connection;
+                # _probe_http sets a deadline that leaves it out instead
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=self.timeout, sock_read=self.timeout),
+                headers={'User-Agent': 'Uptime-bot health probe'},
+                trace_configs=[queue_trace()]
+            )
+        return self._session
+
+    async def _probe_http(self, url):
+        """
+        Request a URL and read the response so the connection can be reused.
+
+        Returns (ok, seconds spent waiting for a pooled connection).
+        """
+        host = urlsplit(url).hostname
+        if not self.allow_private and is_ip_address(host) and not is_public(host):
+            raise BlockedTarget(f'{host} is not a public address')
+        timing = {'queued': 0.0}
+        async with asyncio.timeout(self.timeout) as timing['deadline']:
+            async with self._get_session().get(url, allow_redirects=False, trace_request_ctx=timing) as response:
+                await response.read()
+                return response.status < 400, timing['queued']
+
+    async def _probe_tcp(self, host, port):
+        """Open and close a TCP connection. Returns (ok, 0.0) like _probe_http."""
+        # Connect to the address that was checked, so the host cannot resolve differently in between
+        addresses = await asyncio.wait_for(resolve_public(host, port, self.allow_private), self.timeout)
+        _, writer = await asyncio.wait_for(asyncio.open_connection(addresses[0], port), self.timeout)
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+        return True, 0.0
+
+    async def probe(self, target):
+        """Probe one target. Returns (ok, latency in seconds)."""
+        async with self._semaphore:
+            started = time.perf_counter()
+            queued = 0.0
+            try:
+                kind, *address = parse_target(target)
+                if kind == 'http':
+                    ok, queued = await self._probe_http(*address)
+                else:
+                    ok, queued = await self._probe_tcp(*address)
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError, ValueError):
+                ok = False
+            return ok, time.perf_counter() - started - queued
+
+    async def _probe_bot(self, guild_id, bot_id, target):
+        """Probe a bot's target and record the result."""
+        ok, latency = await self.probe(target)
+        PROBES.inc()
+        samples = self.samples.get((guild_id, bot_id))
+        if samples is None:
+            samples = self.samples[(guild_id, bot_id)] = deque(maxlen=PROBE_SAMPLES)
+        if ok:
+            samples.append(latency)
+        else:
+            PROBE_FAILURES.inc()
+        self.store.record_probe(guild_id, bot_id, ok, latency_percentiles(samples))
+
+    async def run_once(self):
+        """Probe every target once, concurrently. Returns how many were probed."""
+        started = time.perf_counter()
+        targets = list(self.store.probe_targets())
+
+        # Forget the samples of bots that are no longer probed
+        probed = {(guild_id, bot_id) for guild_id, bot_id, _ in targets}
+        for key in self.samples.keys() - probed:
+            del self.samples[key]
+
+        await asyncio.gather(*(self._probe_bot(*target) for target in targets))
+
+        self.last_round = int(time.time())
+        self.last_round_duration = time.perf_counter() - started
+        PROBE_ROUND_SECONDS.observe(self.last_round_duration)
+        return len(targets)
+
+    async def _run(self):
+        """Probe every target once per interval."""
+        while True:
+            started = time.monotonic()
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f'Failed to run health probes: {e}')
+            await asyncio.sleep(max(0, self.interval - (time.monotonic() - started)))
+
+    def start(self):
+        """Start probing in the background."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Stop probing and close the HTTP session."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
@@ -0,0 +1,108 @@
+"""
+Profiling helpers for the Uptime Bot.
+
+``timed`` is a cheap, always-on decorator for command callbacks that records
+their duration and logs slow invocations. ``PROFILER`` captures cProfile data
+on demand, either for a period of time or for a number of scheduled check
+batches, and renders the hottest call paths as a text report.
+"""
+
+import asyncio
+import cProfile
+import functools
+import io
+import os
+import pstats
+import time
+
+from utils.metrics import REGISTRY
+
+COMMAND_SECONDS = REGISTRY.histogram('uptime_command_seconds', 'Time spent in slash command callbacks')
+
+# Commands slower than this are logged
+SLOW_COMMAND_SECONDS = float(os.getenv('SLOW_COMMAND_MS', '500')) / 1000
+
+
+def timed(func):
+    """Time a command callback, logging it if it is slower than SLOW_COMMAND_SECONDS."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            COMMAND_SECONDS.observe(elapsed)
+            if elapsed >= SLOW_COMMAND_SECONDS:
+                print(f'Slow command {func.__qualname__}: {elapsed * 1000:.0f}ms')
+
+    return wrapper
+
+
+class Profiler:
+    """On-demand cProfile capture. Only one capture can run at a time."""
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+
+    @property
+    def running(self):
+        """Check whether a capture is in progress."""
+        return self._lock.locked()
+
+    async def capture_duration(self, seconds):
+        """Profile everything running on the event loop for a number of seconds."""
+        async with self._lock:
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                profile.disable()
+            return profile
+
+    async def capture_batches(self, shard_monitors, batches, timeout=300):
+        """
+        Profile the next scheduled check batches the given shard monitors run.
+
+        The batches run on their own schedule; the capture ends once
+        ``batches`` of them have checked bots or after ``timeout`` seconds.
+        Returns (profile, batches captured).
+        """
+        async with self._lock:
+            profile = cProfile.Profile()
+            started = sum(shard_monitor.batches for shard_monitor in shard_monitors)
+            deadline = time.monotonic() + timeout
+            for shard_monitor in shard_monitors:
+                shard_monitor.profile = profile
+            try:
+                while time.monotonic() < deadline:
+                    captured = sum(shard_monitor.batches for shard_monitor in shard_monitors) - started
+                    if captured >= batches:
+                        break
+                    await asyncio.sleep(0.5)
+            finally:
+                for shard_monitor in shard_monitors:
+                    shard_monitor.profile = None
+            return profile, sum(shard_monitor.batches for shard_monitor in shard_monitors) - started
+
+
+def render_report(profile, title, limit=40):
+    """Render the hottest call paths of a capture as text."""
+    stream = io.StringIO()
+    stream.write(f'{title}\n\n')
+
+    stats = pstats.Stats(profile, stream=stream)
+    stats.strip_dirs()
+
+    stream.write('=== By cumulative time ===\n')
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+    stream.write('=== By internal time ===\n')
+    stats.sort_stats(pstats.SortKey.TIME).print_stats(limit)
+    stream.write('=== Callers of the hottest functions ===\n')
+    stats.print_callers(limit // 4)
+
+    return stream.getvalue()
+
+
+PROFILER = Profiler()
@@ -0,0 +1,241 @@
+"""
+Pre-aggregated uptime rollups.
+
+Each monitored bot keeps fixed-size ring buffers of online and observed seconds
+per minute, per hour and per day. They are credited as the monitor records
+statuses, so uptime over any window up to 120 days is answered by summing at
+most a few hundred buckets, however long the bot has been monitored. The raw
+transition log can then be expired without losing long-term SLA history.
+
+Rollups are saved to one file, or to one file per shard when the file name
+has ``{shard}`` and ``{shard_count}`` fields (cluster mode), so they follow
+their guilds to whichever process runs the shard. Each is saved under the ID
+of a guild monitoring its bot.
+"""
+
+import math
+import os
+import struct
+from array import array
+
+from utils.model import shard_of
+
+ROLLUP_FILE = 'rollups.bin'
+
+# (bucket width in seconds, number of buckets, array typecode)
+TIERS = (
+    (60, 60, 'H'),          # last hour by minute
+    (3600, 31 * 24, 'H'),   # last 31 days by hour
+    (86400, 120, 'I'),      # last 120 days by day
+)
+
+_HEADER = struct.Struct('<4sI')
+_KEY = struct.Struct('<QQ')
+_HEAD = struct.Struct('<q')
+_MAGIC = b'UPR1'
+
+
+def last_bucket(end, width):
+    """Get the bucket holding the last instant before ``end``."""
+    return (math.ceil(end) - 1) // width
+
+
+class Tier:
+    """Ring buffer of online/observed seconds for consecutive time buckets."""
+
+    __slots__ = ('width', 'size', 'head', 'online', 'observed')
+
+    def __init__(self, width, size, typecode):
+        self.width = width
+        self.size = size
+        self.head = -1
+        self.online = array(typecode, bytes(size * array(typecode).itemsize))
+        self.observed = array(typecode, bytes(size * array(typecode).itemsize))
+
+    def _advance(self, bucket):
+        """Move the head forward to a bucket, clearing the buckets it passes."""
+        if bucket <= self.head:
+            return
+        if self.head < 0 or bucket - self.head >= self.size:
+            cleared = range(self.size)
+        else:
+            cleared = (b % self.size for b in range(self.head + 1, bucket + 1))
+        for index in cleared:
+            self.online[index] = 0
+            self.observed[index] = 0
+        self.head = bucket
+
+    def credit(self, start, end, online):
+        """Add the seconds in [start, end) to the buckets they fall in."""
+        last = last_bucket(end, self.width)
+        self._advance(last)
+        start = max(start, (self.head - self.size + 1) * self.width)
+
+        while start < end:
+            bucket = int(start) // self.width
+            bucket_end = min(end, (bucket + 1) * self.width)
+            seconds = round(bucket_end - start)
+            index = bucket % self.size
+            self.observed[index] += seconds
+            if online:
+                self.online[index] += seconds
+            start = bucket_end
+
+    def span(self):
+        """Get the number of seconds this tier can cover."""
+        return self.width * self.size
+
+    def oldest(self):
+        """Get the start of the oldest bucket this tier still holds."""
+        return (self.head - self.size + 1) * self.width
+
+    def total(self, start, end):
+        """Sum (online, observed) seconds over the buckets overlapping [start, end)."""
+        first = max(int(start) // self.width, self.head - self.size + 1)
+        last = min(last_bucket(end, self.width), self.head)
+        online = observed = 0
+
+        for bucket in range(first, last + 1):
+            index = bucket % self.size
+            online += self.online[index]
+            observed += self.observed[index]
+
+        return online, observed
+
+    def series(self, start, end):
+        """Get (online, observed) seconds for every bucket from start up to end, oldest first."""
+        first = int(start) // self.width
+        last = last_bucket(end, self.width)
+        oldest = self.head - self.size + 1
+        return [
+            (self.online[bucket % self.size], self.observed[bucket % self.size])
+            if oldest <= bucket <= self.head else (0, 0)
+            for bucket in range(first, last + 1)
+        ]
+
+
+class Rollup:
+    """Minute, hour and day uptime tiers for a single monitored bot."""
+
+    __slots__ = ('tiers',)
+
+    def __init__(self):
+        self.tiers = [Tier(width, size, typecode) for width, size, typecode in TIERS]
+
+    def credit(self, start, end, online):
+        """Credit an interval with a known status to every tier."""
+        if end <= start:
+            return
+        for tier in self.tiers:
+            tier.credit(start, end, online)
+
+    def total(self, start, end):
+        """Sum (online, observed) seconds over a window using the finest tier still holding all of it."""
+        for tier in self.tiers:
+            if end - start <= tier.span() and start >= tier.oldest():
+                return tier.total(start, end)
+        return self.tiers[-1].total(start, end)
+
+    def series(self, start, end, width):
+        """Get per-bucket (online, observed) seconds from the tier with the given bucket width."""
+        for tier in self.tiers:
+            if tier.width == width:
+                return tier.series(start, end)
+        raise ValueError(f'No rollup tier with {width}s buckets')
+
+    def to_bytes(self):
+        """Serialize the tiers to a fixed-size byte string."""
+        return b''.join(
+            _HEAD.pack(tier.head) + tier.online.tobytes() + tier.observed.tobytes()
+            for tier in self.tiers
+        )
+
+    @classmethod
+    def from_bytes(cls, data, offset=0):
+        """Deserialize a rollup. Returns (rollup, new_offset)."""
+        rollup = cls()
+        for tier in rollup.tiers:
+            tier.head = _HEAD.unpack_from(data, offset)[0]
+            offset += _HEAD.size
+            for values in (tier.online, tier.observed):
+                size = len(values) * values.itemsize
+                values[:] = array(values.typecode, data[offset:offset + size])
+                offset += size
+        return rollup, offset
+
+
+def dump_rollups(rollups):
+    """Serialize a {(guild_id, bot_id): Rollup} mapping."""
+    parts = [_HEADER.pack(_MAGIC, len(rollups))]
+    for (guild_id, bot_id), rollup in rollups.items():
+        parts.append(_KEY.pack(guild_id, bot_id))
+        parts.append(rollup.to_bytes())
+    return b''.join(parts)
+
+
+def write_rollups(payload, path=ROLLUP_FILE):
+    """Atomically write serialized rollups to disk. Returns the number of bytes written."""
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(payload)
+    os.replace(temp_path, path)
+    return len(payload)
+
+
+def shard_file(template, shard_id, shard_count):
+    """Get the path of a shard's file from a path with {shard} and {shard_count} fields."""
+    return template.format(shard=shard_id, shard_count=shard_count)
+
+
+def dump_shard_rollups(rollups, template, shard_ids, shard_count):
+    """Serialize rollups into one payload per shard file. Returns {path: payload}."""
+    by_shard = {shard_id: {} for shard_id in shard_ids}
+    for key, rollup in rollups.items():
+        by_shard.setdefault(shard_of(key[0], shard_count), {})[key] = rollup
+    return {
+        shard_file(template, shard_id, shard_count): dump_rollups(shard_rollups)
+        for shard_id, shard_rollups in by_shard.items()
+    }
+
+
+def load_shard_rollups(template, shard_ids, shard_count):
+    """Load the rollups of some shards, saved by dump_shard_rollups."""
+    rollups = {}
+    for shard_id in shard_ids:
+        rollups.update(load_rollups(shard_file(template, shard_id, shard_count)))
+    return rollups
+
+
+def load_rollups(path=ROLLUP_FILE):
+    """Load the rollups saved by write_rollups."""
+    if not os.path.exists(path):
+        return {}
+
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    magic, count = _HEADER.unpack_from(data, 0)
+    if magic != _MAGIC:
+        raise ValueError(f'{path} is not a rollup file')
+
+    rollups = {}
+    offset = _HEADER.size
+    for _ in range(count):
+        guild_id, bot_id = _KEY.unpack_from(data, offset)
+        rollup, offset = Rollup.from_bytes(data, offset + _KEY.size)
+        rollups[(guild_id, bot_id)] = rollup
+    return rollups
+
+
+def by_bot(rollups):
+    """
+    Turn loaded {(guild_id, bot_id): Rollup} into {bot_id: Rollup}.
+
+    Files saved before rollups were shared by the guilds monitoring a bot may
+    hold one per guild; the one of the lowest guild ID is kept, the guild a
+    shared rollup is saved under.
+    """
+    result = {}
+    for (guild_id, bot_id), rollup in sorted(rollups.items(), key=lambda item: item[0], reverse=True):
+        result[bot_id] = rollup
+    return result
@@ -0,0 +1,90 @@
+"""
+Check scheduling for monitored bots.
+
+Each bot is checked on its own interval. Checks are kept in a min-heap keyed
+by due time, and every bot gets a fixed phase within its interval derived
+from its IDs, so a shard's checks are spread evenly over the interval instead
+of running in one burst.
+"""
+
+import heapq
+
+from utils.monitor import MAX_GAP_SECONDS
+
+CHECK_INTERVAL_SECONDS = 10 * 60
+MIN_CHECK_INTERVAL_SECONDS = 60
+# Half the longest gap that is credited to the bot's last status, so a check
+# that runs late still credits the whole interval
+MAX_CHECK_INTERVAL_SECONDS = MAX_GAP_SECONDS // 2
+
+
+def clamp_interval(interval):
+    """Limit a check interval to the allowed range."""
+    return min(max(interval, MIN_CHECK_INTERVAL_SECONDS), MAX_CHECK_INTERVAL_SECONDS)
+
+
+def next_check(guild_id, bot_id, interval, now):
+    """Get the first time after ``now`` at the bot's phase within its interval."""
+    phase = hash((guild_id, bot_id)) % interval
+    due = now - now % interval + phase
+    return due if due > now else due + interval
+
+
+class CheckScheduler:
+    """
+    A min-heap of (due, guild_id, bot_id) checks.
+
+    Each bot has at most one live check. Rescheduling or discarding a bot
+    leaves its old heap entry behind; stale entries are skipped when they
+    reach the top and dropped wholesale once they outnumber the live ones.
+    """
+
+    def __init__(self):
+        self._heap = []
+        # (guild_id, bot_id) -> due time of the live check
+        self._due = {}
+
+    def __len__(self):
+        return len(self._due)
+
+    def __contains__(self, key):
+        return key in self._due
+
+    def schedule(self, guild_id, bot_id, due):
+        """Schedule a bot's next check, replacing any existing one."""
+        self._due[(guild_id, bot_id)] = due
+        heapq.heappush(self._heap, (due, guild_id, bot_id))
+        if len(self._heap) > 2 * len(self._due) + 64:
+            self._heap = [(due, guild_id, bot_id) for (guild_id, bot_id), due in self._due.items()]
+            heapq.heapify(self._heap)
+
+    def discard(self, guild_id, bot_id):
+        """Cancel a bot's check if it has one."""
+        self._due.pop((guild_id, bot_id), None)
+
+    def _is_live(self, entry):
+        """Check whether a heap entry is a bot's current check."""
+        due, guild_id, bot_id = entry
+        return self._due.get((guild_id, bot_id)) == due
+
+    def next_due(self):
+        """Get the due time of the earliest check, or None if nothing is scheduled."""
+        while self._heap and not self._is_live(self._heap[0]):
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now):
+        """Remove and return the (guild_id, bot_id) of every check due at or before ``now``."""
+        due_checks = []
+        while self._heap and self._heap[0][0] <= now:
+            entry = heapq.heappop(self._heap)
+            if self._is_live(entry):
+                _, guild_id, bot_id = entry
+                del self._due[(guild_id, bot_id)]
+                due_checks.append((guild_id, bot_id))
+        return due_checks
+
+    def clear(self):
+        """Cancel every check."""
+        self._heap = []
+        self._due = {}
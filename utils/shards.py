@@ -0,0 +1,228 @@
+"""
+Per-shard monitoring for the Uptime Bot.
+
+Each gateway shard gets its own check scheduler and notification queues,
+and only ever touches the guilds that shard owns.
+"""
+
+import asyncio
+import time
+
+from utils.metrics import REGISTRY
+from utils.model import Status, shard_of
+from utils.scheduler import CheckScheduler, next_check
+
+CHECK_BATCH_SECONDS = REGISTRY.histogram(
+    'uptime_check_batch_seconds', 'Time spent running one batch of scheduled status checks'
+)
+CHECKS = REGISTRY.counter('uptime_scheduled_checks_total', 'Scheduled status checks run')
+PRESENCE_CHANGES = REGISTRY.counter(
+    'uptime_presence_changes_total', 'Bot presence changes processed and fanned out to their subscribed guilds'
+)
+
+
+class ShardMonitor:
+    """
+    Status tracking, reconciliation and notifications for one shard's guilds.
+
+    Presence events are recorded as they arrive. Every monitored bot is also
+    checked on its own interval, to catch missed events; the checks are spread
+    over the interval by a ``CheckScheduler``.
+    """
+
+    def __init__(self, bot, shard_id, notifier):
+        self.bot = bot
+        self.shard_id = shard_id
+        self.notifier = notifier
+        self.scheduler = CheckScheduler()
+        self.last_sweep = None
+        self.last_sweep_duration = 0.0
+        self.last_sweep_checked = 0
+        # Batches that checked at least one bot, and a cProfile.Profile to run them under
+        self.batches = 0
+        self.profile = None
+        self._wakeup = asyncio.Event()
+        self._task = None
+        bot.store.add_schedule_listener(self.schedule_bots)
+
+    def owns(self, guild_id):
+        """Check whether a guild belongs to this shard."""
+        return shard_of(guild_id, self.bot.shard_count) == self.shard_id
+
+    def get_channel(self, guild, bot_id):
+        """Get the notification channel for a monitored bot, or None if it is not monitored."""
+        if not self.bot.store.is_monitored(guild.id, bot_id):
+            return None
+
+        channel_id = self.bot.store.get_channel(guild.id)
+        if not channel_id:
+            return None
+
+        return guild.get_channel(channel_id)
+
+    def handle_status(self, guild, channel, member, now=None):
+        """Record a bot's status and queue a notification if it went online or offline."""
+        current_status = Status.parse(member.status)
+        previous = self.bot.store.record_status(guild.id, member.id, current_status, now)
+
+        if previous is not None:
+            self.notifier.notify(channel, member, str(current_status))
+
+    def schedule_bots(self, guild_id, bot_ids, now=None):
+        """Check newly added or rescheduled bots right away; they then follow their interval."""
+        if not self.owns(guild_id):
+            return
+        now = int(now or time.time())
+        for bot_id in bot_ids:
+            self.scheduler.schedule(guild_id, bot_id, now)
+        self._wakeup.set()
+
+    def schedule_all(self, now=None):
+        """Schedule every monitored bot of this shard at its phase within its interval."""
+        now = int(now or time.time())
+        store = self.bot.store
+        for guild_id, bots in store.monitored_guilds():
+            if not self.owns(guild_id):
+                continue
+            for bot_id in bots:
+                interval = store.get_check_interval(guild_id, bot_id)
+                self.scheduler.schedule(guild_id, bot_id, next_check(guild_id, bot_id, interval, now))
+        self._wakeup.set()
+
+    def run_due(self, now=None):
+        """Check the bots whose checks are due and schedule their next ones."""
+        started = time.perf_counter()
+        now = int(now or time.time())
+        store = self.bot.store
+        checked = 0
+
+        for guild_id, bot_id in self.scheduler.pop_due(now):
+            # Bots that were removed since they were scheduled just drop out
+            if not store.is_monitored(guild_id, bot_id):
+                continue
+            interval = store.get_check_interval(guild_id, bot_id)
+            self.scheduler.schedule(guild_id, bot_id, next_check(guild_id, bot_id, interval, now))
+
+            guild = self.bot.get_guild(guild_id)
+            if not guild:
+                continue
+            channel = self.get_channel(guild, bot_id)
+            if not channel:
+                continue
+            member = guild.get_member(bot_id)
+            if not member:
+                continue
+
+            if store.get_presence(bot_id) != Status.parse(member.status):
+                # A change the presence events missed; record it once and notify every subscribed guild
+                handle_presence(self.bot, member, now)
+            self.handle_status(guild, channel, member, now)
+            checked += 1
+
+        if checked:
+            self.last_sweep = now
+            self.last_sweep_duration = time.perf_counter() - started
+            self.last_sweep_checked = checked
+            CHECK_BATCH_SECONDS.observe(self.last_sweep_duration)
+            CHECKS.inc(checked)
+            self.batches += 1
+        return checked
+
+    async def _run(self):
+        """Sleep until the next check is due (or bots are scheduled), then run the due checks."""
+        while True:
+            next_due = self.scheduler.next_due()
+            timeout = None if next_due is None else max(0, next_due - time.time())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            profile = self.profile
+            if profile is not None:
+                profile.enable()
+            try:
+                self.run_due()
+            except Exception as e:
+                print(f'Failed to check bots on shard {self.shard_id}: {e}')
+            finally:
+                if profile is not None:
+                    profile.disable()
+
+    def start(self):
+        """Schedule this shard's bots and start running their checks."""
+        if self._task is None:
+            self.schedule_all()
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Stop the checks and the notification workers."""
+        self.bot.store.remove_schedule_listener(self.schedule_bots)
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.notifier.close()
+
+
+def handle_presence(bot, member, now=None):
+    """
+    Record a bot's status once and queue a notification in every guild monitoring it.
+
+    A bot's presence is the same in every guild, but Discord sends an update
+    for each guild it shares with us; only the first one of a change does any
+    work. The status is recorded in the bot's shared stats, and only an
+    online/offline change is fanned out. Guilds without a channel or a ready
+    shard, or that the bot has left, are not notified. Returns how many guilds
+    were notified.
+    """
+    store = bot.store
+    status = Status.parse(member.status)
+    if store.get_presence(member.id) == status:
+        return 0
+
+    previous = store.record_presence(member.id, status, now)
+    PRESENCE_CHANGES.inc()
+    if previous is None:
+        return 0
+
+    notified = 0
+    for guild_id, channel_id in list(store.subscribers(member.id)):
+        guild = bot.get_guild(guild_id)
+        if not guild or not channel_id:
+            continue
+        shard_monitor = bot.shard_monitors.get(guild.shard_id)
+        channel = guild.get_channel(channel_id)
+        subscriber = guild.get_member(member.id)
+        if not shard_monitor or not channel or not subscriber:
+            continue
+
+        shard_monitor.notifier.notify(channel, subscriber, str(status))
+        notified += 1
+    return notified
+
+
+def collect_status(bot):
+    """Summarize this process's shards as plain data for /config status and the cluster."""
+    guild_counts = {}
+    for guild in bot.guilds:
+        guild_counts[guild.shard_id] = guild_counts.get(guild.shard_id, 0) + 1
+
+    shards = []
+    for shard_id, latency in sorted(bot.latencies):
+        shard_monitor = bot.shard_monitors.get(shard_id)
+        last_sweep = shard_monitor.last_sweep if shard_monitor else None
+        shards.append({
+            'id': shard_id,
+            'latency': latency,
+            'guilds': guild_counts.get(shard_id, 0),
+            'last_sweep': last_sweep,
+            'checked': shard_monitor.last_sweep_checked if shard_monitor else 0,
+            'sweep_duration': shard_monitor.last_sweep_duration if shard_monitor else 0.0,
+            'scheduled': len(shard_monitor.scheduler) if shard_monitor else 0,
+        })
+
+    return {'guilds': len(bot.guilds), 'shards': shards}
@@ -0,0 +1,693 @@
+"""
+Storage backends for the Uptime Bot data store.
+
+A backend persists the in-memory data used by ``DataStore``. Saving happens in
+two steps: ``snapshot`` runs on the event loop and captures what needs to be
+written, then ``write`` does the blocking I/O in a worker thread. Whole
+documents are captured as a copy of the guilds and only encoded in ``write``.
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import zlib
+
+from utils.data import DATA_FILE, load_data, dump_data, write_data
+from utils.model import copy_guilds, from_document, guild_stats_to_dict, intervals_to_dict, probes_to_dict, to_document
+
+DATABASE_FILE = 'bot_data.db'
+DATA_DIR = 'data'
+INDEX_FILE = 'index.json'
+JOURNAL_DIR = 'journal'
+SNAPSHOT_FILE = 'snapshot.json'
+
+# Uptime stats fields stored as columns in the SQLite backend
+STATS_COLUMNS = {
+    'online_seconds': 'REAL NOT NULL DEFAULT 0',
+    'offline_seconds': 'REAL NOT NULL DEFAULT 0',
+    'last_status': 'TEXT',
+    'last_change': 'TEXT',
+    'last_check': 'TEXT',
+    'first_seen': 'TEXT',
+    'probe_ok': 'INTEGER',
+    'probe_failed': 'INTEGER',
+    'probe_p50': 'REAL',
+    'probe_p95': 'REAL',
+    'probe_p99': 'REAL',
+    'last_probe': 'TEXT',
+    'last_probe_ok': 'INTEGER',
+    # The bot's stats, shared by every guild monitoring it
+    'bot_online_seconds': 'REAL',
+    'bot_offline_seconds': 'REAL',
+    'bot_last_change': 'TEXT',
+    'bot_first_seen': 'TEXT',
+}
+
+
+def empty_data():
+    """Return an empty data document."""
+    return {'channels': {}, 'monitored_bots': {}, 'uptime_stats': {}, 'check_intervals': {}, 'probe_targets': {}}
+
+
+class JsonBackend:
+    """Stores all data in a single JSON document."""
+
+    name = 'json'
+    # Whether uptime stats are read from disk when first needed
+    lazy = False
+
+    def load(self):
+        """Load the full data document."""
+        return load_data()
+
+    def snapshot(self, guilds, dirty):
+        """Copy every guild; JSON cannot be updated in place."""
+        return copy_guilds(guilds)
+
+    def write(self, payload):
+        """Serialize the copied guilds and write them to disk. Returns the number of bytes written."""
+        text = dump_data(to_document(payload))
+        write_data(text)
+        return len(text)
+
+    def close(self):
+        """Nothing to release for the JSON backend."""
+
+
+def encode_compact(value):
+    """Serialize a value to JSON without indentation or padding."""
+    return json.dumps(value, separators=(',', ':'))
+
+
+def write_atomic(path, text):
+    """Write a file through a temp file and rename, so readers never see a partial write."""
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as f:
+        f.write(text)
+    os.replace(temp_path, path)
+    return len(text)
+
+
+class ShardStats:
+    """Stands in for the uptime stats of a data document, reading each guild's shard file on demand."""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def pop(self, guild_id, default=None):
+        """Read a guild's uptime stats from its shard file."""
+        return self.backend._read_shard(guild_id) or default
+
+
+class ShardedJsonBackend:
+    """
+    Stores each guild in its own compact JSON file under a data directory.
+
+    An index file holds every guild's notification channel, monitored bots,
+    custom check intervals and probe targets, so startup only parses the index;
+    a guild's uptime stats are read from its shard file the first time they are
+    needed, or ahead of that by ``DataStore.preload_stats`` in a worker thread.
+    A flush rewrites only the shard files of dirty guilds, and the index only
+    when a guild's channel, monitored bots or their settings changed. Every
+    file is replaced atomically.
+    """
+
+    name = 'sharded'
+    lazy = True
+
+    def __init__(self, path=DATA_DIR):
+        self.path = path
+        self.index_path = os.path.join(path, INDEX_FILE)
+        # guild_id -> [channel_id, [bot_id, ...](, {bot_id: check_interval}(, {bot_id: probe_target}))]
+        # as last written to the index
+        self._index = {}
+        os.makedirs(path, exist_ok=True)
+
+    def _shard_path(self, guild_id):
+        """Get the path of a guild's shard file."""
+        return os.path.join(self.path, f'{guild_id}.json')
+
+    def _read_shard(self, guild_id):
+        """Read the uptime stats from a guild's shard file."""
+        try:
+            with open(self._shard_path(guild_id), 'r') as f:
+                return json.load(f).get('stats', {})
+        except FileNotFoundError:
+            return {}
+
+    def load(self):
+        """Load the index; uptime stats are read per guild on first access."""
+        if not os.path.exists(self.index_path):
+            if os.path.exists(DATA_FILE):
+                self.import_data(load_data())
+                print(f'Migrated {DATA_FILE} to {self.path}/')
+            else:
+                return empty_data()
+
+        with open(self.index_path, 'r') as f:
+            self._index = json.load(f)['guilds']
+
+        data = {**empty_data(), 'uptime_stats': ShardStats(self)}
+        for guild_id, (channel_id, bot_ids, *settings) in self._index.items():
+            if channel_id is not None:
+                data['channels'][guild_id] = channel_id
+            if bot_ids:
+                data['monitored_bots'][guild_id] = bot_ids
+            if len(settings) > 0 and settings[0]:
+                data['check_intervals'][guild_id] = settings[0]
+            if len(settings) > 1 and settings[1]:
+                data['probe_targets'][guild_id] = settings[1]
+        return data
+
+    def snapshot(self, guilds, dirty):
+        """Serialize the shard files of dirty guilds, and the index if it changed."""
+        shards = {}
+        index_changed = False
+
+        for guild_id in {guild_id for guild_id, _ in dirty}:
+            key = str(guild_id)
+            guild = guilds.get(guild_id)
+            if guild is None or guild.is_empty():
+                index_changed |= self._index.pop(key, None) is not None
+                shards[key] = None
+                continue
+
+            entry = [
+                str(guild.channel_id) if guild.channel_id is not None else None,
+                [str(bot_id) for bot_id in guild.bots],
+            ]
+            if guild.intervals or guild.probes:
+                entry.append(intervals_to_dict(guild))
+            if guild.probes:
+                entry.append(probes_to_dict(guild))
+            if self._index.get(key) != entry:
+                self._index[key] = entry
+                index_changed = True
+            shards[key] = encode_compact({'stats': guild_stats_to_dict(guild)}) if guild.bots else None
+
+        index = encode_compact({'version': 1, 'guilds': self._index}) if index_changed else None
+        return shards, index
+
+    def write(self, payload):
+        """Write the changed shard files, then the index. Returns the number of bytes written."""
+        shards, index = payload
+        written = 0
+        for guild_id, text in shards.items():
+            if text is None:
+                try:
+                    os.remove(self._shard_path(guild_id))
+                except FileNotFoundError:
+                    pass
+            else:
+                written += write_atomic(self._shard_path(guild_id), text)
+        if index is not None:
+            written += write_atomic(self.index_path, index)
+        return written
+
+    def import_data(self, data):
+        """Write a whole data document (in the JSON layout) as shard files and an index."""
+        guilds = from_document(data)
+        self._index = {}
+        self.write(self.snapshot(guilds, [(guild_id, None) for guild_id in guilds]))
+        if not os.path.exists(self.index_path):
+            write_atomic(self.index_path, encode_compact({'version': 1, 'guilds': {}}))
+
+    def close(self):
+        """Nothing to release for the sharded JSON backend."""
+
+
+def fsync_directory(path):
+    """Flush a directory entry (e.g. after a rename) to disk, where the platform supports it."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def encode_record(record):
+    """Encode a journal record as a checksummed line of compact JSON."""
+    text = encode_compact(record)
+    return f'{zlib.crc32(text.encode()):08x} {text}\n'
+
+
+def read_records(path):
+    """
+    Read the records of a journal file.
+
+    Stops at the first torn or corrupt line, which is what a crash in the
+    middle of an append leaves behind. Returns (records, valid_bytes).
+    """
+    records = []
+    valid_bytes = 0
+    try:
+        with open(path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                checksum, _, text = line[:-1].partition(b' ')
+                try:
+                    if int(checksum, 16) != zlib.crc32(text):
+                        break
+                    records.append(json.loads(text))
+                except ValueError:
+                    break
+                valid_bytes += len(line)
+    except FileNotFoundError:
+        pass
+    return records, valid_bytes
+
+
+def replay(data, records):
+    """Apply journal records, in order, to a data document in the JSON layout."""
+    monitored = data['monitored_bots']
+    uptime_stats = data['uptime_stats']
+    check_intervals = data.setdefault('check_intervals', {})
+    probe_targets = data.setdefault('probe_targets', {})
+    # guild_id -> set of monitored bot IDs, built on first use
+    members = {}
+
+    for record in records:
+        guild_id = record['g']
+        if 'b' not in record:
+            if record['c'] is None:
+                data['channels'].pop(guild_id, None)
+            else:
+                data['channels'][guild_id] = record['c']
+            continue
+
+        bot_id = record['b']
+        guild_members = members.get(guild_id)
+        if guild_members is None:
+            guild_members = members[guild_id] = set(monitored.get(guild_id, ()))
+
+        if record.get('d'):
+            if bot_id in guild_members:
+                guild_members.discard(bot_id)
+                monitored[guild_id].remove(bot_id)
+                if not monitored[guild_id]:
+                    del monitored[guild_id]
+            uptime_stats.get(guild_id, {}).pop(bot_id, None)
+            check_intervals.get(guild_id, {}).pop(bot_id, None)
+            probe_targets.get(guild_id, {}).pop(bot_id, None)
+            continue
+
+        if bot_id not in guild_members:
+            guild_members.add(bot_id)
+            monitored.setdefault(guild_id, []).append(bot_id)
+        if record.get('s') is not None:
+            uptime_stats.setdefault(guild_id, {})[bot_id] = record['s']
+        else:
+            uptime_stats.get(guild_id, {}).pop(bot_id, None)
+        if record.get('i') is not None:
+            check_intervals.setdefault(guild_id, {})[bot_id] = record['i']
+        else:
+            check_intervals.get(guild_id, {}).pop(bot_id, None)
+        if record.get('p') is not None:
+            probe_targets.setdefault(guild_id, {})[bot_id] = record['p']
+        else:
+            probe_targets.get(guild_id, {}).pop(bot_id, None)
+    return data
+
+
+class JournalBackend:
+    """
+    Stores data as a snapshot plus a write-ahead journal of changes.
+
+    A flush appends one checksummed record per dirty key to the journal and
+    fsyncs it once for the whole batch (group commit). Once the journal has
+    grown to the size of the snapshot (and at least ``min_checkpoint_bytes``),
+    the flush writes a new snapshot instead and starts a new journal, so a
+    byte of data is written at most about twice and startup replays at most
+    about one snapshot's worth of journal. Snapshots carry a generation that
+    names the journal belonging to them; older journals are ignored and
+    removed, so a crash at any point leaves a consistent snapshot plus a
+    journal whose torn tail is dropped on replay.
+    """
+
+    name = 'journal'
+    lazy = False
+
+    def __init__(self, path=JOURNAL_DIR, legacy_dir=DATA_DIR, min_checkpoint_bytes=1 << 20, read_only=False):
+        self.path = path
+        self.legacy_dir = legacy_dir
+        self.min_checkpoint_bytes = min_checkpoint_bytes
+        # Read-only instances (e.g. an offline export) only load and never touch the files
+        self.read_only = read_only
+        self.snapshot_path = os.path.join(path, SNAPSHOT_FILE)
+        self.generation = 0
+        self._journal = None
+        self._journal_bytes = 0
+        self._snapshot_bytes = 0
+        os.makedirs(path, exist_ok=True)
+
+    def _journal_path(self, generation):
+        """Get the path of the journal that follows a snapshot generation."""
+        return os.path.join(self.path, f'journal.{generation}.log')
+
+    def _import_existing(self):
+        """Load the data of the sharded or single-file JSON layout, if there is any, for a first snapshot."""
+        if os.path.exists(os.path.join(self.legacy_dir, INDEX_FILE)):
+            print(f'Migrating {self.legacy_dir}/ to {self.path}/')
+            return to_document(from_document(ShardedJsonBackend(self.legacy_dir).load()))
+        if os.path.exists(DATA_FILE):
+            print(f'Migrating {DATA_FILE} to {self.path}/')
+            return load_data()
+        return empty_data()
+
+    def load(self):
+        """Load the latest snapshot and replay its journal."""
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, 'r') as f:
+                snapshot = json.load(f)
+            self.generation = snapshot['generation']
+            self._snapshot_bytes = os.path.getsize(self.snapshot_path)
+            data = snapshot['data']
+        else:
+            data = self._import_existing()
+            if self.read_only:
+                return data
+            self._write_snapshot(encode_compact({'generation': 1, 'data': data}), 1)
+
+        journal_path = self._journal_path(self.generation)
+        records, valid_bytes = read_records(journal_path)
+        replay(data, records)
+        if self.read_only:
+            return data
+        if os.path.exists(journal_path) and os.path.getsize(journal_path) > valid_bytes:
+            print(f'Dropped a torn record at the end of {journal_path}')
+            with open(journal_path, 'r+b') as f:
+                f.truncate(valid_bytes)
+
+        for filename in os.listdir(self.path):
+            if filename.startswith('journal.') and filename != os.path.basename(journal_path):
+                os.remove(os.path.join(self.path, filename))
+
+        self._open_journal()
+        self._journal_bytes = valid_bytes
+        return data
+
+    def _open_journal(self):
+        """Open the current generation's journal for appending, creating it durably if needed."""
+        if self._journal is not None:
+            self._journal.close()
+        self._journal = open(self._journal_path(self.generation), 'ab')
+        fsync_directory(self.path)
+
+    def _records(self, guilds, dirty):
+        """Build the journal records for the dirty (guild_id, bot_id) keys."""
+        dirty_bots = {}
+        for guild_id, bot_id in dirty:
+            guild = guilds.get(guild_id)
+            if bot_id is None:
+                channel_id = guild.channel_id if guild else None
+                yield {'g': str(guild_id), 'c': str(channel_id) if channel_id is not None else None}
+            elif guild is None or bot_id not in guild.bots:
+                yield {'g': str(guild_id), 'b': str(bot_id), 'd': 1}
+            else:
+                dirty_bots.setdefault(guild_id, set()).add(bot_id)
+
+        for guild_id, bot_ids in dirty_bots.items():
+            guild = guilds[guild_id]
+            # In monitoring order, so bots added in one batch replay in the order they were added
+            ordered = bot_ids if len(bot_ids) == 1 else [bot_id for bot_id in guild.bots if bot_id in bot_ids]
+            for bot_id in ordered:
+                stats = guild.get_stats(bot_id)
+                yield {
+                    'g': str(guild_id),
+                    'b': str(bot_id),
+                    's': stats.to_dict() if stats is not None else None,
+                    'i': guild.intervals.get(bot_id),
+                    'p': guild.probes.get(bot_id),
+                }
+
+    def snapshot(self, guilds, dirty):
+        """Encode the journal records for the dirty keys, or copy every guild when it is time to checkpoint."""
+        records = ''.join(encode_record(record) for record in self._records(guilds, dirty)).encode()
+        if self._journal_bytes + len(records) < max(self.min_checkpoint_bytes, self._snapshot_bytes):
+            return records, None
+        return None, (self.generation + 1, copy_guilds(guilds))
+
+    def write(self, payload):
+        """Append and fsync the records, or write a checkpoint. Returns the number of bytes written."""
+        records, checkpoint = payload
+        if checkpoint is not None:
+            generation, guilds = checkpoint
+            text = encode_compact({'generation': generation, 'data': to_document(guilds)})
+            self._write_snapshot(text, generation)
+            return len(text)
+
+        if records:
+            self._journal.write(records)
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            self._journal_bytes += len(records)
+        return len(records)
+
+    def _write_snapshot(self, text, generation):
+        """Durably replace the snapshot, then switch to the new generation's journal."""
+        temp_path = self.snapshot_path + '.tmp'
+        with open(temp_path, 'w') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.snapshot_path)
+        fsync_directory(self.path)
+
+        previous = self._journal_path(self.generation)
+        self.generation = generation
+        self._snapshot_bytes = len(text)
+        self._journal_bytes = 0
+        if self._journal is not None:
+            self._open_journal()
+        if previous != self._journal_path(generation) and os.path.exists(previous):
+            os.remove(previous)
+
+    def import_data(self, data):
+        """Write a whole data document (in the JSON layout) as a new snapshot."""
+        self._write_snapshot(encode_compact({'generation': self.generation + 1, 'data': data}), self.generation + 1)
+
+    def close(self):
+        """Close the journal."""
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+
+class SqliteBackend:
+    """
+    Stores data in SQLite tables keyed by (guild_id, bot_id).
+
+    Only the rows touched since the last flush are written, as upserts and
+    deletes batched into a single transaction. Given ``shard_ids`` and
+    ``shard_count``, only the guilds of those shards are loaded, so several
+    processes can share one database.
+    """
+
+    name = 'sqlite'
+    lazy = False
+
+    def __init__(self, path=DATABASE_FILE, shard_ids=None, shard_count=None):
+        self.path = path
+        self.shard_ids = shard_ids
+        self.shard_count = shard_count
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self._create_tables()
+
+    def _create_tables(self):
+        """Create the tables if needed and add any missing stats columns."""
+        with self.conn:
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS channels ('
+                'guild_id INTEGER PRIMARY KEY, channel_id INTEGER NOT NULL)'
+            )
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS monitored_bots ('
+                'guild_id INTEGER NOT NULL, bot_id INTEGER NOT NULL, '
+                'PRIMARY KEY (guild_id, bot_id))'
+            )
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS uptime_stats ('
+                'guild_id INTEGER NOT NULL, bot_id INTEGER NOT NULL, '
+                'PRIMARY KEY (guild_id, bot_id))'
+            )
+            existing = {row[1] for row in self.conn.execute('PRAGMA table_info(uptime_stats)')}
+            for column, definition in STATS_COLUMNS.items():
+                if column not in existing:
+                    self.conn.execute(f'ALTER TABLE uptime_stats ADD COLUMN {column} {definition}')
+            # Custom check interval in seconds (NULL for the default) and probe target
+            existing = {row[1] for row in self.conn.execute('PRAGMA table_info(monitored_bots)')}
+            if 'check_interval' not in existing:
+                self.conn.execute('ALTER TABLE monitored_bots ADD COLUMN check_interval INTEGER')
+            if 'probe_target' not in existing:
+                self.conn.execute('ALTER TABLE monitored_bots ADD COLUMN probe_target TEXT')
+
+    def is_empty(self):
+        """Check whether the database holds no data yet."""
+        for table in ('channels', 'monitored_bots', 'uptime_stats'):
+            if self.conn.execute(f'SELECT 1 FROM {table} LIMIT 1').fetchone():
+                return False
+        return True
+
+    def migrate_if_empty(self):
+        """One-shot migration from the JSON file into a new database."""
+        if self.is_empty() and os.path.exists(DATA_FILE):
+            self.import_data(load_data())
+            print(f'Migrated {DATA_FILE} to {self.path}')
+
+    def _partition(self):
+        """Build the WHERE clause and parameters selecting this process's guilds."""
+        if self.shard_ids is None:
+            return '', ()
+        placeholders = ', '.join('?' * len(self.shard_ids))
+        return f' WHERE ((guild_id >> 22) % ?) IN ({placeholders})', (self.shard_count, *self.shard_ids)
+
+    def load(self):
+        """Load all rows (of this process's shards) into the in-memory data layout."""
+        self.migrate_if_empty()
+        where, params = self._partition()
+
+        data = empty_data()
+        for guild_id, channel_id in self.conn.execute(
+            f'SELECT guild_id, channel_id FROM channels{where}', params
+        ):
+            data['channels'][str(guild_id)] = str(channel_id)
+
+        for guild_id, bot_id, check_interval, probe_target in self.conn.execute(
+            f'SELECT guild_id, bot_id, check_interval, probe_target FROM monitored_bots{where} ORDER BY rowid',
+            params
+        ):
+            data['monitored_bots'].setdefault(str(guild_id), []).append(str(bot_id))
+            if check_interval is not None:
+                data['check_intervals'].setdefault(str(guild_id), {})[str(bot_id)] = check_interval
+            if probe_target is not None:
+                data['probe_targets'].setdefault(str(guild_id), {})[str(bot_id)] = probe_target
+
+        columns = list(STATS_COLUMNS)
+        query = f'SELECT guild_id, bot_id, {", ".join(columns)} FROM uptime_stats{where}'
+        for row in self.conn.execute(query, params):
+            guild_stats = data['uptime_stats'].setdefault(str(row[0]), {})
+            guild_stats[str(row[1])] = dict(zip(columns, row[2:]))
+
+        return data
+
+    def snapshot(self, guilds, dirty):
+        """Build the upserts and deletes for the dirty (guild_id, bot_id) keys."""
+        channel_upserts = []
+        channel_deletes = []
+        bot_upserts = []
+        bot_deletes = []
+        stats_upserts = []
+
+        for guild_id, bot_id in dirty:
+            guild = guilds.get(guild_id)
+            if bot_id is None:
+                if guild is None or guild.channel_id is None:
+                    channel_deletes.append((guild_id,))
+                else:
+                    channel_upserts.append((guild_id, guild.channel_id))
+                continue
+
+            key = (guild_id, bot_id)
+            if guild is None or bot_id not in guild.bots:
+                bot_deletes.append(key)
+                continue
+
+            bot_upserts.append(key + (guild.intervals.get(bot_id), guild.probes.get(bot_id)))
+            stats = guild.get_stats(bot_id)
+            if stats is not None:
+                row = stats.to_dict()
+                stats_upserts.append(key + tuple(row.get(column) for column in STATS_COLUMNS))
+
+        return channel_upserts, channel_deletes, bot_upserts, bot_deletes, stats_upserts
+
+    def write(self, payload):
+        """Apply a snapshot in a single transaction. Returns None (size unknown)."""
+        channel_upserts, channel_deletes, bot_upserts, bot_deletes, stats_upserts = payload
+        columns = list(STATS_COLUMNS)
+        stats_sql = (
+            f'INSERT INTO uptime_stats (guild_id, bot_id, {", ".join(columns)}) '
+            f'VALUES ({", ".join("?" * (len(columns) + 2))}) '
+            f'ON CONFLICT (guild_id, bot_id) DO UPDATE SET '
+            + ', '.join(f'{column} = excluded.{column}' for column in columns)
+        )
+
+        with self.conn:
+            self.conn.executemany(
+                'INSERT INTO channels (guild_id, channel_id) VALUES (?, ?) '
+                'ON CONFLICT (guild_id) DO UPDATE SET channel_id = excluded.channel_id',
+                channel_upserts
+            )
+            self.conn.executemany('DELETE FROM channels WHERE guild_id = ?', channel_deletes)
+            self.conn.executemany(
+                'INSERT INTO monitored_bots (guild_id, bot_id, check_interval, probe_target) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (guild_id, bot_id) DO UPDATE SET '
+                'check_interval = excluded.check_interval, probe_target = excluded.probe_target',
+                bot_upserts
+            )
+            self.conn.executemany(
+                'DELETE FROM monitored_bots WHERE guild_id = ? AND bot_id = ?', bot_deletes
+            )
+            self.conn.executemany(
+                'DELETE FROM uptime_stats WHERE guild_id = ? AND bot_id = ?', bot_deletes
+            )
+            self.conn.executemany(stats_sql, stats_upserts)
+
+    def import_data(self, data):
+        """Write a whole data document (in the JSON layout) into the database."""
+        guilds = from_document(data)
+        dirty = [(guild_id, None) for guild_id in guilds]
+        for guild_id, guild in guilds.items():
+            dirty.extend((guild_id, bot_id) for bot_id in guild.bots)
+        self.write(self.snapshot(guilds, dirty))
+
+    def close(self):
+        """Close the database connection."""
+        self.conn.close()
+
+
+def get_backend(name='json', shard_ids=None, shard_count=None):
+    """Create a storage backend by name."""
+    if name == 'json':
+        if shard_ids is not None:
+            raise ValueError('The JSON backend cannot be shared between processes; use sqlite')
+        return JsonBackend()
+    if name == 'sharded':
+        if shard_ids is not None:
+            raise ValueError('The sharded JSON backend cannot be shared between processes; use sqlite')
+        return ShardedJsonBackend(os.getenv('DATA_DIR', DATA_DIR))
+    if name == 'journal':
+        if shard_ids is not None:
+            raise ValueError('The journal backend cannot be shared between processes; use sqlite')
+        return JournalBackend(os.getenv('JOURNAL_DIR', JOURNAL_DIR), os.getenv('DATA_DIR', DATA_DIR))
+    if name == 'sqlite':
+        return SqliteBackend(os.getenv('DATABASE_FILE', DATABASE_FILE), shard_ids, shard_count)
+    raise ValueError(f'Unknown storage backend: {name}')
+
+
+def migrate_json_to_sqlite(json_path=DATA_FILE, db_path=DATABASE_FILE):
+    """Copy the data from a JSON file into a SQLite database."""
+    with open(json_path, 'r') as f:
+        data = json.load(f)
+
+    backend = SqliteBackend(db_path)
+    try:
+        backend.import_data(data)
+    finally:
+        backend.close()
+
+
+if __name__ == '__main__':
+    # Usage: python -m utils.storage [bot_data.json] [bot_data.db]
+    json_path = sys.argv[1] if len(sys.argv) > 1 else DATA_FILE
+    db_path = sys.argv[2] if len(sys.argv) > 2 else DATABASE_FILE
+    migrate_json_to_sqlite(json_path, db_path)
+    print(f'Migrated {json_path} to {db_path}')
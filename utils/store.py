@@ -0,0 +1,641 @@
+"""
+In-memory data store with write-behind persistence for the Uptime Bot.
+"""
+
+import asyncio
+import time
+
+from utils import monitor
+from utils.history import distinct_transitions
+from utils.metrics import REGISTRY
+from utils.model import BotStats, GuildState, ProbeStats, SubscriberStats, from_document
+from utils.rollup import (
+    ROLLUP_FILE, Rollup, by_bot, dump_rollups, dump_shard_rollups, load_rollups, load_shard_rollups, write_rollups
+)
+from utils.scheduler import CHECK_INTERVAL_SECONDS, clamp_interval
+from utils.storage import JsonBackend
+
+LOAD_SECONDS = REGISTRY.histogram('uptime_store_load_seconds', 'Time spent loading the data store')
+FLUSH_SECONDS = REGISTRY.histogram('uptime_store_flush_seconds', 'Time spent writing dirty data to the backend')
+FLUSH_KEYS = REGISTRY.counter('uptime_store_flushed_keys_total', 'Dirty (guild, bot) keys written to the backend')
+WRITTEN_BYTES = REGISTRY.counter(
+    'uptime_store_written_bytes_total', 'Bytes written for JSON data, rollups and the transition log'
+)
+# Guilds whose stats are read and parsed per worker thread call when preloading
+PRELOAD_BATCH = 200
+
+TRANSITIONS = REGISTRY.counter('uptime_status_transitions_total', 'Online/offline transitions recorded')
+
+
+class DataStore:
+    """
+    Shared in-memory copy of the bot data, as {guild_id: GuildState}.
+
+    IDs are integers and statuses are ``Status`` values; the backends convert
+    to and from the on-disk layout. Reads are served from memory. Writes mark the touched (guild_id, bot_id) key
+    as dirty and are flushed to the storage backend by a background task, either
+    every ``flush_interval`` seconds or as soon as ``max_dirty`` keys are waiting
+    to be written. Uptime rollups are larger and only needed for long windows,
+    so they are saved every ``rollup_interval`` seconds instead. With
+    ``shard_ids`` and a ``rollup_file`` with ``{shard}`` fields, each shard's
+    rollups are kept in a file of their own.
+
+    Bots are checked every ``check_interval`` seconds unless they have their
+    own interval. Schedule listeners are called with (guild_id, bot_ids) when
+    bots are added or their interval changes, so they can be (re)scheduled.
+
+    A bot's presence is the same in every guild, so each bot has one BotStats,
+    rollup and transition log entry per change, shared by the guilds
+    monitoring it; a guild's SubscriberStats only add when it started. A
+    reverse index maps each bot to those guilds, so a change is recorded once
+    and only its notifications are fanned out. The shared stats are saved
+    with each guild's stats, and the rollups and transitions under the
+    lowest guild ID monitoring the bot.
+    """
+
+    def __init__(self, backend=None, history=None, rollup_file=ROLLUP_FILE,
+                 flush_interval=30, max_dirty=100, rollup_interval=300,
+                 check_interval=CHECK_INTERVAL_SECONDS, shard_ids=None, shard_count=None):
+        self.backend = backend or JsonBackend()
+        self.history = history
+        self.rollup_file = rollup_file
+        self.flush_interval = flush_interval
+        self.max_dirty = max_dirty
+        self.rollup_interval = rollup_interval
+        self.check_interval = check_interval
+        self.shard_ids = shard_ids
+        self.shard_count = shard_count
+        with LOAD_SECONDS.time():
+            self.guilds = from_document(self.backend.load())
+        if not rollup_file:
+            self.rollups = {}
+        elif self._sharded_rollups():
+            self.rollups = by_bot(load_shard_rollups(rollup_file, shard_ids, shard_count))
+        else:
+            self.rollups = by_bot(load_rollups(rollup_file))
+
+        # guild_id -> counter bumped by membership changes
+        self._versions = {}
+        # bot_id -> counter bumped by status transitions
+        self._bot_versions = {}
+        self._dirty = set()
+        # Bots whose shared stats changed, saved with every loaded guild monitoring them
+        self._changed = set()
+        self._rollups_dirty = False
+        self._rollups_saved = time.monotonic()
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._preload_task = None
+        self._schedule_listeners = []
+
+    @property
+    def guilds(self):
+        """The {guild_id: GuildState} of every guild with a channel or monitored bots."""
+        return self._guilds
+
+    @guilds.setter
+    def guilds(self, guilds):
+        self._guilds = guilds
+        # bot_id -> BotStats shared by the guilds monitoring it
+        self._records = {}
+        # bot_id -> IDs of the guilds monitoring it
+        self._subscribers = {}
+        for guild_id, guild in guilds.items():
+            guild.link(self._records)
+            for bot_id in guild.bots:
+                self._subscribers.setdefault(bot_id, set()).add(guild_id)
+
+    # Reads
+
+    def get_channel(self, guild_id):
+        """Get the notification channel ID for a guild, or None."""
+        guild = self.guilds.get(guild_id)
+        return guild.channel_id if guild else None
+
+    def get_monitored(self, guild_id):
+        """Get the IDs of the bots monitored in a guild, in the order they were added."""
+        guild = self.guilds.get(guild_id)
+        return guild.bots.keys() if guild else ()
+
+    def is_monitored(self, guild_id, bot_id):
+        """Check whether a bot is monitored in a guild."""
+        guild = self.guilds.get(guild_id)
+        return guild is not None and bot_id in guild.bots
+
+    def get_stats(self, guild_id, bot_id):
+        """Get a guild's SubscriberStats for a monitored bot, or None if none are recorded yet."""
+        guild = self.guilds.get(guild_id)
+        return guild.get_stats(bot_id) if guild else None
+
+    def get_check_interval(self, guild_id, bot_id):
+        """Get how often a bot is checked, in seconds."""
+        guild = self.guilds.get(guild_id)
+        interval = guild.intervals.get(bot_id) if guild else None
+        # Intervals saved before the limit was lowered are clamped to it
+        return clamp_interval(interval) if interval else self.check_interval
+
+    def get_probe_target(self, guild_id, bot_id):
+        """Get a bot's health probe target, or None if it is not probed."""
+        guild = self.guilds.get(guild_id)
+        return guild.probes.get(bot_id) if guild else None
+
+    def probe_targets(self):
+        """Iterate over (guild_id, bot_id, target) for every probed bot."""
+        return (
+            (guild_id, bot_id, target)
+            for guild_id, guild in self.guilds.items()
+            for bot_id, target in guild.probes.items()
+        )
+
+    def subscribers(self, bot_id):
+        """Iterate over (guild_id, channel_id) for every guild monitoring a bot."""
+        return (
+            (guild_id, self.guilds[guild_id].channel_id)
+            for guild_id in self._subscribers.get(bot_id, ())
+        )
+
+    def _record(self, bot_id):
+        """Get a monitored bot's shared BotStats, loading them from a guild monitoring it if needed, or None."""
+        record = self._records.get(bot_id)
+        if record is None:
+            for guild_id in self._subscribers.get(bot_id, ()):
+                if self.guilds[guild_id].get_stats(bot_id) is not None:
+                    return self._records.get(bot_id)
+        return record
+
+    def _owner(self, bot_id):
+        """Get the guild a bot's rollup and transitions are saved under: the lowest ID monitoring it."""
+        return min(self._subscribers[bot_id])
+
+    def get_presence(self, bot_id):
+        """Get the Status last recorded for a monitored bot, or None."""
+        record = self._record(bot_id)
+        return record.last_status if record is not None else None
+
+    def get_global_uptime(self, bot_id, start=None, end=None, now=None):
+        """
+        Get a bot's uptime from its shared stats, since it was first seen in any guild.
+
+        Returns (guilds, online, offline) seconds, all time or between two epoch
+        timestamps. The guilds are only counted, so this does not grow with them.
+        """
+        guild_count = len(self._subscribers.get(bot_id, ()))
+        record = self._record(bot_id)
+        if start is None:
+            online, offline = monitor.get_durations(record)
+        else:
+            online, observed = self._window_uptime(bot_id, record, start, end, now)
+            offline = observed - online
+        return guild_count, online, offline
+
+    def guild_version(self, guild_id):
+        """Get a value that changes whenever a transition or membership change touches a guild."""
+        guild = self.guilds.get(guild_id)
+        transitions = sum(self._bot_versions.get(bot_id, 0) for bot_id in guild.bots) if guild else 0
+        return self._versions.get(guild_id, 0), transitions
+
+    def monitored_guilds(self):
+        """Iterate over (guild_id, bot_ids) for every guild with monitored bots."""
+        return ((guild_id, guild.bots.keys()) for guild_id, guild in self.guilds.items() if guild.bots)
+
+    def get_uptime(self, guild_id, bot_id, start, end, now=None):
+        """
+        Get a bot's (online, observed) seconds between two epoch timestamps, since the guild started monitoring it.
+
+        Served from the bot's rollup, plus the time since the last check that
+        has not been credited yet. The start of monitoring is rounded down to
+        the rollup's buckets.
+        """
+        stats = self.get_stats(guild_id, bot_id)
+        if stats is None:
+            return 0, 0
+        return self._window_uptime(bot_id, stats, max(start, stats.first_seen or start), end, now)
+
+    def _window_uptime(self, bot_id, stats, start, end, now=None):
+        """Get a bot's (online, observed) seconds between two epoch timestamps from its rollup and stats."""
+        if end <= start:
+            return 0, 0
+        rollup = self.rollups.get(bot_id)
+        online, observed = rollup.total(start, end) if rollup else (0, 0)
+
+        pending = monitor.pending_interval(stats, now or time.time())
+        if pending:
+            pending_start, pending_end, pending_online = pending
+            seconds = max(0, min(end, pending_end) - max(start, pending_start))
+            observed += seconds
+            if pending_online:
+                online += seconds
+
+        return online, observed
+
+    def get_uptime_series(self, guild_id, bot_id, start, end, width=3600):
+        """Get a bot's (online, observed) seconds per rollup bucket of ``width`` seconds."""
+        rollup = self.rollups.get(bot_id)
+        if rollup is None:
+            return [(0, 0)] * (-(-int(end - start) // width))
+        return rollup.series(start, end, width)
+
+    async def get_transitions(self, guild_id, bot_id, start, end):
+        """Get a bot's status transitions between two epoch timestamps, since the guild started monitoring it."""
+        stats = self.get_stats(guild_id, bot_id)
+        if self.history is None or stats is None:
+            return []
+        start = max(start, stats.first_seen or start)
+        records = await asyncio.to_thread(self.history.read, start, end, None, bot_id)
+        return list(distinct_transitions(records))
+
+    async def history_snapshot(self, guild_id, start, end):
+        """
+        Get the logged segment sizes and the unflushed transitions of a guild's bots in [start, end).
+
+        Both are taken between flushes, so a flush cannot move transitions from
+        one to the other before an export has streamed them.
+        """
+        if self.history is None:
+            return None, []
+        bot_ids = set(self.get_monitored(guild_id))
+        async with self._flush_lock:
+            sizes = await asyncio.to_thread(self.history.segment_sizes, start, end)
+            return sizes, [record for record in self.history.pending_records(start, end) if record[2] in bot_ids]
+
+    # Writes
+
+    def _guild(self, guild_id):
+        """Get a guild's state, creating it if needed."""
+        guild = self.guilds.get(guild_id)
+        if guild is None:
+            guild = self.guilds[guild_id] = GuildState(records=self._records)
+        return guild
+
+    def _subscribe(self, guild_id, bot_id):
+        """Add a guild to a bot's subscribers."""
+        self._subscribers.setdefault(bot_id, set()).add(guild_id)
+
+    def _unsubscribe(self, guild_id, bot_id):
+        """Remove a guild from a bot's subscribers, forgetting the bot once none are left."""
+        guild_ids = self._subscribers.get(bot_id)
+        if guild_ids is None:
+            return
+        guild_ids.discard(guild_id)
+        if not guild_ids:
+            del self._subscribers[bot_id]
+            self._records.pop(bot_id, None)
+            self._bot_versions.pop(bot_id, None)
+            self._changed.discard(bot_id)
+            if self.rollups.pop(bot_id, None) is not None:
+                self._rollups_dirty = True
+
+    def _touch(self, guild_id):
+        """Bump a guild's version so cached views of it are rebuilt."""
+        self._versions[guild_id] = self._versions.get(guild_id, 0) + 1
+
+    def set_channel(self, guild_id, channel_id):
+        """Set the notification channel for a guild."""
+        self._guild(guild_id).channel_id = channel_id
+        self._touch(guild_id)
+        self.mark_dirty(guild_id)
+
+    def remove_channel(self, guild_id):
+        """Remove a guild's notification channel. Returns False if none was set."""
+        guild = self.guilds.get(guild_id)
+        if guild is None or guild.channel_id is None:
+            return False
+        guild.channel_id = None
+        self._touch(guild_id)
+        self.mark_dirty(guild_id)
+        return True
+
+    def add_schedule_listener(self, listener):
+        """Call listener(guild_id, bot_ids) whenever bots are added or their check interval changes."""
+        self._schedule_listeners.append(listener)
+
+    def remove_schedule_listener(self, listener):
+        """Stop calling a schedule listener."""
+        if listener in self._schedule_listeners:
+            self._schedule_listeners.remove(listener)
+
+    def _schedule(self, guild_id, bot_ids):
+        """Tell the schedule listeners about new or rescheduled bots."""
+        for listener in self._schedule_listeners:
+            listener(guild_id, bot_ids)
+
+    def add_bot(self, guild_id, bot_id, check_interval=None, probe_target=None):
+        """
+        Start monitoring a bot, optionally with its own check interval and a health probe target.
+
+        Returns False if it was already monitored.
+        """
+        guild = self._guild(guild_id)
+        if bot_id in guild.bots:
+            return False
+        guild.bots[bot_id] = None
+        self._subscribe(guild_id, bot_id)
+        if check_interval and check_interval != self.check_interval:
+            guild.intervals[bot_id] = check_interval
+        if probe_target:
+            guild.probes[bot_id] = probe_target
+        self._touch(guild_id)
+        self.mark_dirty(guild_id, bot_id)
+        self._schedule(guild_id, [bot_id])
+        return True
+
+    def set_probe_target(self, guild_id, bot_id, probe_target):
+        """Set (or with None, remove) a monitored bot's health probe target. Returns False if it is not monitored."""
+        guild = self.guilds.get(guild_id)
+        if guild is None or bot_id not in guild.bots:
+            return False
+        if probe_target:
+            guild.probes[bot_id] = probe_target
+        else:
+            guild.probes.pop(bot_id, None)
+            stats = guild.get_stats(bot_id)
+            if stats is not None:
+                stats.probe = None
+        self._touch(guild_id)
+        self.mark_dirty(guild_id, bot_id)
+        return True
+
+    def set_check_interval(self, guild_id, bot_id, check_interval):
+        """Change a monitored bot's check interval (None for the default). Returns False if it is not monitored."""
+        guild = self.guilds.get(guild_id)
+        if guild is None or bot_id not in guild.bots:
+            return False
+        if check_interval and check_interval != self.check_interval:
+            guild.intervals[bot_id] = check_interval
+        else:
+            guild.intervals.pop(bot_id, None)
+        self.mark_dirty(guild_id, bot_id)
+        self._schedule(guild_id, [bot_id])
+        return True
+
+    def remove_bot(self, guild_id, bot_id):
+        """Stop monitoring a bot and drop its stats. Returns False if it was not monitored."""
+        guild = self.guilds.get(guild_id)
+        if guild is None or bot_id not in guild.bots:
+            return False
+        del guild.bots[bot_id]
+        guild.intervals.pop(bot_id, None)
+        guild.probes.pop(bot_id, None)
+        self._unsubscribe(guild_id, bot_id)
+        self._touch(guild_id)
+        self.mark_dirty(guild_id, bot_id)
+        return True
+
+    def add_bots(self, guild_id, bot_ids):
+        """Start monitoring several bots as one batch. Returns the IDs that were newly added."""
+        added = [bot_id for bot_id in dict.fromkeys(bot_ids) if not self.is_monitored(guild_id, bot_id)]
+        if added:
+            guild = self._guild(guild_id)
+            for bot_id in added:
+                guild.bots[bot_id] = None
+                self._subscribe(guild_id, bot_id)
+                self._dirty.add((guild_id, bot_id))
+            self._touch(guild_id)
+            self._wakeup.set()
+            self._schedule(guild_id, added)
+        return added
+
+    def remove_bots(self, guild_id, bot_ids):
+        """Stop monitoring several bots as one batch. Returns the IDs that were removed."""
+        guild = self.guilds.get(guild_id)
+        if guild is None:
+            return []
+        removed = [bot_id for bot_id in dict.fromkeys(bot_ids) if bot_id in guild.bots]
+        for bot_id in removed:
+            del guild.bots[bot_id]
+            guild.intervals.pop(bot_id, None)
+            guild.probes.pop(bot_id, None)
+            self._unsubscribe(guild_id, bot_id)
+            self._dirty.add((guild_id, bot_id))
+        if removed:
+            self._touch(guild_id)
+            self._wakeup.set()
+        return removed
+
+    def record_presence(self, bot_id, status, now=None):
+        """
+        Record an observed Status of a monitored bot at an epoch second, once for every guild monitoring it.
+
+        Returns the previous status on an online/offline change, otherwise None.
+        """
+        if bot_id not in self._subscribers:
+            return None
+        now = int(now or time.time())
+        record = self._record(bot_id)
+        if record is None:
+            record = self._records[bot_id] = BotStats(status, now)
+
+        rollup = self.rollups.get(bot_id)
+        if rollup is None:
+            rollup = self.rollups[bot_id] = Rollup()
+        previous = monitor.record_status(record, status, now, rollup)
+        self._changed.add(bot_id)
+        self._rollups_dirty = True
+        if len(self._changed) >= self.max_dirty:
+            self._wakeup.set()
+
+        if previous is not None:
+            TRANSITIONS.inc()
+            self._bot_versions[bot_id] = self._bot_versions.get(bot_id, 0) + 1
+            if self.history is not None:
+                self.history.append(self._owner(bot_id), bot_id, str(previous), str(status), now)
+        return previous
+
+    def record_status(self, guild_id, bot_id, status, now=None):
+        """
+        Record an observed Status of a bot monitored in a guild, starting the guild's stats if needed.
+
+        The status is recorded in the bot's shared stats, as with ``record_presence``.
+        Returns the previous status on an online/offline change, otherwise None.
+        """
+        guild = self.guilds.get(guild_id)
+        if guild is None or bot_id not in guild.bots:
+            return None
+        now = int(now or time.time())
+        previous = self.record_presence(bot_id, status, now)
+        if guild.get_stats(bot_id) is None:
+            guild.set_stats(bot_id, SubscriberStats(self._records[bot_id], now))
+            self.mark_dirty(guild_id, bot_id)
+        return previous
+
+    def record_probe(self, guild_id, bot_id, ok, percentiles, now=None):
+        """
+        Record the result of a health probe of a monitored bot.
+
+        ``percentiles`` are the (p50, p95, p99) latencies of its recent
+        successful probes in milliseconds, or None if there are none yet.
+        Probes of bots without stats are ignored until their first status is recorded.
+        """
+        guild = self.guilds.get(guild_id)
+        if guild is None or bot_id not in guild.probes:
+            return
+        stats = guild.get_stats(bot_id)
+        if stats is None:
+            return
+        probe = stats.probe
+        if probe is None:
+            probe = stats.probe = ProbeStats()
+        if ok:
+            probe.ok += 1
+        else:
+            probe.failed += 1
+        if percentiles is not None:
+            probe.p50, probe.p95, probe.p99 = percentiles
+        probe.last_probe = int(now or time.time())
+        probe.last_ok = ok
+        self.mark_dirty(guild_id, bot_id)
+
+    # Persistence
+
+    def mark_dirty(self, guild_id, bot_id=None):
+        """Mark a bot's (or, without bot_id, a guild's) data as changed for the next flush."""
+        self._dirty.add((guild_id, bot_id))
+        if len(self._dirty) >= self.max_dirty:
+            self._wakeup.set()
+
+    async def flush(self, force=False):
+        """Write the data to disk if anything changed since the last flush."""
+        async with self._flush_lock:
+            await self._flush_rollups(force)
+            self._mark_changed()
+            if not self._dirty:
+                return
+            dirty, self._dirty = self._dirty, set()
+            started = time.perf_counter()
+            try:
+                # Snapshot on the event loop so it is consistent,
+                # then do the blocking write in a worker thread.
+                payload = self.backend.snapshot(self.guilds, dirty)
+                WRITTEN_BYTES.inc(await asyncio.to_thread(self.backend.write, payload) or 0)
+            except Exception:
+                self._dirty |= dirty
+                raise
+            FLUSH_SECONDS.observe(time.perf_counter() - started)
+            FLUSH_KEYS.inc(len(dirty))
+
+            if self.history is not None:
+                transitions = self.history.take_pending()
+                try:
+                    WRITTEN_BYTES.inc(await asyncio.to_thread(self.history.write, transitions))
+                except Exception:
+                    self.history.requeue(transitions)
+                    raise
+
+    def _mark_changed(self):
+        """Mark the stats of the loaded guilds monitoring a bot whose shared stats changed as dirty."""
+        changed, self._changed = self._changed, set()
+        for bot_id in changed:
+            for guild_id in self._subscribers.get(bot_id, ()):
+                guild = self.guilds[guild_id]
+                # Guilds not loaded yet catch up with the shared stats when they are
+                if guild.is_loaded() and guild.bots.get(bot_id) is not None:
+                    self._dirty.add((guild_id, bot_id))
+
+    async def _flush_rollups(self, force):
+        """Save the rollups if they changed and are due (or forced)."""
+        if not self.rollup_file or not self._rollups_dirty:
+            return
+        if not force and time.monotonic() - self._rollups_saved < self.rollup_interval:
+            return
+
+        self._rollups_dirty = False
+        self._rollups_saved = time.monotonic()
+        rollups = {
+            (self._owner(bot_id), bot_id): rollup
+            for bot_id, rollup in self.rollups.items()
+            if bot_id in self._subscribers
+        }
+        try:
+            if self._sharded_rollups():
+                payloads = dump_shard_rollups(rollups, self.rollup_file, self.shard_ids, self.shard_count)
+            else:
+                payloads = {self.rollup_file: dump_rollups(rollups)}
+            for path, payload in payloads.items():
+                WRITTEN_BYTES.inc(await asyncio.to_thread(write_rollups, payload, path))
+        except Exception:
+            self._rollups_dirty = True
+            raise
+
+    def _sharded_rollups(self):
+        """Check whether the rollups are kept in a file per shard."""
+        if '{shard}' not in self.rollup_file:
+            return False
+        if self.shard_ids is None or not self.shard_count:
+            raise ValueError(f'{self.rollup_file} is a per-shard file, but no shards are assigned')
+        return True
+
+    async def maintain_history(self):
+        """Apply retention and compaction to the transition log."""
+        if self.history is None:
+            return 0
+        async with self._flush_lock:
+            return await asyncio.to_thread(self.history.maintain, set(self._subscribers))
+
+    async def _flush_loop(self):
+        """Flush dirty data periodically or when the dirty threshold is reached."""
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f'Failed to save data: {e}')
+
+    async def preload_stats(self):
+        """
+        Read and parse the stats of every guild not loaded yet, in a worker thread.
+
+        Backends that read stats lazily would otherwise read each guild's file
+        on the event loop the first time a command or presence update needs it.
+        Guilds that load their own stats meanwhile keep them. Returns how many
+        guilds were preloaded.
+        """
+        pending = [guild_id for guild_id, guild in self.guilds.items() if not guild.is_loaded()]
+        preloaded = 0
+        for i in range(0, len(pending), PRELOAD_BATCH):
+            guilds = [guild for guild in map(self.guilds.get, pending[i:i + PRELOAD_BATCH]) if guild is not None]
+            readers = [(guild, guild.stats_reader()) for guild in guilds]
+            readers = [(guild, reader) for guild, reader in readers if reader is not None]
+            parsed = await asyncio.to_thread(lambda readers=readers: [reader() for _, reader in readers])
+            for (guild, _), stats in zip(readers, parsed):
+                guild.install_stats(stats)
+            preloaded += len(readers)
+        return preloaded
+
+    async def _preload(self):
+        """Preload the stats in the background, logging failures; lazy loading still works without it."""
+        try:
+            preloaded = await self.preload_stats()
+            print(f'Preloaded the uptime stats of {preloaded} guild(s)')
+        except Exception as e:
+            print(f'Failed to preload uptime stats: {e}')
+
+    def start(self):
+        """Start the background flush task, and preloading for backends that read stats lazily."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+        if self.backend.lazy and self._preload_task is None:
+            self._preload_task = asyncio.create_task(self._preload())
+
+    async def close(self):
+        """Stop the background tasks and force a final flush."""
+        if self._preload_task is not None:
+            self._preload_task.cancel()
+            try:
+                await self._preload_task
+            except asyncio.CancelledError:
+                pass
+            self._preload_task = None
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush(force=True)
+        self.backend.close()
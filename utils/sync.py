@@ -0,0 +1,55 @@
+"""
+Slash command sync that only talks to Discord when the command tree changed.
+
+A stable hash of the global command tree is kept on disk next to the
+application ID it was synced for, so restarts and gateway reconnects with an
+unchanged tree skip the rate-limited sync call.
+"""
+
+import hashlib
+import json
+import os
+
+COMMAND_HASH_FILE = '.command_tree.hash'
+
+
+def tree_hash(tree):
+    """Compute a stable hash of the global commands in a command tree."""
+    payload = sorted(
+        (command.to_dict(tree) for command in tree.get_commands()),
+        key=lambda command: (command.get('type', 1), command['name'])
+    )
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def read_synced(path=COMMAND_HASH_FILE):
+    """Read the (application_id, hash) recorded by the last sync, or None."""
+    try:
+        with open(path, 'r') as f:
+            application_id, digest = f.read().split()
+        return int(application_id), digest
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def record_synced(application_id, digest, path=COMMAND_HASH_FILE):
+    """Record that a tree hash was synced for an application."""
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as f:
+        f.write(f'{application_id} {digest}\n')
+    os.replace(temp_path, path)
+
+
+async def sync_if_changed(bot, path=COMMAND_HASH_FILE, force=False):
+    """
+    Sync the global command tree if it differs from the last synced one.
+
+    Returns the number of synced commands, or None if the sync was skipped.
+    """
+    digest = tree_hash(bot.tree)
+    if not force and read_synced(path) == (bot.application_id, digest):
+        return None
+
+    synced = await bot.tree.sync()
+    record_synced(bot.application_id, digest, path)
+    return len(synced)